@@ -0,0 +1,176 @@
+"""
+Semantic Answer Cache
+Neredeyse aynı sorulara LLM çağırmadan kayıtlı final_answer döndürür
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# --- CONFIGURATION ---
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Cosine similarity
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Saniye
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+# Sadece context'e dayalı LLM yanıtları cache'lenir (greeting/price/unknown zaten sabit).
+# event cache'lenmez: yanıt duyuru indeksine ve "bu hafta" / "yaklaşan" gibi zamana bağlıdır.
+CACHEABLE_INTENTS = ("education",)
+
+
+class AnswerCache:
+    """
+    Sorgu embedding benzerliğine dayalı, TTL + LRU sınırlı yanıt cache'i.
+
+    Anahtar:
+    - Sorgu embedding'i (cosine similarity >= threshold)
+    - active_levels + compress_context (birebir eşleşmeli)
+    - intent (birebir eşleşmeli; intent bilinmiyorsa cache'e bakılmaz)
+
+    İndeks versiyonu değiştiğinde (reload/sync) tüm kayıtlar geçersiz olur.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: int = ANSWER_CACHE_TTL,
+        maxsize: int = ANSWER_CACHE_SIZE,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._index_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _partition(active_levels: list, compress_context: bool) -> tuple:
+        return (tuple(sorted(active_levels)), bool(compress_context))
+
+    @staticmethod
+    def _normalize(embedding: list) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_index_version(self, index_version):
+        """İndeks değiştiyse cache'i boşaltır (lock altında çağrılır)."""
+        if index_version is not None and index_version != self._index_version:
+            self._entries.clear()
+            self._index_version = index_version
+
+    def _evict_expired(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry["created_at"] > self.ttl]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(
+        self,
+        embedding: list,
+        active_levels: list,
+        compress_context: bool,
+        intent: str,
+        index_version: int = None,
+    ) -> dict:
+        """
+        Aynı intent'teki en benzer geçerli kaydı döndürür.
+
+        Returns:
+            {"final_answer", "intent", "similarity"}; eşik altındaysa veya
+            intent cache'lenebilir değilse None
+        """
+        if intent not in CACHEABLE_INTENTS:
+            return None
+
+        query_vector = self._normalize(embedding)
+        partition = self._partition(active_levels, compress_context)
+        now = time.time()
+
+        with self._lock:
+            self._check_index_version(index_version)
+            self._evict_expired(now)
+
+            best_id, best_similarity = None, self.threshold
+            for entry_id, entry in self._entries.items():
+                if entry["partition"] != partition:
+                    continue
+                if entry["intent"] != intent:
+                    continue
+                similarity = float(np.dot(query_vector, entry["vector"]))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            entry = self._entries[best_id]
+            return {
+                "final_answer": entry["final_answer"],
+                "intent": entry["intent"],
+                "similarity": best_similarity,
+            }
+
+    def store(
+        self,
+        embedding: list,
+        active_levels: list,
+        compress_context: bool,
+        intent: str,
+        final_answer: str,
+        index_version: int = None,
+    ):
+        """Yanıtı cache'e ekler (cache'lenemeyen intent'ler yok sayılır)."""
+        if intent not in CACHEABLE_INTENTS or not final_answer:
+            return
+
+        with self._lock:
+            self._check_index_version(index_version)
+            self._entries[self._next_id] = {
+                "vector": self._normalize(embedding),
+                "partition": self._partition(active_levels, compress_context),
+                "intent": intent,
+                "final_answer": final_answer,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Tüm kayıtları siler."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Cache sayaçlarını döndürür."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Süreç genelinde paylaşılan AnswerCache örneğini döndürür."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+    return _answer_cache
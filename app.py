@@ -1,6 +1,6 @@
 import streamlit as st
 from chat import ChatSession, initialize_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
+from checkpointer import get_checkpointer
 
 # Sayfa konfigürasyonu
 st.set_page_config(
@@ -59,7 +59,7 @@ with st.sidebar:
             # İlk başlatma - LLM ve checkpointer oluştur
             if st.session_state.llm is None:
                 st.session_state.llm = initialize_chat_model()
-                st.session_state.checkpointer = InMemorySaver()
+                st.session_state.checkpointer = get_checkpointer()  # Tüm session'lar arasında paylaşılır
             
             st.session_state.chat_session = ChatSession(
                 st.session_state.llm, 
@@ -86,7 +86,7 @@ with st.sidebar:
     
     # Yeni sohbet butonu
     if st.button("🔄 Yeni Sohbet", use_container_width=True):
-        # Checkpointer'ı temizle (yeni thread ID)
+        # Eski thread'i checkpointer'dan sil (yeni thread ID)
         if st.session_state.chat_session:
             st.session_state.chat_session.clear_history()
         
@@ -137,11 +137,9 @@ else:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Bot yanıtını al
+        # Bot yanıtını al - token'lar geldikçe ekrana yazılır
         with st.chat_message("assistant"):
-            with st.spinner("Düşünüyorum..."):
-                response = st.session_state.chat_session.chat(prompt)
-                st.markdown(response)
+            response = st.write_stream(st.session_state.chat_session.stream(prompt))
         
         # Bot mesajını kaydet
         st.session_state.messages.append({"role": "assistant", "content": response})
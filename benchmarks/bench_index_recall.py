@@ -0,0 +1,166 @@
+"""
+Index Recall Benchmark
+FAISS indeks tiplerinin (HNSW, IVF-SQ8, IVF-PQ, PCA) recall / gecikme / bellek
+dengesini düz (flat) indeksin tam sonuçlarına karşı ölçer.
+
+Varsayılan veri: embedding benzeri kümelenmiş, normalize sentetik vektörler.
+Kurulum parametreleri (HNSW_M, IVF_NLIST, PQ_M, ...) vector_index ile aynı
+env değişkenlerinden okunur.
+
+Kullanım:
+    python benchmarks/bench_index_recall.py
+    python benchmarks/bench_index_recall.py --count 100000 --dim 3072 --pca 256
+    python benchmarks/bench_index_recall.py --vectors embeddings.npy --output recall.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+# Repo kökünü import path'e ekle (benchmarks/ altından çalıştırılabilsin)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import create_vector_index, configure_search, get_factory_string
+
+
+# --- CONFIGURATION ---
+EF_SEARCH_VALUES = (16, 32, 64, 128)
+NPROBE_VALUES = (1, 4, 16, 64)
+CLUSTER_COUNT = 200  # Sentetik veride konu kümesi sayısı
+CLUSTER_NOISE = 0.6  # Küme içi dağılım (büyüdükçe sorgular zorlaşır)
+
+
+def make_vectors(count: int, dim: int, queries: int, seed: int) -> tuple:
+    """
+    Kümelenmiş, birim uzunluklu sentetik vektörler üretir.
+
+    Returns:
+        (veritabanı matrisi, sorgu matrisi); sorgular aynı dağılımdan ama veritabanı dışından
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(CLUSTER_COUNT, dim)).astype(np.float32)
+
+    def sample(n: int) -> np.ndarray:
+        points = centers[rng.integers(0, CLUSTER_COUNT, n)] + CLUSTER_NOISE * rng.normal(size=(n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(count), sample(queries)
+
+
+def load_vectors(path: str, queries: int, seed: int) -> tuple:
+    """Kayıtlı embedding matrisinden (.npy) rastgele sorgu satırları ayırır."""
+    vectors = np.load(path).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(vectors), size=min(queries, len(vectors) // 10), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[query_rows] = False
+    return vectors[mask], vectors[query_rows]
+
+
+def recall_at_k(found: np.ndarray, exact: np.ndarray) -> float:
+    """Ortalama recall@k: tam sonuçların kaçı yaklaşık sonuçlarda var."""
+    hits = sum(len(set(row) & set(truth)) for row, truth in zip(found, exact))
+    return hits / exact.size
+
+
+def time_queries(index: faiss.Index, queries: np.ndarray, k: int) -> tuple:
+    """Sorguları tek tek (production'daki gibi) arar; (sonuç id'leri, ms listesi) döndürür."""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    timings = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids[i] = index.search(query.reshape(1, -1), k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return ids, timings
+
+
+def index_size_mb(index: faiss.Index) -> float:
+    return len(faiss.serialize_index(index)) / (1024 * 1024)
+
+
+def run_benchmark(vectors: np.ndarray, queries: np.ndarray, k: int, pca_dim: int) -> list:
+    """
+    Her indeks tipini kurar, arama parametresi taramasıyla ölçer.
+
+    Returns:
+        Sonuç satırları (tip, factory, parametre, recall, gecikme, bellek, kurulum süresi)
+    """
+    count, dim = vectors.shape
+    configs = [("flat", 0, [None]), ("hnsw", 0, EF_SEARCH_VALUES), ("ivfsq8", 0, NPROBE_VALUES), ("ivfpq", 0, NPROBE_VALUES)]
+    if pca_dim:
+        configs += [("flat", pca_dim, [None]), ("hnsw", pca_dim, EF_SEARCH_VALUES), ("ivfsq8", pca_dim, NPROBE_VALUES)]
+
+    exact = None
+    rows = []
+    for index_type, pca, params in configs:
+        factory = get_factory_string(count, dim, index_type, pca)
+        start = time.perf_counter()
+        index = create_vector_index(vectors, index_type, pca)
+        build_seconds = time.perf_counter() - start
+        size_mb = index_size_mb(index)
+
+        for param in params:
+            if index_type == "hnsw":
+                configure_search(index, ef_search=param)
+            elif param is not None:
+                configure_search(index, nprobe=param)
+
+            ids, timings = time_queries(index, queries, k)
+            if exact is None:
+                exact = ids  # İlk satır PCA'sız flat: tam sonuçlar
+            timings.sort()
+            rows.append({
+                "type": index_type,
+                "factory": factory,
+                "param": param,
+                f"recall@{k}": round(recall_at_k(ids, exact), 4),
+                "p50_ms": round(timings[len(timings) // 2], 4),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 4),
+                "size_mb": round(size_mb, 2),
+                "build_s": round(build_seconds, 2),
+            })
+            print_row(rows[-1], k)
+    return rows
+
+
+def print_row(row: dict, k: int):
+    param = "" if row["param"] is None else str(row["param"])
+    print(f"{row['factory']:<26} {param:>6} {row[f'recall@{k}']:>10.4f} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+          f"{row['size_mb']:>9.1f} {row['build_s']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS indeks tipleri için recall / gecikme / bellek raporu")
+    parser.add_argument("--count", type=int, default=20000, help="Sentetik vektör sayısı")
+    parser.add_argument("--dim", type=int, default=768, help="Sentetik vektör boyutu (Gemini: 3072)")
+    parser.add_argument("--vectors", help="Sentetik yerine kullanılacak embedding matrisi (.npy)")
+    parser.add_argument("--queries", type=int, default=500, help="Sorgu sayısı")
+    parser.add_argument("-k", type=int, default=10, help="Recall@k")
+    parser.add_argument("--pca", type=int, default=0, help="PCA'lı varyantları da ölç (hedef boyut)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Sonuçları JSON olarak kaydet")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors, queries = load_vectors(args.vectors, args.queries, args.seed)
+    else:
+        vectors, queries = make_vectors(args.count, args.dim, args.queries, args.seed)
+
+    print(f"\n📐 {len(vectors)} vektör × {vectors.shape[1]} boyut, {len(queries)} sorgu, k={args.k}")
+    print(f"\n{'Factory':<26} {'param':>6} {f'recall@{args.k}':>10} {'p50 ms':>9} {'p95 ms':>9} {'MB':>9} {'build s':>8}")
+    print("-" * 83)
+    rows = run_benchmark(vectors, queries, args.k, args.pca)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"count": len(vectors), "dim": vectors.shape[1], "k": args.k, "results": rows}, f, indent=2)
+        print(f"\n💾 Sonuçlar: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+News Parsing Benchmark
+Kayıtlı fixture sayfaları üzerinde parser modlarının sayfa başı parse süresini ölçer
+
+Kullanım:
+    python benchmarks/bench_news_parsing.py
+    python benchmarks/bench_news_parsing.py --iterations 500
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Repo kökünü import path'e ekle (benchmarks/ altından çalıştırılabilsin)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.news_scraper import parse_news_list, parse_news_detail, LXML_AVAILABLE
+
+
+# --- CONFIGURATION ---
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PARSER_MODES = ("html.parser", "lxml")
+
+# (fixture dosyası, parse fonksiyonu)
+FIXTURES = [
+    ("news_list.html", parse_news_list),
+    ("news_detail.html", parse_news_detail),
+    ("news_detail_single_paragraph.html", parse_news_detail),
+]
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def time_parse(parse_func, html: str, parser: str, iterations: int) -> list:
+    """Her iterasyonun süresini milisaniye cinsinden döndürür."""
+    parse_func(html, parser=parser)  # Isınma
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parse_func(html, parser=parser)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_benchmark(iterations: int) -> bool:
+    """
+    Tüm fixture'ları her iki modda ölçer ve çıktıların aynı olduğunu doğrular.
+
+    Returns:
+        Tüm fixture'larda çıktılar birebir aynıysa True
+    """
+    if not LXML_AVAILABLE:
+        print("❌ lxml kurulu değil, hızlı mod ölçülemiyor (pip install lxml)")
+        return False
+
+    all_identical = True
+    print(f"\n{'Fixture':<38} {'Mod':<12} {'median ms':>10} {'p95 ms':>10}")
+    print("-" * 74)
+
+    for name, parse_func in FIXTURES:
+        html = load_fixture(name)
+
+        outputs = {mode: parse_func(html, parser=mode) for mode in PARSER_MODES}
+        identical = outputs["lxml"] == outputs["html.parser"]
+        all_identical = all_identical and identical
+
+        medians = {}
+        for mode in PARSER_MODES:
+            timings = sorted(time_parse(parse_func, html, mode, iterations))
+            medians[mode] = statistics.median(timings)
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{name:<38} {mode:<12} {medians[mode]:>10.3f} {p95:>10.3f}")
+
+        speedup = medians["html.parser"] / medians["lxml"]
+        print(f"{'':<38} {'→ ' + f'{speedup:.1f}x':<12} {'aynı çıktı' if identical else '❌ FARKLI ÇIKTI'}")
+
+    return all_identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Haber parser modlarını karşılaştır")
+    parser.add_argument("--iterations", type=int, default=200, help="Fixture başına ölçüm sayısı")
+    args = parser.parse_args()
+
+    ok = run_benchmark(args.iterations)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,516 @@
+"""
+Chat Replay Benchmark
+Kayıtlı veli sorularını ChatSession.chat üzerinden yeniden oynatır ve
+node başına / uçtan uca gecikme, throughput ve bellek ölçer.
+
+Dış servisler deterministik yerel taklitlerle değiştirilir:
+- Gemini chat     → ReplayChatModel (sabit yanıt, kayıtlı intent, simüle gecikme)
+- Gemini embedding → ReplayEmbeddings (hash'lenmiş kelime torbası, simüle gecikme)
+- Okul web sitesi  → yerel HTTP sunucusu (benchmarks/fixtures/news_*.html)
+
+Sonuçlar JSON olarak kaydedilir; --compare ile iki commit karşılaştırılır.
+
+Kullanım:
+    python benchmarks/replay_chat.py
+    python benchmarks/replay_chat.py --concurrency 8 --repeat 3
+    python benchmarks/replay_chat.py --mode async --concurrency 16
+    python benchmarks/replay_chat.py --compare benchmarks/results/replay_chat-abc1234.json
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import contextlib
+import subprocess
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Repo kökünü import path'e ekle (benchmarks/ altından çalıştırılabilsin)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+# --- CONFIGURATION ---
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CORPUS_PATH = os.path.join(FIXTURES_DIR, "parent_questions.json")
+LIVE_SITE_URL = "https://www.cozumkoleji.com.tr"  # Fixture'lardaki mutlak linkler yerel sunucuya çevrilir
+EMBEDDING_SIZE = 3072  # gemini-embedding-001 boyutu
+COMPARE_METRICS = ("p50", "p95", "p99")
+
+# Repo modülleri import edilmeden önce uygulanır (modül sabitleri env'den okunur)
+BENCHMARK_ENV = {
+    "NEWS_CRAWLER_ENABLED": "0",   # Arka plan taraması ölçümü bozmasın
+    "NEWS_INDEX_PATH": "",         # Haber sorguları canlı scraping yolundan (yerel sunucu) geçer
+    "NEWS_CACHE_PATH": "",         # Her turda liste/detay sayfaları gerçekten çekilir
+    "QUERY_CACHE_PATH": "",
+    "METRICS_WINDOW": "1000000",   # Histogramlar tüm koşuyu kapsasın
+    "GOOGLE_API_KEY": "replay",    # Gerçek anahtar gerekmez, hiçbir istek Google'a gitmez
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Kayıtlı veli sorularıyla ChatSession replay benchmark'ı")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Sohbet korpusu (JSON)")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="chat() veya achat()")
+    parser.add_argument("--concurrency", type=int, default=1, help="Eşzamanlı sohbet sayısı")
+    parser.add_argument("--repeat", type=int, default=1, help="Korpusun kaç kez oynatılacağı")
+    parser.add_argument("--warmup", type=int, default=1, help="Ölçüm öncesi oynatılan sohbet sayısı")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="Simüle LLM çağrı gecikmesi")
+    parser.add_argument("--embedding-latency-ms", type=float, default=80.0, help="Simüle embedding çağrı gecikmesi")
+    parser.add_argument("--site-latency-ms", type=float, default=150.0, help="Simüle web sitesi yanıt gecikmesi")
+    parser.add_argument("--checkpointer", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--compress", action="store_true", help="Context compression açık")
+    parser.add_argument("--answer-cache", action="store_true", help="Semantic answer cache açık (tekrarlar cache'ten döner)")
+    parser.add_argument("--no-speculative", action="store_true", help="Spekülatif retrieval kapalı")
+    parser.add_argument("--tracemalloc", action="store_true", help="Python heap zirvesini de ölç (yavaşlatır)")
+    parser.add_argument("--output", help="Sonuç JSON yolu (varsayılan: benchmarks/results/replay_chat-<commit>.json)")
+    parser.add_argument("--compare", help="Karşılaştırılacak önceki sonuç JSON'u")
+    parser.add_argument("--verbose", action="store_true", help="Repo çıktılarını gizleme")
+    return parser.parse_args()
+
+
+# ============================================================================
+# YEREL WEB SİTESİ
+# ============================================================================
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def start_site_server(latency_ms: float) -> ThreadingHTTPServer:
+    """
+    Duyuru liste / detay fixture'larını sunan yerel HTTP sunucusu.
+
+    Liste sayfasındaki mutlak linkler sunucunun adresine çevrilir; böylece
+    detay istekleri de yerelde kalır.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), None)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    pages = {
+        "/icerik/duyurular/liste": load_fixture("news_list.html").replace(LIVE_SITE_URL, base_url).encode("utf-8"),
+        "/tr/duyuru/": load_fixture("news_detail.html").replace(LIVE_SITE_URL, base_url).encode("utf-8"),
+    }
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive (bağlantı havuzu gerçekçi çalışsın)
+        # Header'lar tamponlanır, ama fixture body'leri (30-40 KB) tampondan büyük olduğundan ayrı gider:
+        # TCP_NODELAY olmadan Nagle + delayed ACK her yanıtı ~40 ms bekletir
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = next((page for prefix, page in pages.items() if self.path.startswith(prefix)), None)
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server.RequestHandlerClass = FixtureHandler
+    server.daemon_threads = True
+    server.base_url = base_url
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================================================
+# GEMINI TAKLİTLERİ
+# ============================================================================
+
+def build_stand_ins(corpus: list, llm_latency_ms: float, embedding_latency_ms: float):
+    """
+    Deterministik chat ve embedding modellerini oluşturur.
+
+    Repo modülleri (langchain, lexical_index) env ayarlandıktan sonra
+    import edilmeli; bu yüzden sınıflar burada tanımlanır.
+
+    Returns:
+        (chat_model, embedding_model)
+    """
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.runnables import RunnableLambda
+
+    from intent_detector import IntentDetection
+    from lexical_index import tokenize
+    from token_budget import estimate_tokens, get_message_text
+
+    # Uzun sorular önce: "Ücretler ne kadar?" gibi kısa sorular uzun olanların içinde eşleşmesin
+    recorded_intents = sorted(
+        {turn["question"]: turn["intent"] for conversation in corpus for turn in conversation["turns"]}.items(),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+
+    class ReplayChatModel(BaseChatModel):
+        """Gemini chat taklidi: sabit yanıt metni, kayıtlı intent, simüle gecikme."""
+
+        latency_ms: float = 0.0
+
+        @property
+        def _llm_type(self) -> str:
+            return "replay-chat"
+
+        def _respond(self, messages) -> ChatResult:
+            prompt = "\n".join(get_message_text(message) for message in messages)
+            seed = zlib.crc32(prompt.encode("utf-8"))
+            text = (
+                f"Yanıt #{seed % 1000}: Okulumuzda bu konuda kademeye özel bir program uygulanmaktadır. "
+                "Ayrıntılı bilgi için rehberlik servisimizle iletişime geçebilirsiniz."
+            )
+            message = AIMessage(
+                content=text,
+                usage_metadata={
+                    "input_tokens": estimate_tokens(prompt),
+                    "output_tokens": estimate_tokens(text),
+                    "total_tokens": estimate_tokens(prompt) + estimate_tokens(text),
+                },
+            )
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            time.sleep(self.latency_ms / 1000)
+            return self._respond(messages)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            await asyncio.sleep(self.latency_ms / 1000)
+            return self._respond(messages)
+
+        def with_structured_output(self, schema, **kwargs):
+            """Intent detection: prompt'taki korpus sorusunun kayıtlı intent'i."""
+            def detect(prompt) -> IntentDetection:
+                text = prompt if isinstance(prompt, str) else str(prompt)
+                intent = next((intent for question, intent in recorded_intents if question in text), "unknown")
+                return IntentDetection(intent=intent, confidence=0.95, reasoning="replay")
+
+            def invoke(prompt):
+                time.sleep(self.latency_ms / 1000)
+                return detect(prompt)
+
+            async def ainvoke(prompt):
+                await asyncio.sleep(self.latency_ms / 1000)
+                return detect(prompt)
+
+            return RunnableLambda(invoke, afunc=ainvoke)
+
+    class ReplayEmbeddings(Embeddings):
+        """Gemini embedding taklidi: hash'lenmiş kelime torbası (aynı metin → aynı vektör)."""
+
+        def __init__(self, latency_ms: float, size: int = EMBEDDING_SIZE):
+            self.latency_ms = latency_ms
+            self.size = size
+
+        def _embed(self, text: str) -> list:
+            vector = np.zeros(self.size, dtype=np.float32)
+            for term in tokenize(text):
+                vector[zlib.crc32(term.encode("utf-8")) % self.size] += 1.0
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                vector[0] = norm = 1.0
+            return (vector / norm).tolist()
+
+        def embed_documents(self, texts: list) -> list:
+            time.sleep(self.latency_ms / 1000)  # Batch başına tek API çağrısı
+            return [self._embed(text) for text in texts]
+
+        def embed_query(self, text: str) -> list:
+            time.sleep(self.latency_ms / 1000)
+            return self._embed(text)
+
+        async def aembed_documents(self, texts: list) -> list:
+            await asyncio.sleep(self.latency_ms / 1000)
+            return [self._embed(text) for text in texts]
+
+        async def aembed_query(self, text: str) -> list:
+            await asyncio.sleep(self.latency_ms / 1000)
+            return self._embed(text)
+
+    return ReplayChatModel(latency_ms=llm_latency_ms), ReplayEmbeddings(embedding_latency_ms)
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def replay_conversation(llm, conversation: dict, options: dict) -> list:
+    """Bir sohbeti yeni bir ChatSession ile oynatır; tur başına (ms, hata) döndürür."""
+    from chat import ChatSession
+
+    session = ChatSession(llm, **options)
+    session.set_levels(conversation["levels"])
+    results = []
+    for turn in conversation["turns"]:
+        started = time.perf_counter()
+        try:
+            session.chat(turn["question"])
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append(((time.perf_counter() - started) * 1000, error))
+    return results
+
+
+async def areplay_conversation(llm, conversation: dict, options: dict, semaphore: asyncio.Semaphore) -> list:
+    """replay_conversation'ın achat() ile async versiyonu."""
+    from chat import ChatSession
+
+    async with semaphore:
+        session = ChatSession(llm, **options)
+        session.set_levels(conversation["levels"])
+        results = []
+        for turn in conversation["turns"]:
+            started = time.perf_counter()
+            try:
+                await session.achat(turn["question"])
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.append(((time.perf_counter() - started) * 1000, error))
+        return results
+
+
+def run_replay(llm, conversations: list, options: dict, mode: str, concurrency: int) -> list:
+    """Sohbetleri eşzamanlı oynatır; tüm turların (ms, hata) listesini döndürür."""
+    if mode == "async":
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(
+                areplay_conversation(llm, conversation, options, semaphore) for conversation in conversations
+            ))
+        batches = asyncio.run(run_all())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            batches = list(executor.map(lambda conversation: replay_conversation(llm, conversation, options), conversations))
+    return [result for batch in batches for result in batch]
+
+
+def summarize_latencies(values: list) -> dict:
+    """Registry histogramlarıyla aynı biçimde özet (count, mean, max, p50, p95, p99)."""
+    from instrumentation import percentile, PERCENTILES
+
+    values = sorted(values)
+    summary = {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "max": values[-1] if values else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = percentile(values, pct)
+    return {name: round(value, 3) for name, value in summary.items()}
+
+
+def peak_rss_mb() -> float:
+    """Sürecin şimdiye kadarki en yüksek RSS'i (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # macOS: byte, Linux: KB
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """
+    Ortamı hazırlar, korpusu oynatır ve sonuç sözlüğünü döndürür.
+
+    Çalışma dizini geçici bir klasöre alınır (faiss_index, embedding_cache ve
+    sqlite dosyaları repo'yu kirletmez); chunks/ repo'dan bağlanır.
+    """
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    server = start_site_server(args.site_latency_ms)
+    os.environ.update(BENCHMARK_ENV)
+    os.environ["NEWS_SITE_URL"] = server.base_url
+    os.environ["CHECKPOINTER_BACKEND"] = args.checkpointer
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+    workdir = tempfile.mkdtemp(prefix="replay_chat_")
+    os.symlink(os.path.join(REPO_ROOT, "chunks"), os.path.join(workdir, "chunks"))
+    os.chdir(workdir)
+
+    import retriever
+    from instrumentation import get_metrics_registry, enable_console_trace, INSTRUMENTATION_ENABLED
+
+    if args.verbose:
+        enable_console_trace()
+
+    llm, embeddings = build_stand_ins(corpus, args.llm_latency_ms, args.embedding_latency_ms)
+    retriever._retriever_service = retriever.RetrieverService(embedding_model=embeddings)
+    options = {
+        "compress_context": args.compress,
+        "use_answer_cache": args.answer_cache,
+        "speculative": not args.no_speculative,
+    }
+
+    # İndeks oluşturma ve ilk import'lar ölçüme girmesin
+    print(f"⏳ İndeks hazırlanıyor ve ısınılıyor ({workdir})...", file=sys.stderr)
+    retriever.get_retriever_service().warm_up()
+    run_replay(llm, corpus[:args.warmup], options, args.mode, 1)
+
+    conversations = corpus * args.repeat
+    registry = get_metrics_registry()
+    registry.reset()
+    rss_before = peak_rss_mb()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    print(f"▶️  {len(conversations)} sohbet, concurrency={args.concurrency}, mode={args.mode}", file=sys.stderr)
+    started = time.perf_counter()
+    turns = run_replay(llm, conversations, options, args.mode, args.concurrency)
+    wall_seconds = time.perf_counter() - started
+
+    heap_peak_mb = None
+    if args.tracemalloc:
+        heap_peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    snapshot = registry.snapshot()
+    latencies = [ms for ms, error in turns if error is None]
+    errors = [error for _, error in turns if error is not None]
+    server.shutdown()
+
+    return {
+        "benchmark": "replay_chat",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            "corpus": os.path.relpath(args.corpus, REPO_ROOT),
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "llm_latency_ms": args.llm_latency_ms,
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "site_latency_ms": args.site_latency_ms,
+            "checkpointer": args.checkpointer,
+            **options,
+        },
+        "turns": len(turns),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_turns_per_s": round(len(turns) / wall_seconds, 3) if wall_seconds else 0.0,
+        "end_to_end_ms": summarize_latencies(latencies),
+        # Node histogramları instrumentation registry'sinden (INSTRUMENTATION_ENABLED=0 ise boş)
+        "instrumented": INSTRUMENTATION_ENABLED,
+        "nodes_ms": {
+            name[len("node."):-len(".ms")]: {key: round(value, 3) for key, value in summary.items()}
+            for name, summary in snapshot["histograms"].items()
+            if name.startswith("node.") and name.endswith(".ms")
+        },
+        "counters": snapshot["counters"],
+        "memory": {
+            "peak_rss_mb": round(peak_rss_mb(), 2),
+            "rss_growth_mb": round(peak_rss_mb() - rss_before, 2),
+            "heap_peak_mb": heap_peak_mb,
+        },
+    }
+
+
+# ============================================================================
+# RAPOR
+# ============================================================================
+
+def print_report(result: dict):
+    e2e = result["end_to_end_ms"]
+    print(f"\n📊 Replay ({result['commit']}): {result['turns']} tur, {result['errors']} hata, "
+          f"{result['wall_seconds']:.2f} sn → {result['throughput_turns_per_s']:.2f} tur/sn")
+    print(f"   Uçtan uca ms: p50={e2e['p50']:.1f}  p95={e2e['p95']:.1f}  p99={e2e['p99']:.1f}  max={e2e['max']:.1f}")
+    memory = result["memory"]
+    heap = f", heap zirvesi {memory['heap_peak_mb']} MB" if memory["heap_peak_mb"] is not None else ""
+    print(f"   Bellek: RSS zirvesi {memory['peak_rss_mb']} MB (+{memory['rss_growth_mb']} MB){heap}")
+    for sample in result["error_samples"]:
+        print(f"   ❌ {sample}")
+
+    print(f"\n{'Node':<24} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    print("-" * 64)
+    for node, summary in sorted(result["nodes_ms"].items(), key=lambda item: -item[1]["p50"]):
+        print(f"{node:<24} {summary['count']:>7} {summary['p50']:>10.2f} {summary['p95']:>10.2f} {summary['p99']:>10.2f}")
+
+
+def format_delta(old: float, new: float) -> str:
+    if not old:
+        return ""
+    change = (new - old) / old * 100
+    return f"{change:+.1f}%"
+
+
+def print_comparison(baseline: dict, result: dict):
+    """Önceki koşuya göre gecikme, throughput ve bellek farkları (pozitif = artış)."""
+    print(f"\n🔍 Karşılaştırma: {baseline['commit']} → {result['commit']}")
+    if baseline.get("config") != result.get("config"):
+        print("   ⚠️  Koşu ayarları farklı, sonuçlar doğrudan karşılaştırılamayabilir")
+
+    rows = [("throughput tur/sn", baseline["throughput_turns_per_s"], result["throughput_turns_per_s"])]
+    rows += [(f"uçtan uca {metric}", baseline["end_to_end_ms"][metric], result["end_to_end_ms"][metric])
+             for metric in COMPARE_METRICS]
+    rows.append(("RSS zirvesi MB", baseline["memory"]["peak_rss_mb"], result["memory"]["peak_rss_mb"]))
+    for node in sorted(set(baseline["nodes_ms"]) | set(result["nodes_ms"])):
+        old, new = baseline["nodes_ms"].get(node), result["nodes_ms"].get(node)
+        if old and new:
+            rows.append((f"{node} p50", old["p50"], new["p50"]))
+            rows.append((f"{node} p95", old["p95"], new["p95"]))
+
+    print(f"\n{'Metrik':<32} {'önce':>10} {'sonra':>10} {'fark':>9}")
+    print("-" * 64)
+    for name, old, new in rows:
+        print(f"{name:<32} {old:>10.2f} {new:>10.2f} {format_delta(old, new):>9}")
+
+
+def main():
+    args = parse_args()
+    args.corpus = os.path.abspath(args.corpus)
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    # Repo modüllerinin emoji log'ları rapora karışmasın
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        result = run_benchmark(args)
+
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"replay_chat-{result['commit']}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print_report(result)
+    if baseline:
+        print_comparison(baseline, result)
+    print(f"\n💾 Sonuçlar: {output_path}")
+    return result["errors"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -5,15 +5,23 @@ Production-ready, modular, testable chatbot system
 
 import os
 from dotenv import load_dotenv
-import traceback
+from typing import Iterator
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from workflow import create_workflow
 from state_schema import create_initial_state, ChatState
-from retriever import SUPPORTED_LEVELS
+from retriever import SUPPORTED_LEVELS, get_retriever_service
+from answer_cache import AnswerCache, get_answer_cache
+from intent_detector import get_local_intent_classifier, LOCAL_INTENT_THRESHOLD
+from news_index import start_news_crawler
+from checkpointer import get_checkpointer
+from token_budget import get_message_text
+from instrumentation import track_turn, count_event, get_turn_callbacks, get_trace_logger, enable_console_trace
+
+logger = get_trace_logger("chat")
 
 # --- CONFIGURATION ---
 def initialize_chat_model() -> ChatGoogleGenerativeAI:
@@ -33,6 +41,15 @@ def initialize_chat_model() -> ChatGoogleGenerativeAI:
     )
 
 
+# Token'ları kullanıcıya stream edilen node'lar
+STREAMING_NODES = ("answer", "direct_answer")
+
+
+def new_thread_id() -> str:
+    """Yeni, benzersiz bir sohbet thread ID'si üretir."""
+    return f"thread_{os.urandom(8).hex()}"
+
+
 def get_level_display_name(level: str) -> str:
     """Seviye kodunu kullanıcı dostu isme çevirir."""
     mapping = {
@@ -53,8 +70,9 @@ class ChatSession:
     - Modüler prompt sistemi (role, style, context, output ayrı)
     - LangGraph native memory management (checkpointer)
     - Her node izole ve test edilebilir
-    - Sliding window memory (LangGraph manages)
+    - Token bütçeli geçmiş + eski turların rolling özeti (history compaction node)
     - Production-ready error handling
+    - Semantic answer cache (tekrar eden sorulara LLM çağrısı yok)
     
     ❌ ESKİ SİSTEM (KALDIRILDI):
     - create_agent (tool-based agent)
@@ -63,15 +81,28 @@ class ChatSession:
     - Tool dispatch belirsizliği
     """
     
-    def __init__(self, llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = None, compress_context: bool = False):
+    def __init__(self, llm: ChatGoogleGenerativeAI, checkpointer: BaseCheckpointSaver = None, compress_context: bool = False,
+                 use_answer_cache: bool = True, answer_cache: AnswerCache = None, speculative: bool = True,
+                 thread_id: str = None):
         self.llm = llm
-        self.checkpointer = checkpointer or InMemorySaver()
+        self.checkpointer = checkpointer or get_checkpointer()  # Varsayılan: paylaşılan InMemorySaver (SQLite: CHECKPOINTER_BACKEND=sqlite)
         self.levels = None  # Seçili eğitim kademeleri
-        self.thread_id = "default"
+        # Checkpointer session'lar arasında paylaşıldığı için her session kendi thread'ini kullanır
+        # (thread_id verilirse kaydedilmiş sohbete devam edilir)
+        self.thread_id = thread_id or new_thread_id()
+        # Thread'de önceki tur var mı? (answer cache sadece ilk soruyu saklar)
+        self._has_history = thread_id is not None and self.checkpointer.get_tuple(
+            {"configurable": {"thread_id": thread_id}}
+        ) is not None
         self.compress_context = compress_context  # Context compression control (A/B test için - DEFAULT: OFF)
+        self.use_answer_cache = use_answer_cache
+        self.answer_cache = answer_cache or get_answer_cache()  # Tüm session'lar arasında paylaşılır
+        
+        # LangGraph workflow oluştur (speculative: retrieval intent detection ile paralel)
+        self.workflow = create_workflow(self.llm, self.checkpointer, speculative=speculative)
         
-        # LangGraph workflow oluştur
-        self.workflow = create_workflow(self.llm, self.checkpointer)
+        # Duyuru arşivini arka planda yerel indekse tara (süreç başına bir kez)
+        start_news_crawler()
     
     def set_levels(self, levels: list[str]):
         """
@@ -81,12 +112,154 @@ class ChatSession:
             levels: Seçili kademe listesi (örn: ["anaokulu", "lise"])
         """
         self.levels = levels
-        print(f"\n✅ Kademe güncellendi: {', '.join(levels)}")
+        logger.info("✅ Kademe güncellendi: %s", ", ".join(levels))
     
     def clear_history(self):
-        """Sohbet geçmişini temizle - yeni thread ID oluştur."""
-        self.thread_id = f"thread_{os.urandom(8).hex()}"
-        print(f"\n🗑️  Sohbet geçmişi temizlendi (yeni thread: {self.thread_id})")
+        """Sohbet geçmişini temizle - eski thread'i checkpointer'dan sil, yeni thread ID oluştur."""
+        self.checkpointer.delete_thread(self.thread_id)
+        self.thread_id = new_thread_id()
+        self._has_history = False
+        logger.info("🗑️  Sohbet geçmişi temizlendi (yeni thread: %s)", self.thread_id)
+    
+    def _new_turn(self, user_query: str) -> dict:
+        """Tur bilgilerini oluşturur: config, aktif kademeler ve yeni kullanıcı mesajı."""
+        # Active levels
+        active_levels = self.levels if self.levels else list(SUPPORTED_LEVELS)
+        
+        return {
+            "user_query": user_query,
+            # callbacks: LLM token sayaçları (instrumentation açıksa, node'lardaki tüm LLM çağrılarına yayılır)
+            "config": {"configurable": {"thread_id": self.thread_id}, "callbacks": get_turn_callbacks()},
+            "active_levels": active_levels,
+            # Sadece yeni mesaj - add_messages reducer checkpoint'teki geçmişe ekler
+            "messages": [HumanMessage(content=user_query)],
+            "query_embedding": None,
+            "is_first_turn": not self._has_history,
+            "cached_answer": None,
+            "initial_state": None,
+        }
+    
+    def _lookup_answer_cache(self, turn: dict, query_embedding: list, local_detection) -> dict:
+        """
+        Answer cache'e bakar. Hit ise checkpoint'e yazılacak state değerlerini döndürür.
+        
+        Cache anahtarı yerel intent'i içerir; yerel sınıflandırıcı emin değilse
+        cache'e hiç bakılmaz (başka bir intent'in yanıtı dönmesin diye).
+        Sadece sohbetin ilk sorusu için çağrılır (_finish_turn da sadece onu saklar).
+        """
+        retriever_service = get_retriever_service()
+        turn["query_embedding"] = query_embedding
+        
+        if local_detection.confidence < LOCAL_INTENT_THRESHOLD:
+            count_event("answer_cache_skipped")
+            return None
+        
+        cached = self.answer_cache.lookup(
+            query_embedding,
+            turn["active_levels"],
+            self.compress_context,
+            intent=local_detection.intent,
+            index_version=retriever_service.version
+        )
+        if not cached:
+            count_event("answer_cache_misses")
+            return None
+        
+        count_event("answer_cache_hits")
+        logger.info("⚡ [CHAT SESSION] Answer cache hit (similarity: %.3f, intent: %s)", cached["similarity"], cached["intent"])
+        turn["cached_answer"] = cached["final_answer"]
+        
+        # Soru-cevabı yine de geçmişe ekle (takip soruları için)
+        return {
+            "messages": turn["messages"] + [AIMessage(content=cached["final_answer"])],
+            "user_query": turn["user_query"],
+            "active_levels": turn["active_levels"],
+            "intent": cached["intent"],
+            "final_answer": cached["final_answer"],
+        }
+    
+    def _start_workflow_turn(self, turn: dict):
+        """Cache miss: workflow için initial state oluşturur."""
+        # Create initial state
+        turn["initial_state"] = create_initial_state(
+            user_query=turn["user_query"],
+            active_levels=turn["active_levels"],
+            messages=turn["messages"],
+            compress_context=self.compress_context  # A/B test için
+        )
+        
+        logger.info(
+            "💬 [CHAT SESSION] Yeni soru işleniyor\n"
+            "   Thread ID: %s\n"
+            "   Aktif kademeler: %s\n"
+            "   İlk tur: %s\n"
+            "   🗜️  Context Compression: %s",
+            self.thread_id,
+            turn["active_levels"],
+            "evet" if turn["is_first_turn"] else "hayır",
+            "ON" if self.compress_context else "OFF",
+        )
+    
+    def _prepare_turn(self, user_query: str) -> dict:
+        """
+        Bir sohbet turunu hazırlar: geçmiş, answer cache kontrolü ve initial state.
+        
+        Returns:
+            Tur bilgileri: config, active_levels, query_embedding, is_first_turn
+            ve cache hit ise "cached_answer", değilse "initial_state"
+        """
+        turn = self._new_turn(user_query)
+        
+        # Semantic answer cache - workflow'dan önce; sadece ilk soru (takip soruları geçmişe bağlı, store tarafı da böyle)
+        if self.use_answer_cache and turn["is_first_turn"]:
+            query_embedding = get_retriever_service().query_cache.embed_query(user_query)  # Retrieve node bu embedding'i LRU'dan alır
+            local_detection = get_local_intent_classifier().classify(user_query)
+            cached_values = self._lookup_answer_cache(turn, query_embedding, local_detection)
+            if cached_values:
+                # Son node adına yazılır; bekleyen node kalmaz (compaction sonraki turda)
+                self.workflow.update_state(turn["config"], cached_values, as_node="compact_history")
+                self._has_history = True
+                return turn
+        
+        self._start_workflow_turn(turn)
+        return turn
+    
+    async def _aprepare_turn(self, user_query: str) -> dict:
+        """_prepare_turn'ün async versiyonu."""
+        turn = self._new_turn(user_query)
+        
+        if self.use_answer_cache and turn["is_first_turn"]:
+            query_embedding = await get_retriever_service().query_cache.aembed_query(user_query)
+            local_detection = await get_local_intent_classifier().aclassify(user_query)
+            cached_values = self._lookup_answer_cache(turn, query_embedding, local_detection)
+            if cached_values:
+                await self.workflow.aupdate_state(turn["config"], cached_values, as_node="compact_history")
+                self._has_history = True
+                return turn
+        
+        self._start_workflow_turn(turn)
+        return turn
+    
+    def _finish_turn(self, turn: dict, result: dict) -> str:
+        """Workflow sonucundan final yanıtı çıkarır ve gerekirse cache'ler."""
+        # Extract final answer
+        final_answer = result.get("final_answer") or "Üzgünüm, bir yanıt üretemedim."
+        self._has_history = True
+        
+        # İlk soru ise yanıtı cache'le (takip soruları geçmişe bağlı olduğu için cache'lenmez)
+        if turn["query_embedding"] is not None and turn["is_first_turn"]:
+            self.answer_cache.store(
+                turn["query_embedding"],
+                turn["active_levels"],
+                self.compress_context,
+                intent=result.get("intent"),
+                final_answer=result.get("final_answer"),
+                index_version=get_retriever_service().version
+            )
+        
+        logger.info("✅ [CHAT SESSION] Yanıt hazır (%d karakter)", len(final_answer))
+        
+        return final_answer
     
     def chat(self, user_query: str) -> str:
         """
@@ -100,63 +273,116 @@ class ChatSession:
         
         Memory:
         - LangGraph checkpointer otomatik manage eder
-        - Sliding window (last 10 messages) answer_node içinde
+        - Son turlar token bütçesiyle (HISTORY_TOKEN_BUDGET) verbatim, eskiler özet olarak
         - Thread-based conversation persistence
         
+        Answer Cache:
+        - Workflow'dan ÖNCE sorgu embedding'i ile cache'e bakılır
+        - Hit → kayıtlı yanıt döner, hiçbir LLM çağrısı yapılmaz
+        - Sadece sohbetin ilk sorusunun yanıtı cache'lenir (geçmişten bağımsız)
+        
         Args:
             user_query: Kullanıcının sorusu
         
         Returns:
             Final answer string
         """
-        try:
-            # Active levels
-            active_levels = self.levels if self.levels else list(SUPPORTED_LEVELS)
-            
-            # Get conversation history from checkpointer
-            config = {"configurable": {"thread_id": self.thread_id}}
-            
-            # Get existing messages from checkpointer (if any)
+        with track_turn(self.thread_id):
             try:
-                snapshot = self.workflow.get_state(config)
-                existing_messages = snapshot.values.get("messages", []) if snapshot else []
-            except:
-                existing_messages = []
-            
-            # Add new user message
-            messages = existing_messages + [HumanMessage(content=user_query)]
-            
-            # Create initial state
-            initial_state = create_initial_state(
-                user_query=user_query,
-                active_levels=active_levels,
-                messages=messages,
-                compress_context=self.compress_context  # A/B test için
-            )
-            
-            print(f"\n" + "="*80)
-            print(f"💬 [CHAT SESSION] Yeni soru işleniyor")
-            print(f"   Thread ID: {self.thread_id}")
-            print(f"   Aktif kademeler: {active_levels}")
-            print(f"   Mesaj geçmişi: {len(messages)} mesaj")
-            print(f"   🗜️  Context Compression: {'ON' if self.compress_context else 'OFF'}")
-            print("="*80)
-            
-            # Invoke workflow
-            result = self.workflow.invoke(initial_state, config)
-            
-            # Extract final answer
-            final_answer = result.get("final_answer", "Üzgünüm, bir yanıt üretemedim.")
-            
-            print(f"\n✅ [CHAT SESSION] Yanıt hazır ({len(final_answer)} karakter)")
-            print("="*80 + "\n")
-            
-            return final_answer
-            
-        except Exception as e:
-            print(f"\n❌ [CHAT SESSION] Hata oluştu:")
-            traceback.print_exc()
-            return "Üzgünüm, teknik bir sorun oluştu. Lütfen tekrar deneyin."
+                turn = self._prepare_turn(user_query)
+                if turn["cached_answer"] is not None:
+                    return turn["cached_answer"]
+                
+                # Invoke workflow
+                result = self.workflow.invoke(turn["initial_state"], turn["config"])
+                
+                return self._finish_turn(turn, result)
+                
+            except Exception:
+                count_event("chat_errors")
+                logger.exception("❌ [CHAT SESSION] Hata oluştu")
+                return "Üzgünüm, teknik bir sorun oluştu. Lütfen tekrar deneyin."
+    
+    async def achat(self, user_query: str) -> str:
+        """
+        chat()'in async versiyonu.
+        
+        Tüm node'lar async gövdeleriyle çalışır (LLM ainvoke, async embedding,
+        httpx ile scraping); tek süreç, istek başına thread ayırmadan çok
+        sayıda eşzamanlı sohbete hizmet verebilir.
+        
+        Args:
+            user_query: Kullanıcının sorusu
+        
+        Returns:
+            Final answer string
+        """
+        with track_turn(self.thread_id):
+            try:
+                turn = await self._aprepare_turn(user_query)
+                if turn["cached_answer"] is not None:
+                    return turn["cached_answer"]
+                
+                result = await self.workflow.ainvoke(turn["initial_state"], turn["config"])
+                
+                return self._finish_turn(turn, result)
+                
+            except Exception:
+                count_event("chat_errors")
+                logger.exception("❌ [CHAT SESSION] Hata oluştu")
+                return "Üzgünüm, teknik bir sorun oluştu. Lütfen tekrar deneyin."
+    
+    def stream(self, user_query: str) -> Iterator[str]:
+        """
+        Kullanıcı mesajını işler ve yanıtı token token üretir (generator).
+        
+        LangGraph "messages" stream mode ile answer node'undaki LLM token'ları
+        üretildikçe döndürülür; "values" mode ile final state alınır, yani final
+        yanıt chat() ile aynı şekilde checkpoint'lenir ve cache'lenir.
+        
+        LLM'siz yanıtlar (greeting, price, cache hit) tek parça olarak döner.
+        
+        Args:
+            user_query: Kullanıcının sorusu
+        
+        Yields:
+            Yanıt parçaları (string)
+        """
+        with track_turn(self.thread_id):
+            try:
+                turn = self._prepare_turn(user_query)
+                if turn["cached_answer"] is not None:
+                    yield turn["cached_answer"]
+                    return
+                
+                streamed = False
+                result = {}
+                for mode, payload in self.workflow.stream(
+                    turn["initial_state"],
+                    turn["config"],
+                    stream_mode=["messages", "values"]
+                ):
+                    if mode == "values":
+                        result = payload
+                        continue
+                    
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") not in STREAMING_NODES:
+                        continue  # Intent detection vb. ara LLM çağrıları
+                    
+                    text = get_message_text(chunk)
+                    if text:
+                        streamed = True
+                        yield text
+                
+                final_answer = self._finish_turn(turn, result)
+                if not streamed:
+                    yield final_answer
+                
+            except Exception:
+                count_event("chat_errors")
+                logger.exception("❌ [CHAT SESSION] Hata oluştu")
+                yield "Üzgünüm, teknik bir sorun oluştu. Lütfen tekrar deneyin."
 
 
 # Test
@@ -168,6 +394,7 @@ if __name__ == "__main__":
     3. Price (contact info)
     4. Unknown (fallback)
     """
+    enable_console_trace()
     print("🤖 Refactored Chat Session Test\n")
     
     llm = initialize_chat_model()
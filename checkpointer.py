@@ -0,0 +1,455 @@
+"""
+Bounded SQLite Checkpointer
+Sohbet state'lerini diskte tutan, boyutu sınırlı LangGraph checkpoint saver'ı
+"""
+
+import os
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from instrumentation import get_trace_logger
+
+logger = get_trace_logger("checkpointer")
+
+
+# --- CONFIGURATION ---
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory")  # "memory" veya "sqlite" (opt-in)
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3")
+CHECKPOINT_RETENTION = int(os.getenv("CHECKPOINT_RETENTION", "10"))  # Thread başına saklanan checkpoint
+CHECKPOINT_THREAD_TTL = int(os.getenv("CHECKPOINT_THREAD_TTL", "86400"))  # Saniye (boşta kalan thread)
+CHECKPOINT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))  # Toplam boyut sınırı
+CHECKPOINT_CLEANUP_INTERVAL = 60  # Saniye - TTL/boyut temizliği en fazla bu sıklıkta çalışır
+
+MIN_RETENTION = 2  # Çalışan tur için son checkpoint + parent'ı her zaman korunur
+
+
+class BoundedSqliteSaver(BaseCheckpointSaver[str]):
+    """
+    SQLite tabanlı, sınırlı LangGraph checkpointer'ı (InMemorySaver yerine).
+
+    - Her checkpoint kanal değerleriyle birlikte tek satırda tutulur
+    - Thread başına sadece son `retention` checkpoint saklanır
+    - `thread_ttl` süresince erişilmeyen thread'ler silinir
+    - Toplam boyut `max_bytes`'ı aşarsa en uzun süredir boşta olan thread'ler silinir
+    - State diskte durduğu için süreç belleği sohbet sayısıyla büyümez ve
+      yeniden başlatmada kaybolmaz
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        retention: int = CHECKPOINT_RETENTION,
+        thread_ttl: int = CHECKPOINT_THREAD_TTL,
+        max_bytes: int = CHECKPOINT_MAX_BYTES,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.retention = max(retention, MIN_RETENTION)
+        self.thread_ttl = thread_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Sadece yeni veritabanında etkili
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                checkpoint_type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                value_type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Yardımcılar
+    # ------------------------------------------------------------------
+
+    def _touch(self, thread_id: str):
+        """Thread'in son erişim zamanını günceller (lock altında çağrılır)."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO threads (thread_id, last_access) VALUES (?, ?)",
+            (thread_id, time.time()),
+        )
+
+    def _delete_thread_rows(self, thread_id: str):
+        """Thread'in tüm kayıtlarını siler (lock altında çağrılır)."""
+        for table in ("checkpoints", "writes", "threads"):
+            self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        """Son `retention` checkpoint dışındakileri ve yazımlarını siler (lock altında)."""
+        stale_ids = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.retention),
+            ).fetchall()
+        ]
+        for checkpoint_id in stale_ids:
+            params = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+
+    def _total_bytes(self) -> int:
+        checkpoints = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+        ).fetchone()[0]
+        writes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0]
+        return checkpoints + writes
+
+    def _cleanup(self, active_thread_id: str, force: bool = False):
+        """
+        TTL'i dolan thread'leri ve boyut sınırını aşan en eski thread'leri siler
+        (lock altında çağrılır). Aktif thread hiçbir zaman silinmez.
+        """
+        now = time.time()
+        if not force and now - self._last_cleanup < CHECKPOINT_CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+
+        expired = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT thread_id FROM threads WHERE last_access < ? AND thread_id != ?",
+                (now - self.thread_ttl, active_thread_id),
+            ).fetchall()
+        ]
+        for thread_id in expired:
+            self._delete_thread_rows(thread_id)
+
+        evicted = 0
+        if self._total_bytes() > self.max_bytes:
+            idle_threads = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE thread_id != ? ORDER BY last_access",
+                    (active_thread_id,),
+                ).fetchall()
+            ]
+            for thread_id in idle_threads:
+                self._delete_thread_rows(thread_id)
+                evicted += 1
+                if self._total_bytes() <= self.max_bytes:
+                    break
+
+        if expired or evicted:
+            self._conn.commit()
+            self._conn.execute("PRAGMA incremental_vacuum")
+            logger.info("🧹 Checkpoint temizliği: %d süresi dolan, %d boyut sınırı nedeniyle silinen thread", len(expired), evicted)
+
+    def _row_to_tuple(self, row: tuple) -> CheckpointTuple:
+        """checkpoints satırını (+ bekleyen yazımları) CheckpointTuple'a çevirir (lock altında)."""
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, value_type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((checkpoint_type, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    # ------------------------------------------------------------------
+    # BaseCheckpointSaver API
+    # ------------------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Config'teki checkpoint'i (checkpoint_id yoksa en yenisini) döndürür."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "checkpoint_type, checkpoint, metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            self._touch(thread_id)
+            self._conn.commit()
+            return self._row_to_tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Checkpoint'leri yeniden eskiye listeler (InMemorySaver.list ile aynı filtreler)."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "checkpoint_type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._row_to_tuple(row)
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+                ):
+                    continue
+                results.append(checkpoint_tuple)
+
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Checkpoint'i kaydeder, eski checkpoint'leri budar ve gerekirse temizlik yapar."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                "checkpoint_type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),  # parent
+                    checkpoint_type,
+                    checkpoint_blob,
+                    metadata_type,
+                    metadata_blob,
+                ),
+            )
+            self._touch(thread_id)
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._conn.commit()
+            self._cleanup(thread_id)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Bir task'ın ara yazımlarını checkpoint'e bağlı olarak kaydeder."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                value_type, value_blob = self.serde.dumps_typed(value)
+                # Özel kanallar (hata/interrupt vb.) üzerine yazılır, normal yazımlar bir kez kaydedilir
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                self._conn.execute(
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                    "value_type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, value_type, value_blob, task_path),
+                )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Thread'e ait tüm checkpoint ve yazımları siler."""
+        with self._lock:
+            self._delete_thread_rows(thread_id)
+            self._conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """InMemorySaver ile aynı versiyon formatı ("<sayaç>.<rastgele>")."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def cleanup(self):
+        """TTL ve boyut temizliğini hemen çalıştırır."""
+        with self._lock:
+            self._cleanup(active_thread_id="", force=True)
+
+    def stats(self) -> dict:
+        """Saklanan thread/checkpoint sayısını ve toplam boyutu döndürür."""
+        with self._lock:
+            return {
+                "threads": self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0],
+                "checkpoints": self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+                "bytes": self._total_bytes(),
+            }
+
+    # ------------------------------------------------------------------
+    # Async API (SQLite çağrıları event loop'u bloklamasın diye thread'de)
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Süreç genelinde paylaşılan checkpointer'ı döndürür.
+
+    CHECKPOINTER_BACKEND:
+    - "memory" (varsayılan): InMemorySaver (süreç içi, kalıcı değil)
+    - "sqlite": BoundedSqliteSaver (kalıcı, sınırlı - CHECKPOINTER_BACKEND=sqlite ile açılır)
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                if CHECKPOINTER_BACKEND == "sqlite":
+                    _checkpointer = BoundedSqliteSaver()
+                else:
+                    _checkpointer = InMemorySaver()
+    return _checkpointer
@@ -0,0 +1,147 @@
+"""
+Doc Store
+FAISS shard'ları için Arrow IPC doküman deposu (memory-mapped, sadece istenen satırlar okunur)
+"""
+
+import os
+import json
+import operator
+import threading
+from collections.abc import Mapping
+
+import pyarrow as pa
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+
+# --- CONFIGURATION ---
+DOCSTORE_FILE = "docstore.arrow"  # Her shard klasöründe index.faiss'in yanında
+CONTENT_FIELD = "original_content"  # İçerik metadata'dan çıkarılıp ayrı sütunda BİR KEZ saklanır
+
+# Satır sırası = FAISS indeks pozisyonu (index_to_docstore_id depodan kurulur)
+DOCSTORE_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("content", pa.large_string()),
+    ("page_content", pa.large_string()),  # Sadece metadata'dan yeniden üretilemiyorsa dolu
+    ("metadata", pa.string()),  # CONTENT_FIELD hariç metadata (JSON)
+])
+
+
+def write_docstore(path: str, ids: list, documents: list, build_page_content):
+    """
+    Dokümanları Arrow IPC dosyasına atomik yazar (sıkıştırmasız, mmap ile okunabilsin diye).
+
+    Args:
+        path: Hedef dosya (örn. faiss_index/lise/docstore.arrow)
+        ids: Docstore id'leri (FAISS indeks sırasıyla)
+        documents: ids ile aynı sırada Document listesi
+        build_page_content: Metadata + içerikten page_content üreten fonksiyon
+            (create_embedding_text); sonuç aynıysa page_content saklanmaz
+    """
+    columns = {"id": [], "content": [], "page_content": [], "metadata": []}
+    for doc_id, doc in zip(ids, documents):
+        metadata = dict(doc.metadata)
+        content = metadata.pop(CONTENT_FIELD, None)
+        rebuilt = build_page_content({**metadata, "content": content})
+        columns["id"].append(doc_id)
+        columns["content"].append(content)
+        columns["page_content"].append(None if rebuilt == doc.page_content else doc.page_content)
+        columns["metadata"].append(json.dumps(metadata, ensure_ascii=False))
+
+    table = pa.table(columns, schema=DOCSTORE_SCHEMA)
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, DOCSTORE_SCHEMA) as writer:
+            writer.write_table(table)
+    # Yeni dosya yerine konur: eskisini mmap'lemiş canlı shard'lar etkilenmez
+    os.replace(tmp_path, path)
+
+
+class ArrowIdMap(Mapping):
+    """
+    FAISS pozisyonu → docstore id eşlemesi (FAISS'in index_to_docstore_id'si).
+
+    Id'ler Arrow sütununda kalır; sadece aramada çıkan pozisyonlar Python
+    string'ine çevrilir.
+    """
+
+    def __init__(self, ids: pa.ChunkedArray):
+        self._ids = ids
+
+    def __getitem__(self, position) -> str:
+        try:
+            position = operator.index(position)  # FAISS numpy int64 pozisyon verir
+        except TypeError:
+            raise KeyError(position) from None
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].as_py()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(range(len(self._ids)))
+
+    def values(self) -> list:
+        """Tüm id'ler pozisyon sırasıyla (tek seferde sütundan)."""
+        return self._ids.to_pylist()
+
+
+class ArrowDocstore(Docstore):
+    """
+    Salt okunur, memory-mapped Arrow doküman deposu.
+
+    Yükleme dosyayı sadece mmap'ler; id'ler Arrow sütunu olarak kalır ve
+    id → satır tablosu ilk aramada kurulur. Document'lar arama sonucunda çıkan
+    id'ler için oluşturulur (pickle / tam deserialize yok). Sayfalar işletim
+    sistemi page cache'inden gelir, süreçler arasında paylaşılır.
+    """
+
+    def __init__(self, path: str, build_page_content):
+        """
+        Args:
+            path: write_docstore ile yazılmış dosya
+            build_page_content: write_docstore'a verilen fonksiyonun aynısı
+        """
+        # Sıkıştırmasız IPC: read_all kopyalamaz, sütunlar mmap'e işaret eder
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        self.index_to_docstore_id = ArrowIdMap(table.column("id"))
+        self._rows = None
+        self._rows_lock = threading.Lock()
+        self._content = table.column("content")
+        self._page_content = table.column("page_content")
+        self._metadata = table.column("metadata")
+        self._build_page_content = build_page_content
+
+    def _get_rows(self) -> dict:
+        """Id → satır tablosu (ilk aramada bir kez kurulur)."""
+        if self._rows is None:
+            with self._rows_lock:
+                if self._rows is None:
+                    self._rows = {doc_id: row for row, doc_id in enumerate(self.index_to_docstore_id.values())}
+        return self._rows
+
+    def search(self, search: str):
+        """
+        Id'ye ait Document'ı depodan okur.
+
+        Returns:
+            Document; id yoksa InMemoryDocstore gibi hata mesajı (str)
+        """
+        row = self._get_rows().get(search)
+        if row is None:
+            return f"ID {search} not found."
+
+        metadata = json.loads(self._metadata[row].as_py())
+        content = self._content[row].as_py()
+        page_content = self._page_content[row].as_py()
+        if page_content is None:
+            page_content = self._build_page_content({**metadata, "content": content})
+        metadata[CONTENT_FIELD] = content
+        return Document(id=search, page_content=page_content, metadata=metadata)
+
+    def to_memory(self) -> InMemoryDocstore:
+        """Tüm dokümanları yazılabilir InMemoryDocstore'a kopyalar (sync'te ekleme / silme için)."""
+        return InMemoryDocstore({doc_id: self.search(doc_id) for doc_id in self.index_to_docstore_id.values()})
@@ -0,0 +1,100 @@
+"""
+History Manager
+Sohbet geçmişini token bütçesine göre yönetir: eski turlar özetlenir,
+son turlar olduğu gibi tutulur
+"""
+
+import os
+
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+
+from token_budget import message_tokens, messages_tokens, get_message_text
+from prompts.summary_prompt import get_summary_prompt
+
+
+# --- CONFIGURATION ---
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # Verbatim geçmiş için üst sınır
+HISTORY_KEEP_RATIO = 0.5  # Özetleme sonrası verbatim kalan kısım (bütçenin oranı)
+HISTORY_MIN_MESSAGES = 2  # Bütçe ne olursa olsun son soru-cevap çifti korunur
+
+
+def split_recent(messages: list, budget: int) -> tuple:
+    """
+    Geçmişi (eski, son) olarak ikiye böler; son kısım token bütçesine sığar.
+
+    Son kısım her zaman bir kullanıcı mesajıyla başlar (tur sınırı) ve en az
+    HISTORY_MIN_MESSAGES mesaj içerir.
+
+    Args:
+        messages: Sohbet mesajları (eskiden yeniye)
+        budget: Son kısım için token bütçesi
+
+    Returns:
+        (older, recent) mesaj listeleri
+    """
+    total = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        total += message_tokens(messages[i])
+        if total > budget and len(messages) - i > HISTORY_MIN_MESSAGES:
+            break
+        start = i
+
+    # Tur ortasından bölme - son kısım kullanıcı sorusuyla başlasın
+    boundary = start
+    while boundary < len(messages) and not isinstance(messages[boundary], HumanMessage):
+        boundary += 1
+    if boundary < len(messages):
+        start = boundary
+
+    return messages[:start], messages[start:]
+
+
+def needs_compaction(messages: list) -> bool:
+    """Verbatim geçmiş bütçeyi aştı mı?"""
+    return messages_tokens(messages) > HISTORY_TOKEN_BUDGET
+
+
+def format_transcript(messages: list) -> str:
+    """Mesajları özetleyici için "Veli: ... / Asistan: ..." metnine çevirir."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            lines.append(f"Veli: {get_message_text(message)}")
+        elif isinstance(message, AIMessage):
+            lines.append(f"Asistan: {get_message_text(message)}")
+    return "\n".join(lines)
+
+
+def build_summary_messages(previous_summary: str, messages: list) -> list:
+    """Özetleme LLM çağrısı için mesajları oluşturur."""
+    return [
+        SystemMessage(content=get_summary_prompt()),
+        HumanMessage(content=f"""### MEVCUT ÖZET:
+{previous_summary or "(henüz yok)"}
+
+### ÖZETE EKLENECEK KONUŞMA:
+{format_transcript(messages)}"""),
+    ]
+
+
+def summarize_history(llm, previous_summary: str, messages: list) -> str:
+    """
+    Mevcut özet ile eski mesajları tek bir güncel özette birleştirir.
+
+    Args:
+        llm: LangChain chat modeli
+        previous_summary: Önceki özet (yoksa None)
+        messages: Özete katılacak eski mesajlar
+
+    Returns:
+        Güncel özet metni
+    """
+    response = llm.invoke(build_summary_messages(previous_summary, messages))
+    return get_message_text(response).strip()
+
+
+async def asummarize_history(llm, previous_summary: str, messages: list) -> str:
+    """summarize_history'nin async versiyonu."""
+    response = await llm.ainvoke(build_summary_messages(previous_summary, messages))
+    return get_message_text(response).strip()
@@ -0,0 +1,358 @@
+"""
+Instrumentation
+Workflow node'ları için gecikme / token / cache metrikleri ve süreç içi metrik kaydı
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+from token_budget import estimate_tokens, messages_tokens, get_message_text
+
+
+# --- CONFIGURATION ---
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") != "0"  # "0" → node'lar sarılmaz, metrik tutulmaz, akış logları (INFO) kapanır
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))  # Histogram başına tutulan son ölçüm sayısı
+PERCENTILES = (50, 95, 99)
+
+# Tur başına bir JSON satırı; handler bağlanmadıkça (veya seviye INFO altındaysa) hiçbir şey üretilmez
+metrics_logger = logging.getLogger("cozum.metrics")
+
+# Sohbet ve node akış logları ("cozum.trace.<modül>"); INSTRUMENTATION_ENABLED=0 → sadece uyarı ve hatalar
+trace_logger = logging.getLogger("cozum.trace")
+if not INSTRUMENTATION_ENABLED:
+    trace_logger.setLevel(logging.WARNING)
+_console_handler = None
+
+
+def get_trace_logger(name: str) -> logging.Logger:
+    """Modülün akış logger'ı (seviyesi "cozum.trace"ten, yani INSTRUMENTATION_ENABLED'dan gelir)."""
+    return trace_logger.getChild(name)
+
+
+def enable_console_trace():
+    """
+    Akış loglarını stdout'a yazar (CLI testleri, replay --verbose).
+
+    Uygulama kendi logging ayarını yapıyorsa gerekmez; "cozum.trace" INFO
+    seviyesinde bir handler'a ulaştığında aynı satırlar oraya gider.
+    """
+    global _console_handler
+    if _console_handler is not None:
+        return
+    _console_handler = logging.StreamHandler(sys.stdout)
+    _console_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(_console_handler)
+    if INSTRUMENTATION_ENABLED:
+        trace_logger.setLevel(logging.INFO)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Sıralı listede nearest-rank yüzdelik değeri."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class MetricsRegistry:
+    """
+    Süreç içi metrik kaydı (thread-safe).
+
+    - Counter: toplam sayılar (embedding çağrısı, cache hit, ...)
+    - Histogram: son METRICS_WINDOW ölçüm üzerinden p50 / p95 / p99
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            samples = self._histograms.get(name)
+            if samples is None:
+                samples = self._histograms[name] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def histogram(self, name: str) -> dict:
+        """Tek histogramın özeti: count, mean, max, p50, p95, p99."""
+        with self._lock:
+            values = sorted(self._histograms.get(name, ()))
+        summary = {
+            "count": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "max": values[-1] if values else 0.0,
+        }
+        for pct in PERCENTILES:
+            summary[f"p{pct}"] = percentile(values, pct)
+        return summary
+
+    def snapshot(self) -> dict:
+        """Tüm counter'lar ve histogram özetleri."""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._histograms)
+        return {
+            "counters": counters,
+            "histograms": {name: self.histogram(name) for name in sorted(names)},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_metrics_registry = None
+_metrics_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Süreç genelinde paylaşılan MetricsRegistry örneğini döndürür."""
+    global _metrics_registry
+    if _metrics_registry is None:
+        with _metrics_registry_lock:
+            if _metrics_registry is None:
+                _metrics_registry = MetricsRegistry()
+    return _metrics_registry
+
+
+class TurnMetrics:
+    """
+    Tek bir sohbet turunun metrikleri.
+
+    Tur boyunca contextvar'da durur; node wrapper'ları, LLM callback'i ve
+    cache'ler buraya yazar. Tur bitince registry'ye aktarılır ve tek bir
+    yapısal log satırı olarak yayınlanır.
+    """
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.nodes = []      # [(node, ms, status)] çalışma sırasıyla
+        self.counters = {}   # llm_input_tokens, embedding_calls, ...
+        self.values = {}     # Son yazılan değer geçerli (retrieved_docs, context_tokens)
+        self._lock = threading.Lock()
+
+    def add_node(self, node: str, elapsed_ms: float, status: str):
+        with self._lock:
+            self.nodes.append((node, elapsed_ms, status))
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value):
+        with self._lock:
+            self.values[name] = value
+
+    def to_dict(self, status: str) -> dict:
+        with self._lock:
+            return {
+                "event": "chat_turn",
+                "thread_id": self.thread_id,
+                "status": status,
+                "latency_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "nodes": [{"node": node, "ms": round(ms, 2), "status": node_status}
+                          for node, ms, node_status in self.nodes],
+                **self.counters,
+                **self.values,
+            }
+
+
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+def current_turn() -> TurnMetrics:
+    """Aktif turun metrikleri (tur dışında veya instrumentation kapalıyken None)."""
+    return _current_turn.get()
+
+
+def count_event(name: str, value: float = 1):
+    """
+    Olay sayacını artırır (aktif tur + registry).
+
+    Cache / embedding gibi sık çağrılan yerlerden çağrılır; instrumentation
+    kapalıyken tek bir bool kontrolü kadar maliyetlidir.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.increment(name, value)
+    get_metrics_registry().increment(name, value)
+
+
+@contextmanager
+def _track_turn(thread_id: str):
+    turn = TurnMetrics(thread_id)
+    token = _current_turn.set(turn)
+    status = "ok"
+    try:
+        yield turn
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        try:
+            _current_turn.reset(token)
+        except ValueError:
+            pass  # Generator (stream) başka bir context'te kapatıldı
+        finish_turn(turn, status)
+
+
+def track_turn(thread_id: str):
+    """
+    Bir sohbet turunu ölçen context manager.
+
+    Kullanım:
+        with track_turn(thread_id):
+            workflow.invoke(...)
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return nullcontext()
+    return _track_turn(thread_id)
+
+
+def finish_turn(turn: TurnMetrics, status: str):
+    """Tur metriklerini registry'ye aktarır ve yapısal log satırını yayınlar."""
+    record = turn.to_dict(status)
+    registry = get_metrics_registry()
+    registry.increment(f"turns.{status}")
+    registry.observe("turn.latency_ms", record["latency_ms"])
+    for node in record["nodes"]:
+        registry.observe(f"node.{node['node']}.ms", node["ms"])
+    for name in ("llm_input_tokens", "llm_output_tokens", "retrieved_docs", "context_tokens"):
+        if name in record:
+            registry.observe(f"turn.{name}", record[name])
+
+    if metrics_logger.isEnabledFor(logging.INFO):
+        metrics_logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def record_node_output(turn: TurnMetrics, output):
+    """Node çıktısındaki doküman sayısı ve context token'larını tura yazar."""
+    if not isinstance(output, dict):
+        return
+    docs = output.get("retrieved_docs")
+    if docs is not None:
+        turn.set("retrieved_docs", len(docs))
+        turn.set("context_tokens", sum(doc["tokens"] for doc in docs))
+
+
+def instrument_node(name: str, func, afunc=None) -> RunnableLambda:
+    """
+    Node gövdelerini süre ölçen sarmalayıcılarla RunnableLambda'ya çevirir.
+
+    Args:
+        name: Graph'taki node adı
+        func: Sync node gövdesi
+        afunc: Async node gövdesi (yoksa sadece sync)
+
+    Returns:
+        RunnableLambda (instrumentation kapalıysa ölçümsüz)
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return RunnableLambda(func, afunc=afunc) if afunc else RunnableLambda(func)
+
+    def timed(state):
+        turn = _current_turn.get()
+        if turn is None:
+            return func(state)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            output = func(state)
+            status = "ok"
+            record_node_output(turn, output)
+            return output
+        finally:
+            turn.add_node(name, (time.perf_counter() - started) * 1000, status)
+
+    async def atimed(state):
+        turn = _current_turn.get()
+        if turn is None:
+            return await afunc(state)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            output = await afunc(state)
+            status = "ok"
+            record_node_output(turn, output)
+            return output
+        finally:
+            turn.add_node(name, (time.perf_counter() - started) * 1000, status)
+
+    return RunnableLambda(timed, afunc=atimed) if afunc else RunnableLambda(timed)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    LLM çağrılarının giriş/çıkış token'larını aktif tura yazar.
+
+    Model usage_metadata döndürmezse (örn. test modelleri) token_budget
+    tahmini kullanılır. Workflow config'ine callbacks olarak verilir;
+    node'ların içindeki tüm LLM çağrılarına (intent, answer, summary) yayılır.
+    """
+
+    run_inline = True  # Async akışta thread'e atılmadan çalışsın (contextvar korunur)
+
+    def __init__(self, turn: TurnMetrics):
+        self.turn = turn
+        self._prompt_tokens = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._prompt_tokens[run_id] = sum(messages_tokens(batch) for batch in messages)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._prompt_tokens[run_id] = sum(estimate_tokens(prompt) for prompt in prompts)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        estimated_input = self._prompt_tokens.pop(run_id, 0)
+        input_tokens = output_tokens = None
+
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            input_tokens, output_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+
+        if input_tokens is None:
+            input_tokens = estimated_input
+        if output_tokens is None:
+            text = get_message_text(message) if message is not None else (generation.text if generation else "")
+            output_tokens = estimate_tokens(text)
+
+        self._count("llm_calls", 1)
+        self._count("llm_input_tokens", input_tokens)
+        self._count("llm_output_tokens", output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompt_tokens.pop(run_id, None)
+        self._count("llm_errors", 1)
+
+    def _count(self, name: str, value: float):
+        # Callback LangGraph'ın thread'lerinde de çalışabilir; tur nesnesine doğrudan yazılır
+        self.turn.increment(name, value)
+        get_metrics_registry().increment(name, value)
+
+
+def get_turn_callbacks() -> list:
+    """Aktif tur için workflow config'ine eklenecek callback'ler (tur yoksa boş)."""
+    turn = _current_turn.get()
+    return [TokenUsageCallback(turn)] if turn is not None else []
@@ -3,10 +3,18 @@ Intent Detection Module
 Kullanıcı sorgusunu sınıflandırarak doğru node'a yönlendirir
 """
 
+import os
+import re
+import asyncio
+import threading
 from typing import Literal
+
+import numpy as np
 from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from query_cache import normalize_query
+
 
 # Intent tipleri
 IntentType = Literal["greeting", "education", "event", "price", "unknown"]
@@ -26,6 +34,53 @@ class IntentDetection(BaseModel):
     )
 
 
+# --- LOCAL FAST-PATH CONFIGURATION ---
+LOCAL_INTENT_THRESHOLD = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.85"))  # Altı → LLM'e düşer
+KEYWORD_RULE_CONFIDENCE = 0.8  # Anahtar kelime tek başına eşik altında kalır; centroid de aynı intent'i bulmalı
+CENTROID_TEMPERATURE = 0.05  # Cosine farklarını güven skoruna çeviren softmax sıcaklığı
+
+# Sadece bu ifadelerden oluşan mesajlar → greeting
+GREETING_PHRASES = [
+    "merhaba", "merhabalar", "selam", "selamlar", "selamün aleyküm", "günaydın",
+    "iyi günler", "iyi akşamlar", "iyi geceler", "kolay gelsin", "nasılsınız",
+    "teşekkürler", "teşekkür ederim", "çok teşekkürler", "sağ olun", "sağ ol",
+    "sağolun", "sağol", "hoşça kalın", "hoşça kal", "görüşürüz", "tamam", "peki",
+]
+_GREETING_RE = re.compile(r"\b(" + "|".join(sorted(GREETING_PHRASES, key=len, reverse=True)) + r")\b")
+
+# Etkinlik isimleri: genel zaman ifadeleri ("bu hafta", "yaklaşan", "tatil") sadece bunlarla birlikte event sayılır
+_EVENT_NOUN_RE = re.compile(r"\b(etkinlik\w*|tören\w*|gezi\w*|kutlama\w*|gösteri\w*|şenlik\w*|festival\w*)")
+
+# Intent başına kurallar (normalize edilmiş metinde aranır): bir kuraldaki TÜM kalıplar eşleşmeli
+INTENT_KEYWORD_RULES = {
+    "price": [
+        (re.compile(r"\b(ücret\w*|fiyat\w*|taksit\w*|indirim\w*|burs\w*|kaç para|ne kadar tutuyor)"),),
+    ],
+    "event": [
+        (re.compile(r"\b(duyuru\w*|haber(ler\w*)?\b)"),),  # "haberleşme" eşleşmez
+        (re.compile(r"\b(bu hafta|yaklaşan|düzenlen\w*|yapılan|geçen ay|takvim\w*|tatil\w*)"), _EVENT_NOUN_RE),
+    ],
+}
+
+# Nearest-centroid sınıflandırıcı için örnek sorgular
+INTENT_EXAMPLES = {
+    "greeting": ["Merhaba", "Günaydın", "Teşekkürler", "Hoşça kalın", "İyi günler, kolay gelsin"],
+    "education": [
+        "İngilizce eğitimi nasıl?", "Lise programı nedir?", "Spor faaliyetleri var mı?",
+        "Ders saatleri nedir?", "Anaokulunda hangi etkinlikler var?", "Haftada kaç saat matematik var?",
+        "EDUxLab programı nedir?", "Servis var mı?", "Yemekhanede neler veriliyor?",
+        "Ödev politikası nasıl?", "LGS hazırlık programı nasıl?", "Kulüp çalışmaları neler?",
+    ],
+    "event": [
+        "Bu hafta etkinlik var mı?", "Son haberler neler?", "Yaklaşan etkinlikler?",
+        "Okul tatili ne zaman?", "Okulda hangi etkinlikler düzenlendi?", "Geçen ay ne gibi etkinlikler oldu?",
+        "Son duyurular neler?",
+    ],
+    "price": ["Ücretler ne kadar?", "Okul fiyatları nedir?", "Taksit imkanı var mı?", "Kayıt ücreti ne kadar?", "Kardeş indirimi var mı?"],
+    "unknown": ["Hava nasıl?", "Futbol maçı kim kazandı?", "Bugün dolar kaç TL?", "Bana bir şiir yaz"],
+}
+
+
 # Intent classification prompt
 INTENT_DETECTION_PROMPT = """Sen bir intent sınıflandırıcısısın. Kullanıcının sorgusunu analiz edip aşağıdaki kategorilerden birine ata:
 
@@ -79,16 +134,181 @@ KULLANICI SORGUSU: {query}
 Intent, confidence ve reasoning döndür."""
 
 
+class LocalIntentClassifier:
+    """
+    LLM çağırmadan intent tespiti yapan yerel sınıflandırıcı.
+    
+    Strategy:
+    1. Kural seti: sadece selamlaşmadan oluşan mesajlar (kesin), ayırt edici
+       anahtar kelimeler (tek başına eşik altı: KEYWORD_RULE_CONFIDENCE)
+    2. Nearest-centroid: örnek sorguların embedding ortalamalarına cosine benzerliği
+       (örnek embedding'leri disk cache'ten, sorgu embedding'i query LRU'dan gelir)
+    3. Anahtar kelime ve centroid aynı intent'i buluyorsa güvenler birleştirilir;
+       çelişiyorsa anahtar kelime sonucu eşik altında kalır
+    
+    Güven skoru LOCAL_INTENT_THRESHOLD altındaysa çağıran LLM'e düşmelidir.
+    """
+    
+    def __init__(self, examples: dict = None):
+        self.examples = examples or INTENT_EXAMPLES
+        self._centroids = None  # (intent listesi, normalize edilmiş centroid matrisi)
+        self._lock = threading.Lock()
+    
+    def classify_by_rules(self, query: str) -> IntentDetection:
+        """Kural tabanlı sınıflandırma. Karar verilemezse None döner."""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        
+        # Sadece selamlaşma/teşekkür ifadelerinden oluşuyorsa
+        if not _GREETING_RE.sub(" ", normalized).strip():
+            return IntentDetection(intent="greeting", confidence=0.97, reasoning="[local-rule] Sadece selamlaşma ifadesi")
+        
+        matched = [
+            intent for intent, rules in INTENT_KEYWORD_RULES.items()
+            if any(all(pattern.search(normalized) for pattern in rule) for rule in rules)
+        ]
+        if len(matched) == 1:
+            return IntentDetection(
+                intent=matched[0],
+                confidence=KEYWORD_RULE_CONFIDENCE,
+                reasoning=f"[local-rule] '{matched[0]}' anahtar kelimesi",
+            )
+        
+        return None
+    
+    @staticmethod
+    def combine(rule_detection: IntentDetection, centroid_detection: IntentDetection) -> IntentDetection:
+        """
+        Anahtar kelime ve centroid sonuçlarını birleştirir.
+        
+        Aynı intent → bağımsız iki kanıt (1 - (1-a)(1-b)); farklı intent → anahtar
+        kelime sonucu eşik altında döner (karar LLM'e kalır).
+        """
+        if rule_detection is None:
+            return centroid_detection
+        if centroid_detection.intent != rule_detection.intent:
+            return rule_detection
+        
+        confidence = 1 - (1 - rule_detection.confidence) * (1 - centroid_detection.confidence)
+        return IntentDetection(
+            intent=rule_detection.intent,
+            confidence=confidence,
+            reasoning=f"{rule_detection.reasoning} + {centroid_detection.reasoning}",
+        )
+    
+    def _get_centroids(self) -> tuple:
+        """Örnek sorguların intent centroid'lerini bir kez hesaplar."""
+        if self._centroids is not None:
+            return self._centroids
+        
+        from retriever import get_retriever_service, get_cached_embedder
+        
+        with self._lock:
+            if self._centroids is None:
+                embedder = get_cached_embedder(get_retriever_service().embedding_model)
+                intents = list(self.examples)
+                rows = []
+                for intent in intents:
+                    vectors = np.asarray(embedder.embed_documents(self.examples[intent]), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    centroid = vectors.mean(axis=0)
+                    rows.append(centroid / np.linalg.norm(centroid))
+                self._centroids = (intents, np.vstack(rows))
+            return self._centroids
+    
+    def classify_by_centroid(self, query: str, query_embedding: list = None) -> IntentDetection:
+        """Sorgu embedding'ine (verilmezse query LRU'dan) en yakın intent centroid'i."""
+        from retriever import get_retriever_service
+        
+        self._get_centroids()
+        if query_embedding is None:
+            query_embedding = get_retriever_service().query_cache.embed_query(query)
+        return self._centroid_detection(query_embedding)
+    
+    def _centroid_detection(self, query_embedding: list) -> IntentDetection:
+        """Sorgu embedding'ini centroid'lerle karşılaştırır."""
+        intents, centroids = self._get_centroids()
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector)
+        
+        similarities = centroids @ query_vector
+        weights = np.exp((similarities - similarities.max()) / CENTROID_TEMPERATURE)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+        
+        return IntentDetection(
+            intent=intents[best],
+            confidence=float(probabilities[best]),
+            reasoning=f"[local-centroid] En yakın örnek grubu: {intents[best]} (cosine: {similarities[best]:.3f})"
+        )
+    
+    def classify(self, query: str, query_embedding: list = None) -> IntentDetection:
+        """
+        Önce kurallar, sonra centroid. Embedding hatasında anahtar kelime sonucu
+        (eşik altı) veya güveni 0 olan unknown döner (LLM'e düşer).
+        
+        Args:
+            query_embedding: Önceden hesaplanmış sorgu embedding'i (örn. spekülatif retrieval ile paylaşılan)
+        """
+        detection = self.classify_by_rules(query)
+        if detection is not None and detection.confidence >= LOCAL_INTENT_THRESHOLD:
+            return detection
+        
+        try:
+            return self.combine(detection, self.classify_by_centroid(query, query_embedding))
+        except Exception as e:
+            return detection or IntentDetection(intent="unknown", confidence=0.0, reasoning=f"[local] Centroid sınıflandırma yapılamadı: {e}")
+    
+    async def aclassify(self, query: str, query_embedding: list = None) -> IntentDetection:
+        """classify()'ın async versiyonu (sorgu embedding'i async API ile alınır)."""
+        detection = self.classify_by_rules(query)
+        if detection is not None and detection.confidence >= LOCAL_INTENT_THRESHOLD:
+            return detection
+        
+        from retriever import get_retriever_service
+        
+        try:
+            if self._centroids is None:
+                await asyncio.to_thread(self._get_centroids)
+            if query_embedding is None:
+                query_embedding = await get_retriever_service().query_cache.aembed_query(query)
+            return self.combine(detection, self._centroid_detection(query_embedding))
+        except Exception as e:
+            return detection or IntentDetection(intent="unknown", confidence=0.0, reasoning=f"[local] Centroid sınıflandırma yapılamadı: {e}")
+
+
+_local_classifier = None
+_local_classifier_lock = threading.Lock()
+
+
+def get_local_intent_classifier() -> LocalIntentClassifier:
+    """Süreç genelinde paylaşılan LocalIntentClassifier örneğini döndürür."""
+    global _local_classifier
+    if _local_classifier is None:
+        with _local_classifier_lock:
+            if _local_classifier is None:
+                _local_classifier = LocalIntentClassifier()
+    return _local_classifier
+
+
 def detect_intent(
     llm: ChatGoogleGenerativeAI, 
-    query: str
+    query: str,
+    use_local: bool = True,
+    query_embedding: list = None
 ) -> IntentDetection:
     """
     Kullanıcı sorgusunun intent'ini tespit eder.
     
+    Önce yerel sınıflandırıcı denenir; güveni LOCAL_INTENT_THRESHOLD altındaysa
+    structured-output LLM çağrısına düşülür.
+    
     Args:
         llm: LangChain ChatGoogleGenerativeAI modeli
         query: Kullanıcının sorusu
+        use_local: False ise her zaman LLM kullanılır
+        query_embedding: Yerel sınıflandırıcı için önceden hesaplanmış sorgu embedding'i
     
     Returns:
         IntentDetection: intent, confidence, reasoning içeren yapılandırılmış çıktı
@@ -100,6 +320,12 @@ def detect_intent(
         >>> detect_intent(llm, "İngilizce kaç saat?")
         IntentDetection(intent='education', confidence=0.9, reasoning='Ders saati sorusu')
     """
+    # Local fast-path - LLM round trip'i olmadan
+    if use_local:
+        local_detection = get_local_intent_classifier().classify(query, query_embedding)
+        if local_detection.confidence >= LOCAL_INTENT_THRESHOLD:
+            return local_detection
+    
     # Structured output için LLM'i yapılandır
     structured_llm = llm.with_structured_output(IntentDetection)
     
@@ -110,6 +336,23 @@ def detect_intent(
     return result
 
 
+async def adetect_intent(
+    llm: ChatGoogleGenerativeAI,
+    query: str,
+    use_local: bool = True,
+    query_embedding: list = None
+) -> IntentDetection:
+    """detect_intent'in async versiyonu (LLM'e ainvoke ile düşer)."""
+    if use_local:
+        local_detection = await get_local_intent_classifier().aclassify(query, query_embedding)
+        if local_detection.confidence >= LOCAL_INTENT_THRESHOLD:
+            return local_detection
+    
+    structured_llm = llm.with_structured_output(IntentDetection)
+    prompt_text = INTENT_DETECTION_PROMPT.format(query=query)
+    return await structured_llm.ainvoke(prompt_text)
+
+
 def format_intent_result(detection: IntentDetection) -> str:
     """Intent detection sonucunu okunabilir formatta döndürür (debug için)."""
     return f"Intent: {detection.intent} | Confidence: {detection.confidence:.2f} | Reasoning: {detection.reasoning}"
@@ -135,4 +378,5 @@ if __name__ == "__main__":
     for query in test_queries:
         print(f"📝 Query: '{query}'")
         result = detect_intent(llm, query)
-        print(f"   {format_intent_result(result)}\n")
+        print(f"   {format_intent_result(result)}")
+        print(f"   Local: {format_intent_result(get_local_intent_classifier().classify(query))}\n")
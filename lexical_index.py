@@ -0,0 +1,183 @@
+"""
+Lexical Index
+Türkçe metinler için tokenizer, BM25 skorlayıcı ve kalıcı ters indeks (dış bağımlılık yok)
+"""
+
+import os
+import json
+import math
+from collections import Counter
+
+from query_cache import normalize_query
+
+
+# --- CONFIGURATION ---
+STEM_LENGTH = int(os.getenv("LEXICAL_STEM_LENGTH", "5"))  # Türkçe ekler için prefix (F5) kökleme
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Skora katkısı olmayan kelimeler (soru kalıpları, bağlaçlar)
+STOPWORDS = {
+    "ve", "veya", "ile", "için", "bir", "bu", "şu", "o", "da", "de", "ki",
+    "mı", "mi", "mu", "mü", "ne", "neler", "nedir", "hangi", "nasıl", "kaç",
+    "var", "yok", "olan", "olarak", "gibi", "daha", "çok", "en",
+}
+
+
+def tokenize(text: str) -> list:
+    """
+    Metni BM25 terimlerine çevirir.
+
+    - Türkçe küçük harf + noktalama temizliği (normalize_query)
+    - Stopword'ler ve tek harfli kelimeler atılır; sayılar korunur ("5. sınıf" → "5")
+    - Kelimeler ilk STEM_LENGTH harfe kısaltılır ("saatleri" → "saatl", "matematik" → "matem")
+
+    Returns:
+        Terim listesi (tekrarlar korunur)
+    """
+    tokens = []
+    for word in normalize_query(text).split():
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+def bm25_idf(doc_count: int, doc_freq: int) -> float:
+    """Terimin idf değeri (Lucene tarzı, her zaman pozitif)."""
+    return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(idf: float, tf: int, doc_length: int, avg_length: float) -> float:
+    """
+    Tek bir terimin dokümana BM25 katkısı.
+
+    BM25Scorer (sıkıştırma) ve LexicalIndex (hibrit arama) aynı formülü ve
+    aynı BM25_K1 / BM25_B değerlerini buradan kullanır.
+    """
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+    return idf * tf * (BM25_K1 + 1) / (tf + length_norm)
+
+
+class BM25Scorer:
+    """
+    Küçük bir doküman kümesi üzerinde Okapi BM25.
+
+    Dokümanlar önceden tokenize edilmiş terim listeleri olarak verilir;
+    idf değerleri bu kümeden hesaplanır.
+    """
+
+    def __init__(self, documents: list):
+        """
+        Args:
+            documents: Her doküman için tokenize() çıktısı
+        """
+        self.term_freqs = [Counter(tokens) for tokens in documents]
+        self.doc_lengths = [len(tokens) for tokens in documents]
+        self.doc_count = len(documents)
+        self.avg_length = (sum(self.doc_lengths) / self.doc_count) if self.doc_count else 0.0
+
+        doc_freqs = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        self.idf = {term: bm25_idf(self.doc_count, freq) for term, freq in doc_freqs.items()}
+
+    def score(self, query_tokens: list, index: int) -> float:
+        """Sorgunun index'teki dokümana BM25 skoru."""
+        freqs = self.term_freqs[index]
+        if not freqs:
+            return 0.0
+
+        total = 0.0
+        for term in set(query_tokens):
+            tf = freqs.get(term)
+            if tf:
+                total += bm25_term_score(self.idf[term], tf, self.doc_lengths[index], self.avg_length)
+        return total
+
+    def score_all(self, query_tokens: list) -> list:
+        """Tüm dokümanların skorları (doküman sırasıyla)."""
+        return [self.score(query_tokens, index) for index in range(self.doc_count)]
+
+
+class LexicalIndex:
+    """
+    Diske kaydedilebilen BM25 ters indeksi (inverted index).
+
+    Her terim için (doküman sırası, terim frekansı) listesi tutulur; sorgu
+    sadece sorgu terimlerinin posting listelerini dolaşır. Dokümanlar dış
+    anahtarlarıyla (örn. FAISS docstore id'si) saklanır.
+    """
+
+    def __init__(self, ids: list, doc_lengths: list, postings: dict):
+        """
+        Args:
+            ids: Doküman anahtarları (sıra = doküman indeksi)
+            doc_lengths: Doküman başına terim sayısı
+            postings: {terim: [[doküman indeksi, frekans], ...]}
+        """
+        self.ids = ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        doc_count = len(ids)
+        self.avg_length = (sum(doc_lengths) / doc_count) if doc_count else 0.0
+        self.idf = {term: bm25_idf(doc_count, len(entries)) for term, entries in postings.items()}
+
+    @classmethod
+    def build(cls, ids: list, texts: list) -> "LexicalIndex":
+        """Metinleri tokenize edip ters indeksi oluşturur."""
+        postings = {}
+        doc_lengths = []
+        for position, text in enumerate(texts):
+            freqs = Counter(tokenize(text))
+            doc_lengths.append(sum(freqs.values()))
+            for term, tf in freqs.items():
+                postings.setdefault(term, []).append([position, tf])
+        return cls(list(ids), doc_lengths, postings)
+
+    def search(self, query: str, k: int) -> list:
+        """
+        Sorguya en yüksek BM25 skorlu k dokümanı döndürür.
+
+        Returns:
+            (doküman anahtarı, skor) listesi, skor azalan; eşleşme yoksa []
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            idf = self.idf[term]
+            for position, tf in entries:
+                score = bm25_term_score(idf, tf, self.doc_lengths[position], self.avg_length)
+                scores[position] = scores.get(position, 0.0) + score
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[position], score) for position, score in top]
+
+    def save(self, path: str):
+        """İndeksi JSON olarak atomik yazar (yarım kalmış yazım okunmaz)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"stem_length": STEM_LENGTH, "ids": self.ids, "doc_lengths": self.doc_lengths, "postings": self.postings},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """
+        Kaydedilmiş indeksi okur.
+
+        Returns:
+            LexicalIndex; dosya yoksa veya farklı STEM_LENGTH ile oluşturulduysa None
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("stem_length") != STEM_LENGTH:
+            return None
+        return cls(data["ids"], data["doc_lengths"], data["postings"])
@@ -0,0 +1,153 @@
+"""
+News Page Cache
+Okul web sitesinden çekilen haber liste/detay sayfaları için kalıcı HTTP cache
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from instrumentation import count_event
+
+
+# --- CONFIGURATION ---
+NEWS_CACHE_PATH = os.getenv("NEWS_CACHE_PATH", "news_cache.sqlite3")  # Boş bırakılırsa cache kapalı
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", "3600"))  # Liste sayfaları için saniye
+
+
+class NewsPageCache:
+    """
+    URL → HTML sayfa cache'i (SQLite, thread-safe).
+
+    - TTL içindeki kayıtlar ağa hiç çıkmadan döner
+    - TTL dolunca ETag / Last-Modified ile koşullu GET yapılır (304 → kayıt tazelenir)
+    - immutable kayıtlar (haber detay sayfaları) hiç eskimez
+    - Site hata verirse eski (stale) kayıt yine de kullanılabilir
+    """
+
+    def __init__(self, path: str = NEWS_CACHE_PATH, ttl: int = NEWS_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                immutable INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.revalidations = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> dict:
+        """Kaydı döndürür, yoksa None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at, immutable FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "body": row[0],
+            "etag": row[1],
+            "last_modified": row[2],
+            "fetched_at": row[3],
+            "immutable": bool(row[4]),
+        }
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Kayıt ağa çıkmadan kullanılabilir mi?"""
+        return entry["immutable"] or time.time() - entry["fetched_at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """Koşullu GET için If-None-Match / If-Modified-Since başlıklarını üretir."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, body: str, etag: str = None, last_modified: str = None, immutable: bool = False):
+        """Sayfayı (yeniden) kaydeder."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, etag, last_modified, fetched_at, immutable) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, time.time(), int(immutable)),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """304 Not Modified sonrası kaydın TTL'ini yeniler."""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def record(self, outcome: str):
+        """Sayaçları günceller: "hit", "revalidated", "stale" veya "miss"."""
+        count_event(f"news_cache_{outcome}")
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidations += 1
+            elif outcome == "stale":
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, url: str = None):
+        """Tek bir URL'i veya (url=None ise) tüm cache'i siler."""
+        with self._lock:
+            if url is None:
+                self._conn.execute("DELETE FROM pages")
+            else:
+                self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Cache sayaçlarını döndürür."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "size": size,
+            }
+
+
+_news_page_cache = None
+_news_page_cache_lock = threading.Lock()
+
+
+def get_news_page_cache() -> NewsPageCache:
+    """
+    Süreç genelinde paylaşılan NewsPageCache örneğini döndürür.
+    NEWS_CACHE_PATH boşsa None döner (cache kapalı).
+    """
+    global _news_page_cache
+    if not NEWS_CACHE_PATH:
+        return None
+    if _news_page_cache is None:
+        with _news_page_cache_lock:
+            if _news_page_cache is None:
+                _news_page_cache = NewsPageCache()
+    return _news_page_cache
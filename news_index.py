@@ -0,0 +1,565 @@
+"""
+News Index + Background Crawler
+Duyuru arşivini arka planda tarayıp yerel, aranabilir bir indekse yazar
+(SQLite FTS5 tam metin + embedding + tarih)
+"""
+
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from query_cache import normalize_query, turkish_lower
+from instrumentation import get_trace_logger, enable_console_trace
+
+logger = get_trace_logger("news_index")
+
+
+# --- CONFIGURATION ---
+NEWS_INDEX_PATH = os.getenv("NEWS_INDEX_PATH", "news_index.sqlite3")
+NEWS_CRAWLER_ENABLED = os.getenv("NEWS_CRAWLER_ENABLED", "0") == "1"  # "1" → ChatSession canlı siteyi arka planda tarar
+NEWS_CRAWL_INTERVAL = int(os.getenv("NEWS_CRAWL_INTERVAL", "21600"))  # Saniye (6 saat)
+NEWS_CRAWL_MAX_PAGES = int(os.getenv("NEWS_CRAWL_MAX_PAGES", "200"))  # Güvenlik sınırı
+NEWS_RECENCY_WEIGHT = float(os.getenv("NEWS_RECENCY_WEIGHT", "0.3"))  # 0 = sadece alaka, 1 = sadece tarih
+NEWS_RECENCY_HALF_LIFE_DAYS = float(os.getenv("NEWS_RECENCY_HALF_LIFE_DAYS", "180"))
+NEWS_CANDIDATES = 50  # Sıralamaya giren aday sayısı (FTS ve embedding için ayrı ayrı)
+NEWS_STEM_LENGTH = 5  # Türkçe ekler için prefix (F5) eşleşmesi
+LEGACY_EMBEDDING_MODEL = "gemini-embedding-001"  # meta kaydı olmayan eski indekslerin embedding modeli
+FULL_CRAWL_META_KEY = "full_crawl_done"  # Sadece tam tarama sonuna kadar bitince yazılır
+
+# Arama sorgusunda anlam taşımayan kelimeler
+NEWS_STOPWORDS = {
+    "var", "mı", "mi", "mu", "mü", "ne", "neler", "nedir", "hangi", "nasıl",
+    "bir", "bu", "şu", "ile", "için", "olan", "oldu", "okul", "okulda",
+}
+
+TURKISH_MONTHS = {
+    "ocak": 1, "şubat": 2, "mart": 3, "nisan": 4, "mayıs": 5, "haziran": 6,
+    "temmuz": 7, "ağustos": 8, "eylül": 9, "ekim": 10, "kasım": 11, "aralık": 12,
+}
+
+_NUMERIC_DATE_RE = re.compile(r"(\d{1,2})[./-](\d{1,2})[./-](\d{4})")
+_TEXT_DATE_RE = re.compile(r"(\d{1,2})\s+([a-zçğıöşü]+)\s+(\d{4})")
+
+
+def parse_news_date(date_text: str) -> float:
+    """
+    Liste sayfasındaki tarih metnini epoch saniyeye çevirir.
+
+    Örnek:
+    - "12.03.2024" → 1710201600.0
+    - "12 Mart 2024" → 1710201600.0
+
+    Returns:
+        Epoch saniye, tanınmazsa None
+    """
+    if not date_text:
+        return None
+
+    text = turkish_lower(date_text)
+    match = _NUMERIC_DATE_RE.search(text)
+    if match:
+        day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    else:
+        match = _TEXT_DATE_RE.search(text)
+        if not match or match.group(2) not in TURKISH_MONTHS:
+            return None
+        day, month, year = int(match.group(1)), TURKISH_MONTHS[match.group(2)], int(match.group(3))
+
+    try:
+        return datetime(year, month, day).timestamp()
+    except ValueError:
+        return None
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Kullanıcı sorgusunu FTS5 MATCH ifadesine çevirir.
+
+    Kelimeler ilk NEWS_STEM_LENGTH harfleriyle prefix olarak aranır
+    ("etkinlikleri" → "etkin"*), böylece Türkçe ekler eşleşmeyi bozmaz.
+
+    Returns:
+        MATCH ifadesi, anlamlı kelime yoksa "" (genel arama)
+    """
+    terms = []
+    for token in normalize_query(query).split():
+        if len(token) < 3 or token in NEWS_STOPWORDS:
+            continue
+        term = f'"{token[:NEWS_STEM_LENGTH]}"*'
+        if term not in terms:
+            terms.append(term)
+    return " OR ".join(terms)
+
+
+def create_news_embedding_text(record: dict) -> str:
+    """Haber kaydından embedding metni oluşturur."""
+    parts = [record.get("title") or "", record.get("summary") or "", (record.get("content") or "")[:2000]]
+    return "\n".join(part for part in parts if part)
+
+
+class NewsIndex:
+    """
+    Duyuru arşivi için yerel arama indeksi (SQLite, thread-safe).
+
+    - news: haber kayıtları (başlık, özet, içerik, tarih, embedding)
+    - news_fts: Türkçe normalize edilmiş başlık + metin üzerinde FTS5
+    - search(): BM25 + embedding benzerliği + tarih (recency) ile sıralar
+    """
+
+    def __init__(self, path: str = NEWS_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS news (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                summary TEXT,
+                content TEXT,
+                image TEXT,
+                date_text TEXT,
+                published_at REAL,
+                embedding BLOB,
+                indexed_at REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                url UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 0'
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._conn.commit()
+        # Embedding matrisi cache'i (kayıt eklendikçe geçersiz olur)
+        self._vectors = None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+    def has(self, url: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM news WHERE url = ?", (url,)).fetchone() is not None
+
+    def get_meta(self, key: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    @property
+    def full_crawl_done(self) -> bool:
+        """Arşiv en az bir kez baştan sona tarandı mı? (Yarım kalan tarama sayılmaz.)"""
+        return self.get_meta(FULL_CRAWL_META_KEY) is not None
+
+    @property
+    def embedding_model(self) -> str:
+        """Kayıtlı embedding'lerin oluşturulduğu model."""
+        return self.get_meta("embedding_model") or LEGACY_EMBEDDING_MODEL
+
+    def all_records(self) -> list:
+        """Tüm haber kayıtları (embedding'leri yeniden oluşturmak için)."""
+        with self._lock:
+            urls = [row[0] for row in self._conn.execute("SELECT url FROM news").fetchall()]
+        return list(self._fetch_records(urls).values()) if urls else []
+
+    def set_embeddings(self, embeddings: dict):
+        """
+        Kayıtların embedding'lerini toplu günceller.
+
+        Args:
+            embeddings: {url: embedding} (None → embedding silinir)
+        """
+        rows = [
+            (np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None, url)
+            for url, embedding in embeddings.items()
+        ]
+        with self._lock:
+            self._conn.executemany("UPDATE news SET embedding = ? WHERE url = ?", rows)
+            self._conn.commit()
+            self._vectors = None
+
+    def upsert(self, record: dict, embedding: list = None):
+        """
+        Haber kaydını ekler veya günceller.
+
+        Args:
+            record: build_news_item formatında kayıt (title, summary, date, url, image, content)
+            embedding: create_news_embedding_text(record) embedding'i (opsiyonel)
+        """
+        url = record["url"]
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        body = " ".join(part for part in (record.get("summary"), record.get("content")) if part)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO news "
+                "(url, title, summary, content, image, date_text, published_at, embedding, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    record.get("title"),
+                    record.get("summary"),
+                    record.get("content"),
+                    record.get("image"),
+                    record.get("date"),
+                    parse_news_date(record.get("date")),
+                    blob,
+                    time.time(),
+                ),
+            )
+            self._conn.execute("DELETE FROM news_fts WHERE url = ?", (url,))
+            self._conn.execute(
+                "INSERT INTO news_fts (url, title, body) VALUES (?, ?, ?)",
+                (url, normalize_query(record.get("title") or ""), normalize_query(body)),
+            )
+            self._conn.commit()
+            self._vectors = None
+
+    def _load_vectors(self) -> tuple:
+        """(url listesi, normalize edilmiş embedding matrisi) döndürür."""
+        with self._lock:
+            if self._vectors is None:
+                rows = self._conn.execute("SELECT url, embedding FROM news WHERE embedding IS NOT NULL").fetchall()
+                if rows:
+                    matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                    matrix = matrix / np.where(norms == 0, 1, norms)
+                else:
+                    matrix = np.zeros((0, 0), dtype=np.float32)
+                self._vectors = ([url for url, _ in rows], matrix)
+            return self._vectors
+
+    def _lexical_scores(self, query: str) -> dict:
+        """FTS5 BM25 skorları (en iyi = 1.0)."""
+        match = build_fts_query(query)
+        if not match:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, bm25(news_fts) AS rank FROM news_fts WHERE news_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, NEWS_CANDIDATES),
+            ).fetchall()
+        if not rows:
+            return {}
+        # bm25() negatif döner; daha küçük = daha alakalı
+        best = rows[0][1] or -1.0
+        return {url: rank / best for url, rank in rows}
+
+    def _semantic_scores(self, query_embedding: list) -> dict:
+        """Embedding cosine benzerlikleri (adaylar arasında 0-1'e ölçeklenmiş)."""
+        urls, matrix = self._load_vectors()
+        if query_embedding is None or not urls:
+            return {}
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        if query_vector.shape[0] != matrix.shape[1]:
+            return {}  # Farklı embedding modeliyle oluşturulmuş indeks
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        similarities = matrix @ query_vector
+        top = np.argsort(-similarities)[:NEWS_CANDIDATES]
+        low, high = float(similarities[top[-1]]), float(similarities[top[0]])
+        spread = high - low
+        return {urls[i]: (float(similarities[i]) - low) / spread if spread else 1.0 for i in top}
+
+    def _fetch_records(self, urls: list) -> dict:
+        placeholders = ",".join("?" for _ in urls)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT url, title, summary, content, image, date_text, published_at FROM news WHERE url IN ({placeholders})",
+                urls,
+            ).fetchall()
+        return {
+            row[0]: {
+                "title": row[1],
+                "summary": row[2],
+                "date": row[5],
+                "url": row[0],
+                "image": row[4],
+                "content": row[3],
+                "published_at": row[6],
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def recency_score(published_at: float, now: float) -> float:
+        """Yarı ömür tabanlı tazelik skoru (bugün = 1.0, tarih yoksa 0)."""
+        if published_at is None:
+            return 0.0
+        age_days = max(0.0, (now - published_at) / 86400)
+        return 0.5 ** (age_days / NEWS_RECENCY_HALF_LIFE_DAYS)
+
+    def search(self, query: str, query_embedding: list = None, k: int = 3, embedding_model: str = None) -> list:
+        """
+        Alaka (BM25 + embedding) ve tazeliğe göre en iyi k haberi döndürür.
+
+        Args:
+            query: Kullanıcı sorgusu
+            query_embedding: Sorgu embedding'i (None ise sadece tam metin)
+            k: Döndürülecek haber sayısı
+            embedding_model: Sorgu embedding'inin modeli; indeksinkinden farklıysa
+                embedding benzerliği kullanılmaz
+
+        Returns:
+            build_news_item formatında kayıtlar (+ "score"); eşleşme yoksa []
+        """
+        if embedding_model is not None and embedding_model != self.embedding_model:
+            query_embedding = None  # Farklı modellerin vektörleri karşılaştırılmaz
+        lexical = self._lexical_scores(query)
+        semantic = self._semantic_scores(query_embedding)
+        candidates = set(lexical) | set(semantic)
+        if not candidates:
+            return []
+
+        records = self._fetch_records(list(candidates))
+        now = time.time()
+        for url, record in records.items():
+            scores = [source[url] for source in (lexical, semantic) if url in source]
+            # Sadece bir kaynakta çıkan aday diğerinden 0 alır
+            relevance = sum(scores) / (2 if lexical and semantic else 1)
+            recency = self.recency_score(record.pop("published_at"), now)
+            record["score"] = (1 - NEWS_RECENCY_WEIGHT) * relevance + NEWS_RECENCY_WEIGHT * recency
+
+        return sorted(records.values(), key=lambda record: record["score"], reverse=True)[:k]
+
+    def latest(self, k: int = 3) -> list:
+        """En yeni k haberi döndürür (genel sorgular için)."""
+        with self._lock:
+            urls = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT url FROM news ORDER BY published_at IS NULL, published_at DESC, indexed_at DESC LIMIT ?",
+                    (k,),
+                ).fetchall()
+            ]
+        if not urls:
+            return []
+        records = self._fetch_records(urls)
+        results = []
+        for url in urls:
+            record = records[url]
+            record.pop("published_at")
+            results.append(record)
+        return results
+
+
+_news_index = None
+_news_index_lock = threading.Lock()
+
+
+def get_news_index() -> NewsIndex:
+    """
+    Süreç genelinde paylaşılan NewsIndex örneğini döndürür.
+    NEWS_INDEX_PATH boşsa None döner (indeks kapalı).
+    """
+    global _news_index
+    if not NEWS_INDEX_PATH:
+        return None
+    if _news_index is None:
+        with _news_index_lock:
+            if _news_index is None:
+                _news_index = NewsIndex()
+    return _news_index
+
+
+# ============================================================================
+# CRAWLER
+# ============================================================================
+
+
+class NewsCrawler:
+    """
+    Duyuru arşivini sayfa sayfa tarayıp NewsIndex'e yazan arka plan işçisi.
+
+    - İlk çalıştırmada (indeks boşsa) tüm arşiv taranır
+    - Sonraki turlarda yeni kayıt içermeyen ilk sayfada durulur (incremental)
+    - Liste/detay sayfaları news_scraper üzerinden çekilir (HTTP cache dahil)
+    """
+
+    def __init__(self, index: NewsIndex, interval: int = NEWS_CRAWL_INTERVAL, max_pages: int = NEWS_CRAWL_MAX_PAGES):
+        self.index = index
+        self.interval = interval
+        self.max_pages = max_pages
+        self._embedder = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _get_embedder(self):
+        """Retriever'ın paylaşılan embedding modelini cache'li olarak tembel yükler (yoksa None)."""
+        if self._embedder is None:
+            try:
+                from retriever import get_retriever_service, get_cached_embedder
+                self._embedder = get_cached_embedder(get_retriever_service().embedding_model)
+            except Exception as e:
+                logger.warning("⚠️  Haber embedding'leri devre dışı: %s", e)
+                self._embedder = False
+        return self._embedder or None
+
+    def _embed_records(self, records: list) -> list:
+        embedder = self._get_embedder()
+        if embedder is None:
+            return [None] * len(records)
+        try:
+            return embedder.embed_documents([create_news_embedding_text(record) for record in records])
+        except Exception as e:
+            logger.warning("⚠️  Haber embedding'i alınamadı, sadece tam metin indekslenecek: %s", e)
+            return [None] * len(records)
+
+    def sync_embedding_model(self):
+        """
+        Embedding modeli değiştiyse kayıtlı haber embedding'lerini yeni modelle
+        yeniden oluşturur (alınamazsa siler); iki modelin vektörleri karışmaz.
+        """
+        from retriever import EMBEDDING_MODEL
+
+        if self.index.embedding_model == EMBEDDING_MODEL:
+            return
+        records = self.index.all_records()
+        if records:
+            logger.info("   🔁 Haber embedding'leri %s ile yeniden oluşturuluyor (%d haber)...", EMBEDDING_MODEL, len(records))
+            embeddings = self._embed_records(records)
+            if any(embedding is None for embedding in embeddings):
+                embeddings = [None] * len(records)
+            self.index.set_embeddings({record["url"]: embedding for record, embedding in zip(records, embeddings)})
+        self.index.set_meta("embedding_model", EMBEDDING_MODEL)
+
+    def crawl_page(self, page: int, seen: set) -> tuple:
+        """
+        Tek bir arşiv sayfasını indeksler.
+
+        Args:
+            page: Sayfa numarası (1'den başlar)
+            seen: Bu taramada görülen detay URL'leri (güncellenir)
+
+        Returns:
+            (sayfadaki daha önce görülmemiş URL sayısı, indekse eklenen haber sayısı);
+            sayfa alınamazsa (-1, 0)
+        """
+        from nodes.news_scraper import build_news_archive_url, scrape_news_list, fetch_news_details, build_news_item
+
+        items = scrape_news_list(build_news_archive_url(page))
+        if isinstance(items, dict) and "error" in items:
+            logger.warning("   ❌ Arşiv sayfası %d alınamadı: %s", page, items["error"])
+            return -1, 0
+
+        # Sayfa parametresi yok sayılırsa aynı kayıtlar tekrar gelir
+        items = [item for item in items if item.get("detail_url") and item["detail_url"] not in seen]
+        seen.update(item["detail_url"] for item in items)
+        new_items = [item for item in items if not self.index.has(item["detail_url"])]
+        if not new_items:
+            return len(items), 0
+
+        details = fetch_news_details(new_items)
+        records = [build_news_item(item, detail) for item, detail in zip(new_items, details)]
+        for record, embedding in zip(records, self._embed_records(records)):
+            self.index.upsert(record, embedding)
+
+        return len(items), len(records)
+
+    def crawl(self, full: bool = None) -> int:
+        """
+        Arşivi tarar.
+
+        Args:
+            full: True = tüm arşiv, False = yeni kayıt bulunmayan ilk sayfada dur,
+                  None = tam tarama henüz tamamlanmadıysa (yarım kaldıysa da) full
+
+        Returns:
+            Eklenen haber sayısı
+        """
+        if full is None:
+            full = not self.index.full_crawl_done
+
+        logger.info("\n🕷️  [NEWS CRAWLER] %s tarama başlıyor...", "Tam" if full else "Artımlı")
+        self.sync_embedding_model()
+        seen = set()
+        added = 0
+        completed = True  # Arşivin sonuna (veya max_pages sınırına) ulaşıldı mı?
+        for page in range(1, self.max_pages + 1):
+            if self._stop.is_set():
+                completed = False
+                break
+            unseen, page_added = self.crawl_page(page, seen)
+            added += page_added
+            if unseen < 0:
+                completed = False  # Sayfa alınamadı: tarama yarım
+                break
+            if unseen == 0:
+                break  # Boş sayfa veya tekrar eden sayfa → arşivin sonu
+            if not full and page_added == 0:
+                break  # Artımlı tarama: bu sayfadan sonrası zaten indekste
+
+        if full and completed:
+            self.index.set_meta(FULL_CRAWL_META_KEY, str(time.time()))
+        self.index.set_meta("last_crawl", str(time.time()))
+        logger.info("   ✅ Tarama bitti: %d yeni haber (toplam %d)", added, self.index.count())
+        return added
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.crawl()
+            except Exception as e:
+                logger.warning("⚠️  Haber taraması başarısız: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Arka plan thread'ini başlatır (zaten çalışıyorsa bir şey yapmaz)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="news-crawler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arka plan thread'ini durdurur."""
+        self._stop.set()
+
+
+_news_crawler = None
+_news_crawler_lock = threading.Lock()
+
+
+def start_news_crawler() -> NewsCrawler:
+    """
+    Süreç genelinde tek bir arka plan crawler'ı başlatır.
+    NEWS_CRAWLER_ENABLED=0 veya indeks kapalıysa None döner (indeks dosyası hiç oluşturulmaz).
+    """
+    global _news_crawler
+    if not NEWS_CRAWLER_ENABLED:
+        return None
+    index = get_news_index()
+    if index is None:
+        return None
+    with _news_crawler_lock:
+        if _news_crawler is None:
+            _news_crawler = NewsCrawler(index)
+        _news_crawler.start()
+    return _news_crawler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Duyuru arşivini tara / indekste ara")
+    parser.add_argument("query", nargs="?", help="Arama sorgusu (verilmezse tarama yapılır)")
+    parser.add_argument("--full", action="store_true", help="Tüm arşivi baştan tara")
+    parser.add_argument("--k", type=int, default=3, help="Sonuç sayısı")
+    args = parser.parse_args()
+    enable_console_trace()
+
+    index = get_news_index()
+    if args.query:
+        for record in index.search(args.query, k=args.k):
+            print(f"{record['score']:.3f}  {record['date']}  {record['title']}")
+    else:
+        NewsCrawler(index).crawl(full=True if args.full else None)
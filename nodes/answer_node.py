@@ -11,84 +11,75 @@ from prompts.role_prompt import get_role_prompt
 from prompts.style_guide import get_style_guide
 from prompts.context_rules import get_context_rules
 from prompts.output_format import get_output_format, build_minimal_system_prompt
-import json
+from prompts.context_format import format_education_context, format_news_context
+from history_manager import HISTORY_TOKEN_BUDGET, split_recent
+from functools import lru_cache
+from instrumentation import get_trace_logger
 
 
-def format_news_context(context: str) -> str:
+logger = get_trace_logger("answer_node")
+
+
+@lru_cache(maxsize=32)
+def get_system_prompt(active_levels: str) -> str:
+    """Kademe kombinasyonu başına bir kez oluşturulan minimal system prompt."""
+    return build_minimal_system_prompt(
+        role_prompt=get_role_prompt(),
+        style_guide=get_style_guide(),
+        context_rules=get_context_rules(),
+        output_format=get_output_format(),
+        active_levels=active_levels
+    )
+
+
+def render_context(state: ChatState) -> str:
     """
-    Event intent için context'i Markdown formatında düzenle.
-    Görseller ve kaynak linklerini ekle.
-    
-    Args:
-        context: JSON string (news_search_node'dan gelen)
+    LLM context metnini üretir (workflow'daki tek render noktası).
     
-    Returns:
-        Markdown formatında düzenlenmiş context
+    retrieved_docs varsa intent'e göre formatlanır (event → haber Markdown'ı,
+    diğerleri → eğitim blokları); yoksa doküman dışı not (retrieved_context)
+    olduğu gibi kullanılır.
     """
-    try:
-        news_items = json.loads(context)
-        
-        formatted = "**DUYURULAR VE ETKİNLİKLER:**\n\n"
-        
-        for i, item in enumerate(news_items, 1):
-            formatted += f"### {i}. {item['title']}\n\n"
-            
-            # Görsel varsa ekle
-            if item.get('image'):
-                formatted += f"![{item['title']}]({item['image']})\n\n"
-            
-            # İçerik
-            content = item.get('content') or item.get('summary', '')
-            if content:
-                formatted += f"{content}\n\n"
-            
-            # Tarih ve kaynak
-            formatted += f"📅 **Tarih:** {item.get('date', 'Tarih belirtilmemiş')}\n"
-            
-            if item.get('url'):
-                formatted += f"🔗 **Kaynak:** [{item['url']}]({item['url']})\n"
-            
-            formatted += "\n---\n\n"
-        
-        return formatted
-        
-    except json.JSONDecodeError:
-        # JSON değilse olduğu gibi dön
-        return context
+    docs = state.get("retrieved_docs")
+    if docs is None:
+        return state.get("retrieved_context") or ""
+    
+    logger.info("   📦 Context: %d doküman, ~%d token", len(docs), sum(doc["tokens"] for doc in docs))
+    
+    # Event intent için görseller + kaynaklar eklenir
+    if state.get("intent") == "event":
+        return format_news_context(docs)
+    return format_education_context(docs)
 
 
-def answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+def prepare_answer(state: ChatState) -> tuple:
     """
-    Answer node - final yanıtı oluşturur.
+    Answer node'un LLM'den bağımsız kısmı: sabit yanıtlar ve prompt hazırlığı.
     
     Args:
         state: Current conversation state
-        llm: LangChain LLM instance
     
     Returns:
-        Updated state with final answer
+        (fixed_answer, llm_messages): LLM gerekmiyorsa (yanıt, None),
+        gerekiyorsa (None, LLM'e gönderilecek mesajlar)
     """
     intent = state.get("intent", "unknown")
     query = state["user_query"]
-    context = state.get("retrieved_context", "")
     active_levels = state.get("active_levels", [])
     
-    print(f"\n💬 [ANSWER NODE] Final yanıt oluşturuluyor...")
-    print(f"   Intent: {intent}")
+    logger.info("💬 [ANSWER NODE] Final yanıt oluşturuluyor...\n   Intent: %s", intent)
     
     # Greeting intent - direkt yanıt ver
     if intent == "greeting":
         answer = "Merhaba! Ben Çözüm Eğitim Kurumları'nın veli asistanıyım. Size nasıl yardımcı olabilirim?"
-        state["final_answer"] = answer
-        print(f"   ✅ Greeting yanıtı oluşturuldu")
-        return state
+        logger.info("   ✅ Greeting yanıtı oluşturuldu")
+        return answer, None
     
     # Unknown intent - fallback
     if intent == "unknown":
         answer = "Üzgünüm, sorunuzu tam olarak anlayamadım. Eğitim programları, etkinlikler veya okul hakkında başka bir şey sormak ister misiniz?"
-        state["final_answer"] = answer
-        print(f"   ⚠️  Unknown intent - fallback yanıt")
-        return state
+        logger.info("   ⚠️  Unknown intent - fallback yanıt")
+        return answer, None
     
     # Price intent - contact info
     if intent == "price":
@@ -99,34 +90,25 @@ def answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
 🌐 **Website:** [okul website]
 
 Kayıt ve ücret konusundaki tüm detayları size aktaracaklardır."""
-        state["final_answer"] = answer
-        print(f"   💰 Price inquiry - contact info verildi")
-        return state
+        logger.info("   💰 Price inquiry - contact info verildi")
+        return answer, None
     
     # Education/Event intents - LLM ile yanıt oluştur
     active_levels_str = ", ".join(active_levels).title() if active_levels else "Tüm kademeler"
     
-    # Build minimal system prompt (context OLMADAN - multi-turn için)
-    minimal_system_prompt = build_minimal_system_prompt(
-        role_prompt=get_role_prompt(),
-        style_guide=get_style_guide(),
-        context_rules=get_context_rules(),
-        output_format=get_output_format(),
-        active_levels=active_levels_str
-    )
+    # Minimal system prompt (context OLMADAN - multi-turn için, kademe başına cache'li)
+    minimal_system_prompt = get_system_prompt(active_levels_str)
     
-    # Get conversation history (sliding window)
-    messages = state.get("messages", [])
-    recent_messages = messages[-10:] if len(messages) > 10 else messages  # Last 10 messages
+    # Eski turların özeti (history compaction node yazar)
+    conversation_summary = state.get("conversation_summary")
+    if conversation_summary:
+        minimal_system_prompt += f"\n\n**Önceki Konuşmanın Özeti:**\n{conversation_summary}"
     
-    # Build messages for LLM - Context'i SON mesajdan ÖNCE ekle!
-    # Bu sayede context SADECE son soruyla ilişkilendirilir
-    if len(recent_messages) > 0:
-        last_human_message = recent_messages[-1]
-        conversation_history = recent_messages[:-1]
-    else:
-        last_human_message = HumanMessage(content=query)
-        conversation_history = []
+    # Get conversation history - son soru hariç, token bütçesine sığan son turlar
+    messages = state.get("messages", [])
+    if messages and isinstance(messages[-1], HumanMessage):
+        messages = messages[:-1]  # Son soru aşağıda context ile birlikte eklenir
+    _, conversation_history = split_recent(messages, HISTORY_TOKEN_BUDGET)
     
     # Eski context mesajlarını filtrele (clean conversation history)
     # Context injection için kullanılan "İşte sorunuzla ilgili bulduğum bilgiler:" mesajlarını çıkar
@@ -140,11 +122,8 @@ Kayıt ve ücret konusundaki tüm detayları size aktaracaklardır."""
             continue
         filtered_history.append(msg)
     
-    # Event intent için context'i format'la (görseller + kaynaklar ekle)
-    if intent == "event":
-        formatted_context = format_news_context(context)
-    else:
-        formatted_context = context
+    # Doküman kayıtlarını context metnine çevir (tek render noktası)
+    formatted_context = render_context(state)
     
     # Context'i HumanMessage olarak ekle (daha doğal flow)
     llm_messages = [
@@ -157,20 +136,63 @@ Kayıt ve ücret konusundaki tüm detayları size aktaracaklardır."""
 {query}"""),  # ← Context + Soru birlikte (HumanMessage olarak)
     ]
     
-    print(f"   📝 LLM'e gönderilen mesaj sayısı: {len(llm_messages)} (sliding window + context injection)")
+    logger.info("   📝 LLM'e gönderilen mesaj sayısı: %d (özet + token bütçeli geçmiş + context injection)", len(llm_messages))
     
-    # Generate answer
-    response = llm.invoke(llm_messages)
-    answer = response.content if isinstance(response.content, str) else str(response.content)
+    return None, llm_messages
+
+
+def answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+    """
+    Answer node - final yanıtı oluşturur.
     
-    # Update state
-    state["final_answer"] = answer
+    Args:
+        state: Current conversation state
+        llm: LangChain LLM instance
     
-    print(f"   ✅ Final yanıt oluşturuldu ({len(answer)} karakter)")
+    Returns:
+        Updated state with final answer
+    """
+    answer, llm_messages = prepare_answer(state)
+    
+    if llm_messages is not None:
+        # Generate answer
+        response = llm.invoke(llm_messages)
+        answer = response.content if isinstance(response.content, str) else str(response.content)
+        logger.info("   ✅ Final yanıt oluşturuldu (%d karakter)", len(answer))
+    else:
+        response = AIMessage(content=answer)
+    
+    return finish_answer(state, answer, response)
+
+
+def finish_answer(state: ChatState, answer: str, response: AIMessage) -> ChatState:
+    """
+    Final yanıtı state'e yazar ve asistan mesajını geçmişe ekler.
+    
+    state["messages"] sadece yeni mesajı içerir; add_messages reducer onu
+    mevcut geçmişin sonuna ekler (liste kopyalanmaz). LLM yanıt mesajının
+    kendisi eklendiği için stream edilen token'lar tekrar yayınlanmaz.
+    """
+    state["final_answer"] = answer
+    state["messages"] = [response]
     
     return state
 
 
+async def aanswer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+    """answer_node'un async versiyonu (llm.ainvoke)."""
+    answer, llm_messages = prepare_answer(state)
+    
+    if llm_messages is not None:
+        response = await llm.ainvoke(llm_messages)
+        answer = response.content if isinstance(response.content, str) else str(response.content)
+        logger.info("   ✅ Final yanıt oluşturuldu (%d karakter)", len(answer))
+    else:
+        response = AIMessage(content=answer)
+    
+    return finish_answer(state, answer, response)
+
+
 def direct_answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
     """
     Direct answer node - context olmadan direkt yanıt ver (greeting, unknown).
@@ -180,13 +202,18 @@ def direct_answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatSta
     return answer_node(state, llm)
 
 
+async def adirect_answer_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+    """direct_answer_node'un async versiyonu."""
+    return await aanswer_node(state, llm)
+
+
 def search_news_node(state: ChatState) -> ChatState:
     """
     Search news node - okul haberleri ve etkinlikler (placeholder).
     
     TODO: Gerçek web scraping veya API entegrasyonu eklenecek.
     """
-    print(f"\n📰 [SEARCH NEWS NODE] Haber/etkinlik arama (placeholder)")
+    logger.info("📰 [SEARCH NEWS NODE] Haber/etkinlik arama (placeholder)")
     
     # Placeholder response
     state["retrieved_context"] = "🚧 Haber ve etkinlik arama özelliği henüz aktif değil."
@@ -200,7 +227,7 @@ def price_info_node(state: ChatState) -> ChatState:
     
     Ücret soruları için direkt contact info verir.
     """
-    print(f"\n💰 [PRICE INFO NODE] Ücret sorgusu - contact info hazırlanıyor")
+    logger.info("💰 [PRICE INFO NODE] Ücret sorgusu - contact info hazırlanıyor")
     
     # No context needed - answer_node will handle
     state["retrieved_context"] = "Price inquiry - contact info"
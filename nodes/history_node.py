@@ -0,0 +1,87 @@
+"""
+History Compaction Node
+Yanıttan sonra, bütçeyi aşan eski sohbet turlarını özete taşır
+"""
+
+from langchain_core.messages import RemoveMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from state_schema import ChatState
+from instrumentation import get_trace_logger
+from history_manager import (
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_KEEP_RATIO,
+    needs_compaction,
+    split_recent,
+    summarize_history,
+    asummarize_history,
+)
+
+
+logger = get_trace_logger("history_node")
+
+
+def select_messages_to_compact(state: ChatState) -> list:
+    """Özete taşınacak eski mesajları döndürür (gerek yoksa boş liste)."""
+    messages = state.get("messages", [])
+    if not needs_compaction(messages):
+        return []
+
+    # Bütçenin sadece bir kısmını verbatim bırak; her turda yeniden özetlenmesin
+    older, _ = split_recent(messages, int(HISTORY_TOKEN_BUDGET * HISTORY_KEEP_RATIO))
+    return older
+
+
+def apply_compaction(state: ChatState, older: list, summary: str) -> ChatState:
+    """Özeti state'e yazar ve özetlenen mesajları geçmişten siler."""
+    state["conversation_summary"] = summary
+    # add_messages reducer RemoveMessage'ları silme olarak uygular
+    state["messages"] = [RemoveMessage(id=message.id) for message in older]
+
+    logger.info("   ✅ %d mesaj özete taşındı (özet: %d karakter)", len(older), len(summary))
+    return state
+
+
+def history_compaction_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+    """
+    History compaction node - sohbet geçmişini token bütçesinde tutar.
+
+    Geçmiş HISTORY_TOKEN_BUDGET'ı aşarsa eski turlar önceki özetle birlikte
+    yeniden özetlenir ve checkpoint'ten silinir; böylece prompt boyutu ve
+    checkpoint boyutu uzun sohbetlerde sabit kalır.
+
+    Args:
+        state: Current conversation state
+        llm: LangChain LLM instance (özetleme için)
+
+    Returns:
+        Updated state (conversation_summary + silinen mesajlar)
+    """
+    older = select_messages_to_compact(state)
+    if not older:
+        return state
+
+    logger.info("🧳 [HISTORY NODE] Geçmiş bütçeyi aştı, %d mesaj özetleniyor...", len(older))
+    try:
+        summary = summarize_history(llm, state.get("conversation_summary"), older)
+    except Exception as e:
+        logger.warning("   ⚠️  Özetleme başarısız, sonraki turda tekrar denenecek: %s", e)
+        return state
+
+    return apply_compaction(state, older, summary)
+
+
+async def ahistory_compaction_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+    """history_compaction_node'un async versiyonu."""
+    older = select_messages_to_compact(state)
+    if not older:
+        return state
+
+    logger.info("🧳 [HISTORY NODE] Geçmiş bütçeyi aştı, %d mesaj özetleniyor...", len(older))
+    try:
+        summary = await asummarize_history(llm, state.get("conversation_summary"), older)
+    except Exception as e:
+        logger.warning("   ⚠️  Özetleme başarısız, sonraki turda tekrar denenecek: %s", e)
+        return state
+
+    return apply_compaction(state, older, summary)
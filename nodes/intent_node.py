@@ -3,33 +3,188 @@ Intent Detection Node
 Kullanıcı sorgusunun intent'ini tespit eder
 """
 
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from state_schema import ChatState
-from intent_detector import detect_intent
+from intent_detector import detect_intent, adetect_intent
 from langchain_google_genai import ChatGoogleGenerativeAI
+from retriever import SUPPORTED_LEVELS, get_retriever_service
+from nodes.retrieve_node import fetch_education_context, afetch_education_context
+from nodes.news_scraper import search_news_list, asearch_news_list, get_ready_news_index
+from instrumentation import get_trace_logger
+
+
+# Speculative retrieval için paylaşılan thread havuzu (tüm session'lar)
+SPECULATION_WORKERS = 8
+_speculation_executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculate")
+
 
+logger = get_trace_logger("intent_node")
 
-def intent_detection_node(state: ChatState, llm: ChatGoogleGenerativeAI) -> ChatState:
+
+def intent_detection_node(state: ChatState, llm: ChatGoogleGenerativeAI, query_embedding: list = None) -> ChatState:
     """
     Intent detection node - kullanıcı sorgusunu classify eder.
     
     Args:
         state: Current conversation state
         llm: LangChain LLM instance
+        query_embedding: Önceden hesaplanmış sorgu embedding'i (speculative node paylaşır)
     
     Returns:
         Updated state with intent information
     """
     query = state["user_query"]
     
-    # Intent detection
-    detection = detect_intent(llm, query)
+    # Intent detection (önce yerel fast-path, düşük güvende LLM)
+    detection = detect_intent(llm, query, query_embedding=query_embedding)
     
+    return apply_intent_detection(state, detection)
+
+
+async def aintent_detection_node(state: ChatState, llm: ChatGoogleGenerativeAI, query_embedding: list = None) -> ChatState:
+    """intent_detection_node'un async versiyonu."""
+    detection = await adetect_intent(llm, state["user_query"], query_embedding=query_embedding)
+    return apply_intent_detection(state, detection)
+
+
+def apply_intent_detection(state: ChatState, detection) -> ChatState:
+    """Intent detection sonucunu state'e yazar."""
     # Update state
     state["intent"] = detection.intent
     state["intent_confidence"] = detection.confidence
     state["intent_reasoning"] = detection.reasoning
     
-    print(f"\n🎯 [INTENT NODE] Intent: {detection.intent} (confidence: {detection.confidence:.2f})")
-    print(f"   Reasoning: {detection.reasoning}")
+    logger.info("🎯 [INTENT NODE] Intent: %s (confidence: %.2f)\n   Reasoning: %s",
+                detection.intent, detection.confidence, detection.reasoning)
+    
+    return state
+
+
+def embed_query_once(query: str) -> list:
+    """
+    Sorgu embedding'ini bir kez alır; spekülatif retrieval ve yerel intent
+    sınıflandırıcısı aynı vektörü kullanır (ikisi aynı anda LRU'yu ıskalayıp
+    ayrı ayrı embed etmesin diye). Hata olursa None: her iş kendi yolundan devam eder.
+    """
+    try:
+        return get_retriever_service().query_cache.embed_query(query)
+    except Exception as e:
+        logger.warning("   ⚠️  Sorgu embedding'i alınamadı: %s", e)
+        return None
+
+
+async def aembed_query_once(query: str) -> list:
+    """embed_query_once'ın async versiyonu."""
+    try:
+        return await get_retriever_service().query_cache.aembed_query(query)
+    except Exception as e:
+        logger.warning("   ⚠️  Sorgu embedding'i alınamadı: %s", e)
+        return None
+
+
+async def cancel_pending_tasks(*tasks):
+    """
+    Kullanılmayan spekülatif task'ları iptal eder ve bitmelerini bekler
+    (sızıntı ve "exception was never retrieved" uyarısı olmaz).
+    """
+    tasks = [task for task in tasks if task is not None]
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def speculative_intent_detection_node(state: ChatState, llm: ChatGoogleGenerativeAI, prefetch_news: bool = False) -> ChatState:
+    """
+    Speculative intent detection node.
+    
+    Intent detection sürerken FAISS retrieval'ı (ve opsiyonel olarak haber
+    listesi çekimini) paralel başlatır. Router ilgili dalı seçerse sonuç
+    state'e yazılır ve retrieve/news node'u tekrar arama yapmaz; seçmezse
+    sonuç atılır.
+    
+    Args:
+        state: Current conversation state
+        llm: LangChain LLM instance
+        prefetch_news: True ise haber listesi de spekülatif çekilir
+            (yerel haber indeksi hazırsa gerek olmadığından atlanır)
+    
+    Returns:
+        Updated state with intent (+ prefetched_docs / prefetched_news)
+    """
+    query = state["user_query"]
+    active_levels = state.get("active_levels", list(SUPPORTED_LEVELS))
+    
+    # Yerel haber indeksi doluysa news node canlı istek atmaz
+    prefetch_news = prefetch_news and get_ready_news_index() is None
+    
+    query_embedding = embed_query_once(query)
+    
+    # Spekülatif işleri intent detection'dan ÖNCE başlat
+    # (context kopyalanır: instrumentation tur metrikleri thread'de de kaydedilir)
+    retrieval_future = _speculation_executor.submit(
+        contextvars.copy_context().run, fetch_education_context, query, active_levels, query_embedding
+    )
+    news_future = _speculation_executor.submit(
+        contextvars.copy_context().run, search_news_list, query
+    ) if prefetch_news else None
+    
+    try:
+        state = intent_detection_node(state, llm, query_embedding)
+        intent = state["intent"]
+        
+        if intent == "education":
+            state["prefetched_docs"] = retrieval_future.result()
+        
+        if news_future is not None and intent == "event":
+            items, error_context = news_future.result()
+            if error_context is None:
+                state["prefetched_news"] = items
+    finally:
+        # Kullanılmayan (veya intent detection hata verdiyse tüm) işler: başlamadıysa iptal, başladıysa sonucu atılır
+        retrieval_future.cancel()
+        if news_future is not None:
+            news_future.cancel()
+    
+    logger.info("   ⚡ Speculative retrieval: %s", "kullanıldı" if intent == "education" else "atıldı")
+    
+    return state
+
+
+async def aspeculative_intent_detection_node(state: ChatState, llm: ChatGoogleGenerativeAI, prefetch_news: bool = False) -> ChatState:
+    """
+    speculative_intent_detection_node'un async versiyonu.
+    
+    Spekülatif işler thread yerine asyncio task olarak çalışır; seçilmeyen
+    dalın (intent detection hata verirse tüm) task'ları iptal edilip beklenir.
+    """
+    query = state["user_query"]
+    active_levels = state.get("active_levels", list(SUPPORTED_LEVELS))
+    
+    prefetch_news = prefetch_news and get_ready_news_index() is None
+    
+    query_embedding = await aembed_query_once(query)
+    
+    retrieval_task = asyncio.create_task(afetch_education_context(query, active_levels, query_embedding))
+    news_task = asyncio.create_task(asearch_news_list(query)) if prefetch_news else None
+    
+    try:
+        state = await aintent_detection_node(state, llm, query_embedding)
+        intent = state["intent"]
+        
+        if intent == "education":
+            state["prefetched_docs"] = await retrieval_task
+        
+        if news_task is not None and intent == "event":
+            items, error_context = await news_task
+            if error_context is None:
+                state["prefetched_news"] = items
+    finally:
+        await cancel_pending_tasks(retrieval_task, news_task)
+    
+    logger.info("   ⚡ Speculative retrieval: %s", "kullanıldı" if intent == "education" else "atıldı")
     
     return state
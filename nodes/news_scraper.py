@@ -4,53 +4,277 @@ NEWS SCRAPER + SEARCH NODE
 2. LangGraph node: Kullanıcı sorgusuyla haberleri arar ve context'e ekler
 """
 
+import os
+import logging
 import requests
-from bs4 import BeautifulSoup
+import httpx
+import asyncio
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
 import re
-import json
 import urllib.parse
 
 # ChatState import sadece LangGraph node için gerekli
 # __main__ test bloğunda kullanılmaz
 try:
-    from state_schema import ChatState
+    from state_schema import ChatState, RetrievedDoc, create_retrieved_doc
 except ImportError:
-    ChatState = None  # Test modunda gerekmiyor
+    ChatState = RetrievedDoc = None  # Test modunda gerekmiyor
+
+    def create_retrieved_doc(doc_id, level, title, content, score=None, metadata=None):
+        # Test modu: token sayısı kaba tahmin (token_budget yok)
+        return {"id": doc_id, "level": level, "title": title, "score": score,
+                "content": content or "", "tokens": len(content or "") // 4, "metadata": metadata or {}}
+
+try:
+    from news_cache import get_news_page_cache
+except ImportError:
+    get_news_page_cache = None  # Test modunda cache kullanılmaz
+
+try:
+    from news_index import get_news_index, NEWS_CRAWLER_ENABLED, NEWS_INDEX_PATH
+except ImportError:
+    get_news_index = None  # Test modunda yerel indeks kullanılmaz
+    NEWS_CRAWLER_ENABLED, NEWS_INDEX_PATH = False, None
+
+try:
+    from instrumentation import get_trace_logger
+    logger = get_trace_logger("news_scraper")
+except ImportError:
+    logger = logging.getLogger("cozum.trace.news_scraper")  # Test modu
+
+try:
+    import lxml  # noqa: F401 - sadece kurulu olup olmadığı kontrol edilir
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
 
 
 # ============================================================================
 # SCRAPER FUNCTIONS
 # ============================================================================
 
-def scrape_news_list(url: str) -> list:
+REQUEST_TIMEOUT = 10  # saniye
+CONNECT_TIMEOUT = 3.05  # saniye (TCP bağlantı kurulumu)
+HTTP_POOL_SIZE = 10  # Host başına açık tutulan keep-alive bağlantı sayısı
+NEWS_DETAIL_WORKERS = 4  # Çağrı başına eşzamanlı detay sayfası isteği üst sınırı
+NEWS_DETAIL_TIMEOUT = 5  # saniye - detay isteği başına okuma timeout'u (bağlantı: CONNECT_TIMEOUT)
+NEWS_DETAIL_DEADLINE = 8  # saniye - detay isteği başına bekleme sınırı (kuyrukta geçen süre dahil değil)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+# Event loop başına bir async HTTP client (bağlantılar loop'a bağlıdır)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Süreç genelinde paylaşılan, bağlantı havuzlu requests.Session döndürür.
+    
+    Keep-alive sayesinde aynı host'a yapılan istekler TCP+TLS kurulumunu
+    tekrar ödemez.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Çalışan event loop için paylaşılan httpx.AsyncClient döndürür."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+            follow_redirects=True,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _get_page_cache():
+    return get_news_page_cache() if get_news_page_cache else None
+
+
+def _lookup_page(url: str) -> tuple:
+    """(cache, kayıt) döndürür; SQLite okuması olduğu için async akışta thread'de çağrılır."""
+    cache = _get_page_cache()
+    return cache, (cache.get(url) if cache else None)
+
+
+def _store_response(cache, url: str, response, immutable: bool):
+    cache.put(
+        url,
+        response.text,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        immutable=immutable,
+    )
+
+
+def fetch_page(url: str, timeout: float = REQUEST_TIMEOUT, immutable: bool = False) -> str:
+    """
+    Sayfa HTML'ini kalıcı cache üzerinden döndürür.
+    
+    - Taze kayıt varsa ağa hiç çıkılmaz
+    - Eskimiş kayıt varsa koşullu GET yapılır (304 → cache'teki HTML)
+    - Site hata verirse eski kayıt döner, kayıt yoksa hata yükseltilir
+    
+    Args:
+        url: Sayfa adresi
+        timeout: Okuma timeout'u (saniye)
+        immutable: True ise kayıt hiç eskimez (haber detay sayfaları)
+    """
+    cache, entry = _lookup_page(url)
+    if entry and cache.is_fresh(entry):
+        cache.record("hit")
+        return entry["body"]
+    
+    try:
+        headers = cache.conditional_headers(entry) if cache else {}
+        r = get_http_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, timeout))
+        if r.status_code == 304 and entry:
+            cache.touch(url)
+            cache.record("revalidated")
+            return entry["body"]
+        r.raise_for_status()
+    except Exception as e:
+        if entry:
+            logger.warning("⚠️  %s alınamadı, cache'teki eski sayfa kullanılıyor: %s", url, e)
+            cache.record("stale")
+            return entry["body"]
+        raise
+    
+    if cache:
+        _store_response(cache, url, r, immutable)
+        cache.record("miss")
+    return r.text
+
+
+async def afetch_page(url: str, immutable: bool = False, timeout: float = REQUEST_TIMEOUT) -> str:
+    """
+    fetch_page'in async versiyonu (httpx).
+    
+    SQLite page cache çağrıları (get / touch / put) thread'de çalışır;
+    event loop diğer sohbetler için bloklanmaz.
+    """
+    cache, entry = await asyncio.to_thread(_lookup_page, url)
+    if entry and cache.is_fresh(entry):
+        cache.record("hit")
+        return entry["body"]
+    
+    try:
+        headers = cache.conditional_headers(entry) if cache else {}
+        r = await get_async_http_client().get(url, headers=headers, timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT))
+        if r.status_code == 304 and entry:
+            await asyncio.to_thread(cache.touch, url)
+            cache.record("revalidated")
+            return entry["body"]
+        r.raise_for_status()
+    except Exception as e:
+        if entry:
+            logger.warning("⚠️  %s alınamadı, cache'teki eski sayfa kullanılıyor: %s", url, e)
+            cache.record("stale")
+            return entry["body"]
+        raise
+    
+    if cache:
+        await asyncio.to_thread(_store_response, cache, url, r, immutable)
+        cache.record("miss")
+    return r.text
+
+
+# --- PARSING ---
+# "lxml": C parser + sadece ilgili container'ları parse eder (hızlı, varsayılan)
+# "html.parser": BeautifulSoup'un saf Python parser'ı ile tüm sayfa
+NEWS_PARSER = os.getenv("NEWS_PARSER", "lxml")
+
+def _has_class(class_name: str):
+    """
+    SoupStrainer için class eşleştiricisi.
+    
+    Parse sırasında class değeri henüz bölünmemiş tek string olarak gelir
+    ("col-md-12 mb-4 animated fadeIn"), bu yüzden token bazında bakılır.
+    """
+    def match(value) -> bool:
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return class_name in classes
+    return match
+
+
+# Sadece bu container'lar ağaca alınır (geri kalan sayfa parse edilmez)
+_LIST_STRAINER = SoupStrainer("div", class_=_has_class("fadeIn"))
+_DETAIL_STRAINER = SoupStrainer("div", class_=_has_class("page-detail"))
+
+# Önceden derlenmiş CSS seçiciler (her kartta yeniden derlenmez)
+_LIST_ITEM_SELECTOR = soupsieve.compile("div.col-md-12.mb-4.animated.fadeIn")
+_CARD_SELECTOR = soupsieve.compile(".card-archive-item")
+_CARD_IMAGE_SELECTOR = soupsieve.compile(".card__imagery")
+_CARD_TITLE_SELECTOR = soupsieve.compile(".card__title a")
+_CARD_SUMMARY_SELECTOR = soupsieve.compile(".card__body.d-none.d-md-block")
+_CARD_DATE_SELECTOR = soupsieve.compile(".card__date span.d-none.d-md-block")
+_DETAIL_SELECTOR = soupsieve.compile("div.page-detail")
+_DETAIL_IMAGE_SELECTOR = soupsieve.compile(".news-image img")
+_DETAIL_PARAGRAPH_SELECTOR = soupsieve.compile(".not-content p")
+
+
+def make_soup(html: str, strainer: SoupStrainer, parser: str = None) -> BeautifulSoup:
+    """
+    Seçili parser moduna göre BeautifulSoup ağacı oluşturur.
+    
+    Args:
+        html: Sayfa HTML'i
+        strainer: lxml modunda parse edilecek container'lar
+        parser: "lxml" veya "html.parser" (None = NEWS_PARSER)
+    """
+    parser = parser or NEWS_PARSER
+    if parser == "lxml" and LXML_AVAILABLE:
+        return BeautifulSoup(html, "lxml", parse_only=strainer)
+    return BeautifulSoup(html, "html.parser")
+
+
+def parse_news_list(html: str, parser: str = None) -> list:
     """
-    Çözüm Koleji duyurular liste sayfasından:
+    Duyurular liste sayfası HTML'inden:
     - image
     - title
     - summary
     - detail_url
     - date
-    döndüren scraper.
-    """
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-    except Exception as e:
-        return {"error": f"Liste sayfası alınamadı: {e}"}
+    alanlarını çıkarır.
     
-    soup = BeautifulSoup(r.text, "html.parser")
+    Args:
+        html: Liste sayfası HTML'i
+        parser: "lxml" veya "html.parser" (None = NEWS_PARSER, çıktı aynıdır)
+    """
+    soup = make_soup(html, _LIST_STRAINER, parser)
 
-    items = soup.select("div.col-md-12.mb-4.animated.fadeIn")
+    items = _LIST_ITEM_SELECTOR.select(soup)
     results = []
 
     for item in items:
         # Ana kart
-        card = item.select_one(".card-archive-item")
+        card = _CARD_SELECTOR.select_one(item)
         if not card:
             continue
         
         # GÖRSEL (background-image içinde)
-        img_div = card.select_one(".card__imagery")
+        img_div = _CARD_IMAGE_SELECTOR.select_one(card)
         image_url = None
         if img_div and "style" in img_div.attrs:
             match = re.search(r'url\((.*?)\)', img_div["style"])
@@ -58,18 +282,18 @@ def scrape_news_list(url: str) -> list:
                 image_url = match.group(1)
 
         # BAŞLIK
-        title_tag = card.select_one(".card__title a")
+        title_tag = _CARD_TITLE_SELECTOR.select_one(card)
         title = title_tag.get_text(strip=True) if title_tag else None
         
         # DETAY LINK
         detail_url = title_tag["href"] if title_tag else None
 
         # AÇIKLAMA (en uzun olan d-none d-md-block)
-        summary_tag = card.select_one(".card__body.d-none.d-md-block")
+        summary_tag = _CARD_SUMMARY_SELECTOR.select_one(card)
         summary = summary_tag.get_text(strip=True) if summary_tag else None
 
         # TARİH
-        date_tag = card.select_one(".card__date span.d-none.d-md-block")
+        date_tag = _CARD_DATE_SELECTOR.select_one(card)
         if date_tag:
             date_text = date_tag.get_text(strip=True)
             # "Eklenme Tarihi:" kısmını temizle
@@ -88,36 +312,58 @@ def scrape_news_list(url: str) -> list:
     return results
 
 
-def scrape_news_detail(url: str) -> dict:
+def scrape_news_list(url: str) -> list:
+    """
+    Çözüm Koleji duyurular liste sayfasını çeker ve parse eder.
+    Sayfa NEWS_CACHE_TTL süresince cache'ten gelir (bkz. fetch_page).
+    Hata durumunda {"error": ...} döner.
+    """
+    try:
+        html = fetch_page(url)
+    except Exception as e:
+        return {"error": f"Liste sayfası alınamadı: {e}"}
+    
+    return parse_news_list(html)
+
+
+async def ascrape_news_list(url: str) -> list:
+    """scrape_news_list'in async versiyonu (httpx)."""
+    try:
+        html = await afetch_page(url)
+    except Exception as e:
+        return {"error": f"Liste sayfası alınamadı: {e}"}
+    
+    return parse_news_list(html)
+
+
+def parse_news_detail(html: str, parser: str = None) -> dict:
     """
-    Çözüm Koleji haber detay sayfasından
+    Haber detay sayfası HTML'inden
     - fotoğraf
     - başlık
     - içerik (HTML -> temiz text)
     
-    döndüren scraper.
+    alanlarını çıkarır.
     
     NOT: Bazı haberlerde tek <p> var (title + content birleşik),
     bazılarında ayrı. Her ikisi de handle edilir.
-    """
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-    except Exception as e:
-        return {"error": f"Sayfa çekilemedi: {e}"}
     
-    soup = BeautifulSoup(r.text, "html.parser")
+    Args:
+        html: Detay sayfası HTML'i
+        parser: "lxml" veya "html.parser" (None = NEWS_PARSER, çıktı aynıdır)
+    """
+    soup = make_soup(html, _DETAIL_STRAINER, parser)
     
-    page_detail = soup.select_one("div.page-detail")
+    page_detail = _DETAIL_SELECTOR.select_one(soup)
     if not page_detail:
         return {"error": "page-detail div bulunamadı"}
 
     # FOTO
-    img_tag = page_detail.select_one(".news-image img")
+    img_tag = _DETAIL_IMAGE_SELECTOR.select_one(page_detail)
     image_url = img_tag["src"] if img_tag and img_tag.has_attr('src') else None
 
     # BAŞLIK + İÇERİK
-    p_tags = page_detail.select(".not-content p")
+    p_tags = _DETAIL_PARAGRAPH_SELECTOR.select(page_detail)
     if not p_tags:
         return {"error": "not-content altında p etiketi yok"}
     
@@ -146,6 +392,92 @@ def scrape_news_detail(url: str) -> dict:
     }
 
 
+def scrape_news_detail(url: str, timeout: float = REQUEST_TIMEOUT) -> dict:
+    """
+    Çözüm Koleji haber detay sayfasını çeker ve parse eder.
+    Detay sayfaları URL bazında kalıcı olarak cache'lenir.
+    Hata durumunda {"error": ...} döner.
+    """
+    try:
+        html = fetch_page(url, timeout=timeout, immutable=True)
+    except Exception as e:
+        return {"error": f"Sayfa çekilemedi: {e}"}
+    
+    return parse_news_detail(html)
+
+
+async def ascrape_news_detail(url: str, timeout: float = REQUEST_TIMEOUT) -> dict:
+    """scrape_news_detail'in async versiyonu (httpx)."""
+    try:
+        html = await afetch_page(url, immutable=True, timeout=timeout)
+    except Exception as e:
+        return {"error": f"Sayfa çekilemedi: {e}"}
+    
+    return parse_news_detail(html)
+
+
+def fetch_news_details(items: list, deadline: float = NEWS_DETAIL_DEADLINE) -> list:
+    """
+    Haberlerin detay sayfalarını EŞZAMANLI çeker.
+    
+    Her çağrı kendi küçük havuzunu kullanır (en fazla NEWS_DETAIL_WORKERS
+    thread): başka oturumların veya crawler'ın istekleri arkasında kuyrukta
+    beklenmez. Her istek bağlantı (CONNECT_TIMEOUT) ve okuma
+    (NEWS_DETAIL_TIMEOUT) timeout'uyla kendi kendini sınırlar; deadline
+    içinde bitmeyen sayfalar {"error": ...} olarak döner.
+    
+    Args:
+        items: scrape_news_list kayıtları
+        deadline: İstek başına saniye cinsinden bekleme sınırı
+    
+    Returns:
+        items ile aynı sırada detay sonuçları (detail_url yoksa None)
+    """
+    urls = [item.get("detail_url") for item in items]
+    pending = [url for url in urls if url]
+    if not pending:
+        return [None] * len(items)
+    
+    workers = min(NEWS_DETAIL_WORKERS, len(pending))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news-detail")
+    try:
+        futures = [executor.submit(scrape_news_detail, url, NEWS_DETAIL_TIMEOUT) if url else None for url in urls]
+        waves = -(-len(pending) // workers)  # Havuzdan sırayla geçen istek grubu sayısı
+        wait([future for future in futures if future is not None], timeout=deadline * waves)
+    finally:
+        # Süresi dolan istekler timeout'larıyla kendiliğinden biter; beklenmez
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    details = []
+    for future in futures:
+        if future is None:
+            details.append(None)
+        elif future.done() and not future.cancelled():
+            details.append(future.result())
+        else:
+            details.append({"error": f"Detay sayfası {deadline} sn içinde alınamadı"})
+    return details
+
+
+async def afetch_news_details(items: list, deadline: float = NEWS_DETAIL_DEADLINE) -> list:
+    """
+    fetch_news_details'in async versiyonu (çağrı başına semaphore ile sınırlı
+    eşzamanlılık; deadline semaphore beklemesinden sonra, istek başına işler).
+    """
+    semaphore = asyncio.Semaphore(NEWS_DETAIL_WORKERS)
+    
+    async def fetch_detail(item: dict):
+        if not item.get("detail_url"):
+            return None
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(ascrape_news_detail(item["detail_url"], NEWS_DETAIL_TIMEOUT), timeout=deadline)
+            except asyncio.TimeoutError:
+                return {"error": f"Detay sayfası {deadline} sn içinde alınamadı"}
+    
+    return await asyncio.gather(*(fetch_detail(item) for item in items))
+
+
 # ============================================================================
 # LANGGRAPH NODE
 # ============================================================================
@@ -194,133 +526,333 @@ def extract_search_keywords(query: str) -> str:
     return query
 
 
-def news_search_node(state: ChatState) -> ChatState:
+NEWS_SITE_URL = os.getenv("NEWS_SITE_URL", "https://www.cozumkoleji.com.tr").rstrip("/")  # Benchmark'ta yerel sunucu
+NEWS_LIST_BASE_URL = f"{NEWS_SITE_URL}/icerik/duyurular/liste"
+
+
+def build_news_list_url(search_keyword: str) -> str:
+    """Anahtar kelime için duyuru listesi URL'ini oluşturur (boş = tüm haberler)."""
+    # URL encode
+    encoded_title = urllib.parse.quote(search_keyword)
+    return f"{NEWS_LIST_BASE_URL}?title={encoded_title}&year="
+
+
+def build_news_archive_url(page: int) -> str:
+    """Arşiv taraması için filtresiz duyuru listesinin sayfa URL'ini oluşturur."""
+    return f"{NEWS_LIST_BASE_URL}?title=&year=&page={page}"
+
+
+NEWS_TOP_K = 3  # LLM'e gönderilen haber sayısı
+
+
+def get_ready_news_index():
     """
-    Kullanıcının sorusunu title parametresi olarak kullanarak
-    Çözüm Koleji duyurular sayfasından haber listesi çeker.
+    Yerel haber indeksi açık ve arşiv en az bir kez tam taranmışsa döndürür,
+    değilse None (ilk tarama sürerken yarım indeksle yanıt verilmez, canlı siteye gidilir).
     
-    İlk 3 haberin DETAYLARINI da çekip full content ile birlikte
-    LLM'e gönderir (daha zengin context).
-    
-    Sonuçları JSON string olarak state["retrieved_context"] içine yazar.
+    Crawler kapalıysa veya indeks dosyası yoksa indeks hiç açılmaz
+    (boş SQLite dosyası / FTS şeması oluşturulmaz).
     """
-    query = state.get("user_query", "").strip()
+    if get_news_index is None or not NEWS_CRAWLER_ENABLED or not NEWS_INDEX_PATH or not os.path.exists(NEWS_INDEX_PATH):
+        return None
+    index = get_news_index()
+    if index is None or not index.full_crawl_done:
+        return None
+    return index
 
-    if not query:
-        state["retrieved_context"] = "Haber araması yapılamadı: user_query boş."
-        return state
 
-    print("\n📰 [NEWS SEARCH NODE] Haber araması başlıyor...")
-    print(f"   🔍 Sorgu: {query}")
+def embed_news_query(query: str) -> list:
+    """Sorgu embedding'ini retriever'ın query cache'inden alır (hata olursa None)."""
+    try:
+        from retriever import get_retriever_service
+        return get_retriever_service().query_cache.embed_query(query)
+    except Exception as e:
+        logger.warning("   ⚠️  Sorgu embedding'i alınamadı, sadece tam metin arama: %s", e)
+        return None
+
+
+async def aembed_news_query(query: str) -> list:
+    """embed_news_query'nin async versiyonu."""
+    try:
+        from retriever import get_retriever_service
+        return await get_retriever_service().query_cache.aembed_query(query)
+    except Exception as e:
+        logger.warning("   ⚠️  Sorgu embedding'i alınamadı, sadece tam metin arama: %s", e)
+        return None
+
 
-    # Kullanıcı sorgusundan anahtar kelime çıkar
+def search_news_index(index, query: str, query_embedding: list = None) -> list:
+    """
+    Yerel haber indeksinden alaka + tazeliğe göre ilk NEWS_TOP_K haberi döndürür.
+    
+    Eşleşme yoksa (canlı aramadaki fallback gibi) en yeni haberler döner.
+    """
+    logger.info("   🗂️  Yerel haber indeksinde aranıyor (%d haber)...", index.count())
+    embedding_model = None
+    if query_embedding is not None:
+        from retriever import EMBEDDING_MODEL
+        embedding_model = EMBEDDING_MODEL  # İndeks başka modelle oluşturulduysa sadece tam metin
+    news_context = index.search(query, query_embedding, k=NEWS_TOP_K, embedding_model=embedding_model)
+    if not news_context:
+        logger.info("   ⚠️  Eşleşme yok, en yeni haberler kullanılıyor")
+        news_context = index.latest(NEWS_TOP_K)
+    
+    return news_context
+
+
+def get_news_search_keyword(query: str) -> str:
+    """Sorgudan anahtar kelimeyi çıkarır ve loglar."""
     search_keyword = extract_search_keywords(query)
     
     if search_keyword:
-        print(f"   🔑 Anahtar kelime: '{search_keyword}'")
+        logger.info("   🔑 Anahtar kelime: '%s'", search_keyword)
     else:
-        print(f"   🔑 Genel arama (tüm haberler)")
-
-    # URL encode
-    encoded_title = urllib.parse.quote(search_keyword)
+        logger.info("   🔑 Genel arama (tüm haberler)")
+    
+    return search_keyword
 
-    # API-like endpoint
-    base_url = "https://www.cozumkoleji.com.tr/icerik/duyurular/liste"
-    url = f"{base_url}?title={encoded_title}&year="
 
-    print(f"   🌐 Fetching URL: {url}")
+def check_news_list_result(data) -> tuple:
+    """İlk liste isteğinin sonucunu (items, error_context) çiftine çevirir."""
+    if isinstance(data, dict) and "error" in data:
+        logger.warning("   ❌ Scraper hata verdi: %s", data["error"])
+        return None, f"Scraper error: {data['error']}"
+    return data, None
 
-    # Scraper'ı çalıştır
-    data = scrape_news_list(url)
 
-    # Error case
+def check_fallback_result(data) -> tuple:
+    """Fallback (tüm haberler) isteğinin sonucunu (items, error_context) çiftine çevirir."""
+    # Fallback da başarısız olursa
     if isinstance(data, dict) and "error" in data:
-        print("   ❌ Scraper hata verdi:", data["error"])
-        state["retrieved_context"] = f"Scraper error: {data['error']}"
-        return state
+        logger.warning("   ❌ Fallback de başarısız: %s", data["error"])
+        return None, "Haber listesi alınamadı."
+    
+    if len(data) == 0:
+        logger.info("   ❌ Hiç haber bulunamadı (fallback).")
+        return None, "Şu anda görüntülenebilecek duyuru bulunmuyor."
+    
+    logger.info("   ✅ Fallback başarılı: %d haber bulundu", len(data))
+    return data, None
+
+
+def search_news_list(query: str) -> tuple:
+    """
+    Sorgudan anahtar kelime çıkarır ve duyuru listesini çeker.
+    Spesifik anahtar kelimeyle sonuç yoksa tüm haberlere düşer (fallback).
+    
+    News search node ve speculative prefetch (intent node) tarafından kullanılır.
+    
+    Returns:
+        (items, error_context): Başarılıysa (liste, None),
+        değilse (None, state'e yazılacak açıklama)
+    """
+    search_keyword = get_news_search_keyword(query)
+    url = build_news_list_url(search_keyword)
+    logger.info("   🌐 Fetching URL: %s", url)
+
+    # Scraper'ı çalıştır
+    data, error_context = check_news_list_result(scrape_news_list(url))
+    if error_context:
+        return None, error_context
 
     # Eğer sonuç yoksa ve spesifik anahtar kelime kullanıldıysa FALLBACK: Genel sorgu
     if len(data) == 0 and search_keyword:
-        print("   ⚠️  Spesifik sonuç yok, tüm haberler çekiliyor...")
-        fallback_url = f"{base_url}?title=&year="
-        data = scrape_news_list(fallback_url)
-        
-        # Fallback da başarısız olursa
-        if isinstance(data, dict) and "error" in data:
-            print("   ❌ Fallback de başarısız:", data["error"])
-            state["retrieved_context"] = "Haber listesi alınamadı."
-            return state
-        
-        if len(data) == 0:
-            print("   ❌ Hiç haber bulunamadı (fallback).")
-            state["retrieved_context"] = "Şu anda görüntülenebilecek duyuru bulunmuyor."
-            return state
-        
-        print(f"   ✅ Fallback başarılı: {len(data)} haber bulundu")
+        logger.info("   ⚠️  Spesifik sonuç yok, tüm haberler çekiliyor...")
+        return check_fallback_result(scrape_news_list(build_news_list_url("")))
+
+    return data, None
+
+
+async def asearch_news_list(query: str) -> tuple:
+    """search_news_list'in async versiyonu."""
+    search_keyword = get_news_search_keyword(query)
+    url = build_news_list_url(search_keyword)
+    logger.info("   🌐 Fetching URL: %s", url)
+
+    data, error_context = check_news_list_result(await ascrape_news_list(url))
+    if error_context:
+        return None, error_context
+
+    if len(data) == 0 and search_keyword:
+        logger.info("   ⚠️  Spesifik sonuç yok, tüm haberler çekiliyor...")
+        return check_fallback_result(await ascrape_news_list(build_news_list_url("")))
+
+    return data, None
+
+
+def build_news_item(item: dict, detail_data: dict = None) -> dict:
+    """
+    Liste kaydını (ve varsa detay sayfasını) LLM context kaydına çevirir.
+    
+    Detay çekilemediyse (None veya {"error": ...}) sadece liste bilgisi kullanılır.
+    """
+    detail_url = item.get("detail_url")
+    
+    if detail_data is None or "error" in detail_data:
+        return {
+            "title": item["title"],
+            "summary": item["summary"],
+            "date": item["date"],
+            "url": detail_url,
+            "image": item["image"],
+            "content": None  # Detay yok
+        }
+    
+    return {
+        "title": detail_data["title"],
+        "summary": item["summary"],  # Liste'den gelen özet
+        "date": item["date"],
+        "url": detail_url,
+        "image": detail_data["image"],
+        "content": detail_data["content"]  # ← FULL CONTENT!
+    }
+
+
+def build_news_doc(item: dict) -> RetrievedDoc:
+    """
+    build_news_item / haber indeksi kaydını RetrievedDoc'a çevirir.
+    
+    İçerik detay sayfasının tam metnidir, detay yoksa liste özeti kullanılır.
+    """
+    return create_retrieved_doc(
+        doc_id=item.get("url") or item["title"],
+        level="haber",
+        title=item["title"],
+        content=item.get("content") or item.get("summary") or "",
+        score=item.get("score"),
+        metadata={
+            "date": item.get("date"),
+            "url": item.get("url"),
+            "image": item.get("image"),
+        },
+    )
+
+
+def start_news_search(state: ChatState) -> str:
+    """Node başlangıç kontrolü. Sorgu boşsa state'e açıklama yazar ve None döner."""
+    query = state.get("user_query", "").strip()
+
+    if not query:
+        state["retrieved_context"] = "Haber araması yapılamadı: user_query boş."
+        return None
+
+    logger.info("📰 [NEWS SEARCH NODE] Haber araması başlıyor...\n   🔍 Sorgu: %s", query)
+    return query
+
+
+def finish_news_search(state: ChatState, news_context: list) -> ChatState:
+    """Haber kayıtlarını RetrievedDoc olarak state'e yazar (render answer node'da)."""
+    docs = [build_news_doc(item) for item in news_context]
+    logger.info("   🎯 %d haber detayı LLM'e gönderiliyor (~%d token)", len(docs), sum(doc["tokens"] for doc in docs))
+
+    state["retrieved_docs"] = docs
+
+    return state
+
+
+def news_search_node(state: ChatState) -> ChatState:
+    """
+    Kullanıcının sorusunu title parametresi olarak kullanarak
+    Çözüm Koleji duyurular sayfasından haber listesi çeker.
+    
+    İlk 3 haberin DETAYLARINI da (paylaşılan bağlantı havuzu üzerinden,
+    eşzamanlı ve deadline ile sınırlı) çekip full content ile birlikte
+    LLM'e gönderir (daha zengin context).
+    
+    Arka plan crawler'ının doldurduğu yerel indeks hazırsa canlı istek
+    atılmaz; haberler indeksten (alaka + tarih sıralı) milisaniyeler içinde gelir.
+    
+    Speculative mode'da liste zaten çekildiyse (state["prefetched_news"])
+    tekrar istek atılmaz.
+    
+    Sonuçları RetrievedDoc kayıtları olarak state["retrieved_docs"] içine yazar;
+    hata durumunda açıklama state["retrieved_context"]'e yazılır.
+    """
+    query = start_news_search(state)
+    if query is None:
+        return state
+
+    index = get_ready_news_index()
+    if index is not None:
+        return finish_news_search(state, search_news_index(index, query, embed_news_query(query)))
+
+    if state.get("prefetched_news") is not None:
+        logger.info("   ⚡ Speculative liste sonucu kullanılıyor")
+        data, error_context = state["prefetched_news"], None
+    else:
+        data, error_context = search_news_list(query)
+    
+    if error_context:
+        state["retrieved_context"] = error_context
+        return state
 
     # İlk 3 haberi alalım (detay çekmek için)
     top_items = data[:3]
 
-    print(f"   ✅ {len(top_items)} haber bulundu, detayları çekiliyor...")
+    logger.info("   ✅ %d haber bulundu, detayları eşzamanlı çekiliyor...", len(top_items))
+
+    # Detay sayfalarını paralel çek (toplam süre en yavaş sayfa kadar)
+    details = fetch_news_details(top_items)
 
     # LLM'e gönderilecek zengin context
     news_context = []
 
-    for idx, item in enumerate(top_items, 1):
-        detail_url = item.get("detail_url")
-        
-        # Detay sayfasını çek
-        if detail_url:
-            print(f"   📄 {idx}/{len(top_items)}: {item['title'][:50]}...")
-            detail_data = scrape_news_detail(detail_url)
+    for idx, (item, detail_data) in enumerate(zip(top_items, details), 1):
+        # Detay sayfası sonucu
+        if detail_data is not None:
+            logger.info("   📄 %d/%d: %s...", idx, len(top_items), item["title"][:50])
             
             if "error" in detail_data:
                 # Detay çekilemezse sadece özet kullan
-                print(f"      ⚠️  Detay çekilemedi, özet kullanılıyor")
-                news_context.append({
-                    "title": item["title"],
-                    "summary": item["summary"],
-                    "date": item["date"],
-                    "url": detail_url,
-                    "image": item["image"],
-                    "content": None  # Detay yok
-                })
+                logger.info("      ⚠️  Detay çekilemedi, özet kullanılıyor")
             else:
-                # Full content ile birlikte ekle
-                content_preview = detail_data["content"][:100] + "..." if len(detail_data["content"]) > 100 else detail_data["content"]
-                print(f"      ✅ Detay çekildi ({len(detail_data['content'])} karakter)")
-                
-                news_context.append({
-                    "title": detail_data["title"],
-                    "summary": item["summary"],  # Liste'den gelen özet
-                    "date": item["date"],
-                    "url": detail_url,
-                    "image": detail_data["image"],
-                    "content": detail_data["content"]  # ← FULL CONTENT!
-                })
-        else:
-            # URL yoksa sadece liste bilgisiyle ekle
-            news_context.append({
-                "title": item["title"],
-                "summary": item["summary"],
-                "date": item["date"],
-                "url": None,
-                "image": item["image"],
-                "content": None
-            })
+                logger.info("      ✅ Detay çekildi (%d karakter)", len(detail_data["content"]))
+        
+        news_context.append(build_news_item(item, detail_data))
 
-    print(f"   🎯 {len(news_context)} haber detayı LLM'e gönderiliyor")
+    return finish_news_search(state, news_context)
 
-    # State'e ekle (stringify)
-    state["retrieved_context"] = json.dumps(news_context, ensure_ascii=False, indent=2)
 
-    return state
+async def anews_search_node(state: ChatState) -> ChatState:
+    """
+    news_search_node'un async versiyonu.
+    
+    Detay sayfaları asyncio.gather ile eşzamanlı çekilir (afetch_news_details).
+    """
+    query = start_news_search(state)
+    if query is None:
+        return state
+
+    index = get_ready_news_index()
+    if index is not None:
+        return finish_news_search(state, search_news_index(index, query, await aembed_news_query(query)))
+
+    if state.get("prefetched_news") is not None:
+        logger.info("   ⚡ Speculative liste sonucu kullanılıyor")
+        data, error_context = state["prefetched_news"], None
+    else:
+        data, error_context = await asearch_news_list(query)
+    
+    if error_context:
+        state["retrieved_context"] = error_context
+        return state
+
+    # İlk 3 haberi alalım (detay çekmek için)
+    top_items = data[:3]
+
+    logger.info("   ✅ %d haber bulundu, detayları eşzamanlı çekiliyor...", len(top_items))
+
+    details = await afetch_news_details(top_items)
+    news_context = [build_news_item(item, detail) for item, detail in zip(top_items, details)]
+
+    return finish_news_search(state, news_context)
 
 # ============================================================================
 # TEST
 # ============================================================================
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("="*80)
     print("TEST 1: DUYURU LİSTESİ")
     print("="*80)
@@ -359,7 +891,8 @@ if __name__ == "__main__":
     # Mock state (genel sorgu - boş title ile tüm haberler)
     mock_state = {
         "user_query": "çözüm",  # Çalışan bir sorgu (TEST 1'deki gibi)
-        "retrieved_context": ""
+        "retrieved_docs": None,
+        "retrieved_context": None
     }
     
     result_state = news_search_node(mock_state)
@@ -367,21 +900,18 @@ if __name__ == "__main__":
     print("\n📋 LLM'E GÖNDERİLEN CONTEXT:")
     print("="*80)
     
-    context_data = json.loads(result_state["retrieved_context"])
+    if result_state["retrieved_docs"] is None:
+        print(f"❌ HATA: {result_state['retrieved_context']}")
     
-    for idx, item in enumerate(context_data, 1):
-        print(f"\n{idx}. {item['title']}")
-        print(f"   📅 {item['date']}")
-        print(f"   🔗 {item.get('url', 'URL yok')}")
+    for idx, doc in enumerate(result_state["retrieved_docs"] or [], 1):
+        print(f"\n{idx}. {doc['title']}")
+        print(f"   📅 {doc['metadata']['date']}")
+        print(f"   🔗 {doc['metadata']['url'] or 'URL yok'}")
         
-        if item.get("content"):
-            content_len = len(item["content"])
-            preview = item["content"][:150] + "..." if content_len > 150 else item["content"]
-            print(f"   ✅ Full Content ({content_len} karakter):")
-            print(f"      {preview}")
-        else:
-            print(f"   ⚠️  Sadece özet:")
-            print(f"      {item['summary'][:100]}...")
+        content_len = len(doc["content"])
+        preview = doc["content"][:150] + "..." if content_len > 150 else doc["content"]
+        print(f"   ✅ İçerik ({content_len} karakter, ~{doc['tokens']} token):")
+        print(f"      {preview}")
     
     print("\n" + "="*80)
     print("✅ TÜM TESTLER TAMAMLANDI")
@@ -0,0 +1,77 @@
+"""
+Rerank Node
+Retrieve edilen adayları cross-encoder ile yeniden sıralar ve alakasızları eler
+"""
+
+import asyncio
+import logging
+
+from state_schema import ChatState
+from reranker import get_reranker, RERANK_TOP_K
+from instrumentation import get_trace_logger
+
+
+logger = get_trace_logger("rerank_node")
+
+
+def rerank_docs(query: str, docs: list) -> list:
+    """
+    Adayları rerank eder; model yüklenemezse retrieval sırası korunur.
+
+    Returns:
+        RetrievedDoc listesi
+    """
+    try:
+        return get_reranker().rerank(query, docs)
+    except Exception as e:
+        # sentence-transformers kurulu değil / model indirilemedi → rerank'siz devam
+        logger.warning("   ⚠️  Rerank başarısız, retrieval sırası kullanılıyor: %s", e)
+        return docs[:RERANK_TOP_K]
+
+
+def log_reranked_docs(before: list, after: list):
+    """Eleme sonucunu ve kalan dokümanların skorlarını loglar."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info("   ✅ %d aday → %d doküman", len(before), len(after))
+    for doc in after:
+        score = f"{doc['score']:.3f}" if doc.get("score") is not None else "-"
+        logger.info("      %s  [%s] %s", score, doc["level"], doc["title"])
+
+
+def rerank_node(state: ChatState) -> ChatState:
+    """
+    Rerank node - retrieved_docs'u cross-encoder skoruna göre sıralar ve keser.
+
+    Sadece RERANK_ENABLED=1 iken graph'a eklenir (retrieve → rerank → compression).
+
+    Args:
+        state: Current conversation state
+
+    Returns:
+        Updated state with reranked docs
+    """
+    docs = state.get("retrieved_docs")
+    if not docs:
+        return state
+
+    logger.info("🎯 [RERANK NODE] %d aday yeniden sıralanıyor...", len(docs))
+    reranked = rerank_docs(state["user_query"], docs)
+    log_reranked_docs(docs, reranked)
+    state["retrieved_docs"] = reranked
+
+    return state
+
+
+async def arerank_node(state: ChatState) -> ChatState:
+    """rerank_node'un async versiyonu (forward pass thread'de, event loop bloklanmaz)."""
+    docs = state.get("retrieved_docs")
+    if not docs:
+        return state
+
+    logger.info("🎯 [RERANK NODE] %d aday yeniden sıralanıyor (async)...", len(docs))
+    reranked = await asyncio.to_thread(rerank_docs, state["user_query"], docs)
+    log_reranked_docs(docs, reranked)
+    state["retrieved_docs"] = reranked
+
+    return state
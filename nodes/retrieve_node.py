@@ -3,55 +3,130 @@ Retrieve Node
 FAISS'ten eğitim bilgilerini çeker
 """
 
-from state_schema import ChatState
-from retriever import get_retrieved_documents, SUPPORTED_LEVELS
+from state_schema import ChatState, create_retrieved_doc
+from retriever import get_retrieved_documents, aget_retrieved_documents, SUPPORTED_LEVELS
+from reranker import RERANK_ENABLED, RERANK_CANDIDATES
+from instrumentation import get_trace_logger
+
+
+# --- CONFIGURATION ---
+RETRIEVE_K = 4  # Rerank kapalıyken LLM'e giden doküman sayısı
+# Rerank açıksa daha geniş aday kümesi çekilir; rerank node eleyip RERANK_TOP_K'ya indirir
+RETRIEVE_CANDIDATES = max(RERANK_CANDIDATES, RETRIEVE_K) if RERANK_ENABLED else RETRIEVE_K
+
+
+logger = get_trace_logger("retrieve_node")
+
+
+def fetch_education_context(query: str, active_levels: list, query_embedding: list = None) -> list:
+    """
+    FAISS'ten dokümanları çeker ve RetrievedDoc kayıtlarına çevirir.
+    
+    Retrieve node ve speculative retrieval (intent node) tarafından kullanılır.
+    
+    Args:
+        query_embedding: Önceden hesaplanmış sorgu embedding'i (intent node paylaşır)
+    
+    Returns:
+        Doküman kayıtları listesi (build_education_docs)
+    """
+    # Retrieve documents from FAISS
+    retrieved_docs = get_retrieved_documents(
+        query,
+        k=RETRIEVE_CANDIDATES,
+        levels=active_levels,
+        force_recreate=False,
+        silent=True,  # Production mode
+        query_embedding=query_embedding,
+    )
+    
+    return build_education_docs(retrieved_docs)
+
+
+async def afetch_education_context(query: str, active_levels: list, query_embedding: list = None) -> list:
+    """fetch_education_context'in async versiyonu."""
+    retrieved_docs = await aget_retrieved_documents(
+        query, k=RETRIEVE_CANDIDATES, levels=active_levels, silent=True, query_embedding=query_embedding
+    )
+    return build_education_docs(retrieved_docs)
+
+
+def build_education_docs(retrieved_docs: list) -> list:
+    """
+    (Document, score) listesini RetrievedDoc kayıtlarına çevirir.
+    
+    İçerik olarak embedding metni (title + question + hint + content) değil
+    chunk'ın orijinal içeriği kullanılır.
+    
+    Returns:
+        RetrievedDoc listesi (FAISS sırası korunur)
+    """
+    return [
+        create_retrieved_doc(
+            doc_id=doc.metadata.get('id') or "",
+            level=doc.metadata.get('level') or 'N/A',
+            title=doc.metadata.get('title') or 'Başlıksız',
+            content=doc.metadata.get('original_content') or doc.page_content,
+            score=float(score),
+        )
+        for doc, score in retrieved_docs
+    ]
+
+
+def log_retrieved_docs(docs: list):
+    """Bulunan doküman sayısını ve toplam token'ı loglar."""
+    if not docs:
+        logger.info("   ⚠️  Hiç doküman bulunamadı!")
+    else:
+        logger.info("   ✅ %d doküman bulundu (~%d token)", len(docs), sum(doc["tokens"] for doc in docs))
 
 
 def retrieve_node(state: ChatState) -> ChatState:
     """
     Retrieve node - FAISS'ten dokümanları çeker.
     
+    Speculative mode'da intent node retrieval'ı zaten başlatmışsa
+    (state["prefetched_docs"]) tekrar arama yapılmaz.
+    
     Args:
         state: Current conversation state
     
     Returns:
-        Updated state with retrieved context
+        Updated state with retrieved docs
     """
     query = state["user_query"]
     active_levels = state.get("active_levels", list(SUPPORTED_LEVELS))
     
-    print(f"\n📚 [RETRIEVE NODE] FAISS'ten doküman getiriliyor...")
-    print(f"   Query: '{query}'")
-    print(f"   Levels: {active_levels}")
+    logger.info("📚 [RETRIEVE NODE] FAISS'ten doküman getiriliyor...\n   Query: '%s'\n   Levels: %s", query, active_levels)
     
-    # Retrieve documents from FAISS
-    retrieved_docs = get_retrieved_documents(
-        query,
-        k=4,
-        levels=active_levels,
-        force_recreate=False,
-        silent=True  # Production mode
-    )
+    if state.get("prefetched_docs") is not None:
+        logger.info("   ⚡ Speculative retrieval sonucu kullanılıyor")
+        docs = state["prefetched_docs"]
+    else:
+        docs = fetch_education_context(query, active_levels)
+    
+    # Update state
+    log_retrieved_docs(docs)
+    state["retrieved_docs"] = docs
+    
+    return state
+
+
+async def aretrieve_node(state: ChatState) -> ChatState:
+    """retrieve_node'un async versiyonu."""
+    query = state["user_query"]
+    active_levels = state.get("active_levels", list(SUPPORTED_LEVELS))
+    
+    logger.info("📚 [RETRIEVE NODE] FAISS'ten doküman getiriliyor (async)...")
     
-    # Format documents for LLM
-    if not retrieved_docs:
-        context = "Bilgi bulunamadı. Bu konuda dokümanlarımızda bilgi yok."
-        print(f"   ⚠️  Hiç doküman bulunamadı!")
+    if state.get("prefetched_docs") is not None:
+        logger.info("   ⚡ Speculative retrieval sonucu kullanılıyor")
+        docs = state["prefetched_docs"]
     else:
-        context_parts = []
-        for doc, score in retrieved_docs:
-            level = doc.metadata.get('level', 'N/A').upper()
-            title = doc.metadata.get('title', 'Başlıksız')
-            content = doc.page_content
-            
-            context_parts.append(
-                f"**[{level}] {title}**\n{content}"
-            )
-        
-        context = "\n\n---\n\n".join(context_parts)
-        print(f"   ✅ {len(retrieved_docs)} doküman bulundu")
+        docs = await afetch_education_context(query, active_levels)
     
     # Update state
-    state["retrieved_context"] = context
+    log_retrieved_docs(docs)
+    state["retrieved_docs"] = docs
     
     return state
@@ -5,11 +5,15 @@ Intent'e göre hangi node'a gidileceğine karar verir
 
 from state_schema import ChatState
 from typing import Literal
+from instrumentation import get_trace_logger
 
 
 RouteDestination = Literal["retrieve", "search_news", "direct_answer", "price_info"]
 
 
+logger = get_trace_logger("router_node")
+
+
 def router_node(state: ChatState) -> RouteDestination:
     """
     Router node - intent'e göre routing kararı verir.
@@ -32,6 +36,6 @@ def router_node(state: ChatState) -> RouteDestination:
     else:  # greeting, unknown
         destination = "direct_answer"
     
-    print(f"\n🔀 [ROUTER NODE] Intent: {intent} → Routing to: {destination}")
+    logger.info("🔀 [ROUTER NODE] Intent: %s → Routing to: %s", intent, destination)
     
     return destination
@@ -0,0 +1,68 @@
+"""
+Context Format - Doküman Kayıtlarının Prompt Metni
+Retrieval kayıtlarını (RetrievedDoc) LLM'e giden context metnine çevirir.
+Render sadece answer node'da, prompt hazırlanırken bir kez yapılır.
+"""
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+NO_DOCUMENTS_CONTEXT = "Bilgi bulunamadı. Bu konuda dokümanlarımızda bilgi yok."
+
+
+def format_doc_header(doc: dict) -> str:
+    """Doküman başlık satırı: **[LEVEL] title**"""
+    return f"**[{doc['level'].upper()}] {doc['title']}**"
+
+
+def format_education_context(docs: list) -> str:
+    """
+    Eğitim doküman kayıtlarını context metnine çevirir.
+
+    Args:
+        docs: RetrievedDoc listesi (retrieve / compression node)
+
+    Returns:
+        Doküman blokları ("---" ile ayrılmış) veya bilgi yok mesajı
+    """
+    if not docs:
+        return NO_DOCUMENTS_CONTEXT
+
+    return CONTEXT_SEPARATOR.join(
+        f"{format_doc_header(doc)}\n{doc['content']}"
+        for doc in docs
+    )
+
+
+def format_news_context(docs: list) -> str:
+    """
+    Haber kayıtlarını Markdown formatında context metnine çevirir.
+    Görseller ve kaynak linkleri eklenir.
+
+    Args:
+        docs: RetrievedDoc listesi (news_search_node, metadata: date, url, image)
+
+    Returns:
+        Markdown formatında context
+    """
+    formatted = "**DUYURULAR VE ETKİNLİKLER:**\n\n"
+
+    for i, doc in enumerate(docs, 1):
+        metadata = doc.get("metadata") or {}
+        formatted += f"### {i}. {doc['title']}\n\n"
+
+        # Görsel varsa ekle
+        if metadata.get("image"):
+            formatted += f"![{doc['title']}]({metadata['image']})\n\n"
+
+        # İçerik
+        if doc["content"]:
+            formatted += f"{doc['content']}\n\n"
+
+        # Tarih ve kaynak
+        formatted += f"📅 **Tarih:** {metadata.get('date') or 'Tarih belirtilmemiş'}\n"
+
+        if metadata.get("url"):
+            formatted += f"🔗 **Kaynak:** [{metadata['url']}]({metadata['url']})\n"
+
+        formatted += "\n---\n\n"
+
+    return formatted
@@ -0,0 +1,184 @@
+"""
+Query Embedding Cache
+Aynı/benzer yazılmış sorguların embedding'ini tekrar hesaplamamak için LRU cache
+"""
+
+import os
+import re
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
+
+from instrumentation import count_event
+
+
+# --- CONFIGURATION ---
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")  # Opsiyonel disk cache (örn: "query_cache")
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def turkish_lower(text: str) -> str:
+    """
+    Türkçe kurallarına göre küçük harfe çevirir.
+
+    Python'un str.lower() fonksiyonu "I" → "i" ve "İ" → "i̇" (noktalı + birleşik
+    nokta) üretir; Türkçede doğrusu "I" → "ı" ve "İ" → "i"dir.
+    """
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Sorguyu cache anahtarı için normalize eder.
+
+    Örnek:
+    - "İngilizce kaç saat?" → "ingilizce kaç saat"
+    - "  Servis var mı ?? " → "servis var mı"
+    """
+    text = turkish_lower(query)
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Sorgu embedding'leri için thread-safe LRU cache.
+
+    - Anahtar: normalize_query(query) → yazım farkları aynı kayda düşer
+    - Hit durumunda embedding API'si HİÇ çağrılmaz
+    - store verilirse (örn: LocalFileStore) kayıtlar diskte de tutulur,
+      süreç yeniden başladığında sıcak cache ile açılır
+    - stats() ile hit/miss sayaçları okunabilir
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        maxsize: int = QUERY_CACHE_SIZE,
+        store: ByteStore = None,
+        namespace: str = "",
+    ):
+        self.embedding_model = embedding_model
+        self.maxsize = maxsize
+        self.store = store
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def _store_key(self, key: str) -> str:
+        return self.namespace + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, embedding: list):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> list:
+        """Sadece bellekteki LRU'da arar (I/O yok). Yoksa None döner."""
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return embedding
+
+    def _lookup_store(self, key: str) -> list:
+        """Disk store'da arar, bulursa belleğe alır. Yoksa (veya store yoksa) None döner."""
+        if self.store is None:
+            return None
+        stored = self.store.mget([self._store_key(key)])[0]
+        if stored is None:
+            return None
+        embedding = json.loads(stored)
+        self._remember(key, embedding)
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+        return embedding
+
+    def _lookup(self, key: str) -> list:
+        """Bellek ve (varsa) disk cache'inde arar. Yoksa None döner."""
+        embedding = self._lookup_memory(key)
+        if embedding is None:
+            embedding = self._lookup_store(key)
+        return embedding
+
+    def _remember_miss(self, key: str, embedding: list):
+        """Cache miss sonrası hesaplanan embedding'i belleğe alır."""
+        self._remember(key, embedding)
+        with self._lock:
+            self.misses += 1
+
+    def _write_store(self, key: str, embedding: list):
+        if self.store is not None:
+            self.store.mset([(self._store_key(key), json.dumps(embedding).encode("utf-8"))])
+
+    def embed_query(self, query: str) -> list:
+        """Sorgu embedding'ini cache'ten döndürür, yoksa hesaplayıp saklar."""
+        key = normalize_query(query)
+        embedding = self._lookup(key)
+        if embedding is not None:
+            count_event("query_cache_hits")
+            return embedding
+
+        # Cache miss - embedding API çağrısı
+        count_event("embedding_calls")
+        embedding = self.embedding_model.embed_query(query)
+        self._remember_miss(key, embedding)
+        self._write_store(key, embedding)
+        return embedding
+
+    async def aembed_query(self, query: str) -> list:
+        """
+        embed_query'nin async versiyonu (miss durumunda aembed_query kullanır).
+
+        Event loop'ta sadece bellekteki LRU'ya bakılır; disk store okuma /
+        yazması thread'de yapılır (diğer sohbetleri bloklamasın diye).
+        """
+        key = normalize_query(query)
+        embedding = self._lookup_memory(key)
+        if embedding is None and self.store is not None:
+            embedding = await asyncio.to_thread(self._lookup_store, key)
+        if embedding is not None:
+            count_event("query_cache_hits")
+            return embedding
+
+        count_event("embedding_calls")
+        embedding = await self.embedding_model.aembed_query(query)
+        self._remember_miss(key, embedding)
+        if self.store is not None:
+            await asyncio.to_thread(self._write_store, key, embedding)
+        return embedding
+
+    def stats(self) -> dict:
+        """Cache sayaçlarını döndürür."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """Bellekteki kayıtları ve sayaçları sıfırlar (disk store'a dokunmaz)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.disk_hits = 0
@@ -0,0 +1,95 @@
+"""
+Reranker
+Retrieval adaylarını yerel cross-encoder ile yeniden puanlar (CPU, tek batch)
+"""
+
+import os
+import threading
+
+from instrumentation import count_event
+
+
+# --- CONFIGURATION ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"  # "1" → retrieve ile compression arasına rerank node'u eklenir
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")  # Çok dilli (Türkçe dahil)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))  # Retrieval'dan istenen aday sayısı
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "4"))  # Answer node'a giden en fazla doküman
+RERANK_THRESHOLD = float(os.getenv("RERANK_THRESHOLD", "0.3"))  # Sigmoid skoru bunun altındakiler atılır (0-1)
+RERANK_MIN_DOCS = 1  # Hepsi eşiğin altında kalsa da en iyi aday korunur
+RERANK_MAX_LENGTH = 512  # Cross-encoder girdi token sınırı (sorgu + doküman)
+
+
+class Reranker:
+    """
+    Cross-encoder reranker (sentence-transformers).
+
+    Model ilk kullanımda yüklenir ve süreç boyunca paylaşılır. Tüm
+    (sorgu, doküman) çiftleri tek bir batch'te, tek forward pass ile puanlanır.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """CrossEncoder modelini ilk ihtiyaçta yükler (CPU)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, max_length=RERANK_MAX_LENGTH, device="cpu")
+        return self._model
+
+    def score(self, query: str, docs: list) -> list:
+        """
+        Dokümanların sorguyla alaka skorları (0-1, doküman sırasıyla).
+
+        Args:
+            query: Kullanıcı sorgusu
+            docs: RetrievedDoc listesi (başlık + içerik puanlanır)
+        """
+        pairs = [(query, f"{doc['title']}\n{doc['content']}") for doc in docs]
+        scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        return [float(score) for score in scores]
+
+    def rerank(self, query: str, docs: list, top_k: int = RERANK_TOP_K, threshold: float = RERANK_THRESHOLD) -> list:
+        """
+        Dokümanları cross-encoder skoruna göre sıralar ve eşiğe göre keser.
+
+        Args:
+            query: Kullanıcı sorgusu
+            docs: RetrievedDoc listesi (retrieval sırası)
+            top_k: Döndürülecek en fazla doküman
+            threshold: Minimum alaka skoru (en az RERANK_MIN_DOCS doküman korunur)
+
+        Returns:
+            RetrievedDoc listesi (score = rerank skoru, yüksek = daha alakalı)
+        """
+        if not docs:
+            return []
+
+        ranked = sorted(
+            ({**doc, "score": score} for doc, score in zip(docs, self.score(query, docs))),
+            key=lambda doc: doc["score"],
+            reverse=True,
+        )
+        kept = [doc for doc in ranked[:top_k] if doc["score"] >= threshold] or ranked[:RERANK_MIN_DOCS]
+        count_event("rerank_dropped_docs", len(docs) - len(kept))
+        return kept
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Süreç genelinde paylaşılan Reranker örneğini döndürür."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker()
+    return _reranker
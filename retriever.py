@@ -1,26 +1,77 @@
 import os
+import re
 import json
+import shutil
+import hashlib
+import asyncio
 import argparse
+import threading
 
 # OMP: Error #15: Initializing libomp.dylib... hatası için macOS geçici çözümü
 # Bu ayar, OpenMP kullanan herhangi bir kütüphane (örn. faiss) import edilmeden önce yapılmalıdır.
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+import numpy as np
+import faiss
 from dotenv import load_dotenv
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
+
+from query_cache import QueryEmbeddingCache, QUERY_CACHE_PATH
+from lexical_index import LexicalIndex
+from vector_index import create_vector_index, configure_search, describe_index, get_index_config, is_incremental
+from doc_store import ArrowDocstore, write_docstore, DOCSTORE_FILE
+from instrumentation import get_trace_logger, enable_console_trace
+
+logger = get_trace_logger("retriever")
+
 
 # --- CONFIGURATION ---
-INDEX_PATH = "faiss_index"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")  # "google" (Gemini API) veya "local" (sentence-transformers, CPU)
+DEFAULT_EMBEDDING_MODELS = {
+    "google": "gemini-embedding-001",
+    "local": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",  # Çok dilli, 384 boyut
+}
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or DEFAULT_EMBEDDING_MODELS.get(EMBEDDING_BACKEND, "")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # Yerel model: encode batch boyutu
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # Yerel model: CPU thread sayısı (0 = torch varsayılanı)
+
+INDEX_ROOT = "faiss_index"
+# Her embedding modelinin ayrı indeksi olur, farklı modellerin vektörleri asla karışmaz
+# (varsayılan Gemini modeli mevcut faiss_index/ klasörünü kullanmaya devam eder)
+INDEX_PATH = (
+    INDEX_ROOT if EMBEDDING_MODEL == DEFAULT_EMBEDDING_MODELS["google"]
+    else f"{INDEX_ROOT}-{re.sub(r'[^a-z0-9]+', '-', EMBEDDING_MODEL.lower()).strip('-')}"
+)
 CHUNKS_DIR = "chunks"
-EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_CACHE_PATH = "embedding_cache"  # İndeks silinse de korunur (faiss_index dışında), model adıyla namespace'li
+MANIFEST_PATH = os.path.join(INDEX_PATH, "manifest.json")  # Incremental sync için chunk durumu
+LEXICAL_INDEX_FILE = "lexical.json"  # Her shard klasöründe FAISS dosyalarının yanında
+VECTOR_INDEX_FILE = "index.faiss"  # Shard'ın vektör indeksi (memory-mapped okunur)
+PICKLE_DOCSTORE_FILE = "index.pkl"  # Eski format (FAISS.save_local); sadece Arrow'a geçişte okunur
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"  # "0" → sadece FAISS
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Füzyona giren aday sayısı (yöntem başına)
+RRF_K = 60  # Reciprocal rank fusion sabiti: 1 / (RRF_K + sıra)
 
 # Desteklenen okul seviyeleri
 SUPPORTED_LEVELS = ["anaokulu", "ilkokul", "ortaokul", "lise"]
 
-def initialize_embeddings() -> GoogleGenerativeAIEmbeddings:
-    """API anahtarını yükler ve embedding modelini başlatır."""
+def initialize_embeddings() -> Embeddings:
+    """
+    EMBEDDING_BACKEND'e göre embedding modelini başlatır.
+    
+    - google: Gemini API (GOOGLE_API_KEY gerekir)
+    - local: sentence-transformers modeli, CPU'da (ağ ve API anahtarı gerekmez)
+    """
+    if EMBEDDING_BACKEND == "local":
+        return initialize_local_embeddings()
+    if EMBEDDING_BACKEND != "google":
+        raise ValueError(f"Bilinmeyen EMBEDDING_BACKEND: '{EMBEDDING_BACKEND}' (google veya local olmalı)")
+    
     load_dotenv()
     google_api_key = os.getenv("GOOGLE_API_KEY")
     if not google_api_key:
@@ -31,6 +82,42 @@ def initialize_embeddings() -> GoogleGenerativeAIEmbeddings:
         google_api_key=google_api_key
     )
 
+def initialize_local_embeddings() -> Embeddings:
+    """
+    Yerel sentence-transformers embedding modelini başlatır.
+    
+    Dokümanlar EMBEDDING_BATCH_SIZE'lık batch'lerle, torch'un CPU thread
+    havuzunda encode edilir. Vektörler normalize edilir (L2 sıralaması =
+    cosine sıralaması).
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+    
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE, "normalize_embeddings": True},
+    )
+
+def get_cached_embedder(embedding_model: Embeddings) -> CacheBackedEmbeddings:
+    """
+    Doküman embedding'lerini diskte cache'leyen embedder döndürür.
+    
+    Anahtar: EMBEDDING_MODEL + sha256(embedding metni). Böylece rebuild'lerde
+    sadece yeni veya değişmiş chunk'lar için embedding API'si çağrılır; model
+    değişirse eski vektörler asla karışmaz.
+    """
+    store = LocalFileStore(EMBEDDING_CACHE_PATH)
+    return CacheBackedEmbeddings.from_bytes_store(
+        embedding_model,
+        store,
+        namespace=EMBEDDING_MODEL,
+        key_encoder="sha256",
+    )
+
 def create_embedding_text(item: dict) -> str:
     """
     Chunk'tan embedding için zenginleştirilmiş metin oluşturur.
@@ -72,24 +159,15 @@ def load_chunks_from_files(levels: list = None) -> list:
             with open(json_path, "r", encoding="utf-8") as f:
                 chunks = json.load(f)
                 all_chunks.extend(chunks)
-                print(f"✓ {level}.json: {len(chunks)} chunk yüklendi")
+                logger.info("✓ %s.json: %d chunk yüklendi", level, len(chunks))
         else:
-            print(f"⚠ {json_path} bulunamadı, atlanıyor...")
+            logger.warning("⚠ %s bulunamadı, atlanıyor...", json_path)
     
     return all_chunks
 
-def create_and_save_index(embedding_model: GoogleGenerativeAIEmbeddings, levels: list = None):
-    """JSON'dan dokümanları okur, FAISS indeksini oluşturur ve diske kaydeder."""
-    print(f"'{INDEX_PATH}' bulunamadı. Indeks sıfırdan oluşturuluyor...\n")
-    
-    # Tüm chunk'ları yükle
-    raw_data = load_chunks_from_files(levels)
-    
-    if not raw_data:
-        raise ValueError("Hiç chunk yüklenemedi! chunks/ klasörünü kontrol edin.")
-
-    # Document nesneleri oluştur - zenginleştirilmiş embedding metni ile
-    docs = [
+def create_documents(raw_data: list) -> list:
+    """Chunk'lardan Document nesneleri oluşturur - zenginleştirilmiş embedding metni ile."""
+    return [
         Document(
             page_content=create_embedding_text(item),
             metadata={
@@ -108,42 +186,747 @@ def create_and_save_index(embedding_model: GoogleGenerativeAIEmbeddings, levels:
         )
         for item in raw_data
     ]
+
+def assign_chunk_keys(raw_data: list) -> list:
+    """
+    Her chunk için benzersiz indeks anahtarı üretir (FAISS docstore id'si).
+    
+    Anahtar chunk'ın `id` alanıdır; aynı dosyada tekrar eden id'ler için
+    `id~1`, `id~2` ... eklenir (sıra dosyadaki sıradır).
+    """
+    seen = {}
+    keys = []
+    for item in raw_data:
+        chunk_id = item.get("id")
+        count = seen.get(chunk_id, 0)
+        seen[chunk_id] = count + 1
+        keys.append(chunk_id if count == 0 else f"{chunk_id}~{count}")
+    
+    duplicates = [chunk_id for chunk_id, count in seen.items() if count > 1]
+    if duplicates:
+        logger.info("⚠ Tekrar eden chunk id'leri (~n ekiyle ayrıldı): %s", ", ".join(duplicates))
+    return keys
+
+def compute_chunk_hash(item: dict) -> str:
+    """Chunk'ın tüm alanlarının içerik hash'i (version artırılmamış düzeltmeleri de yakalar)."""
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_manifest_entries(raw_data: list) -> dict:
+    """Chunk listesinden manifest kayıtları oluşturur: {chunk_key: {level, version, hash}}."""
+    return {
+        key: {
+            "level": item.get("level"),
+            "version": item.get("version"),
+            "hash": compute_chunk_hash(item),
+        }
+        for key, item in zip(assign_chunk_keys(raw_data), raw_data)
+    }
+
+def load_manifest() -> dict:
+    """İndeks manifest'ini okur. Yoksa None döner."""
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["chunks"]
+
+def load_manifest_index_config() -> dict:
+    """
+    Diskteki indeksin kurulum parametreleri (vector_index.get_index_config).
+    
+    Manifest'te kayıt yoksa indeks eski sürümle kurulmuş düz (flat) indekstir.
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("index") or get_index_config("flat", 0)
+
+def save_manifest(entries: dict):
+    """Manifest'i atomik olarak yazar (yarım kalmış yazım okunmaz)."""
+    os.makedirs(INDEX_PATH, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"embedding_model": EMBEDDING_MODEL, "index": get_index_config(), "chunks": entries},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def get_shard_path(level: str) -> str:
+    """Bir seviyenin FAISS shard klasörünü döndürür (faiss_index/<level>)."""
+    return os.path.join(INDEX_PATH, level)
+
+def build_shard(text_embeddings: list, embedding_model: Embeddings, metadatas: list, ids: list) -> FAISS:
+    """
+    Hazır embedding'lerden shard oluşturur (INDEX_TYPE'a göre flat, HNSW, IVF-SQ8 / IVF-PQ).
+    
+    Docstore ve id eşlemesi FAISS.from_embeddings ile kurulur; flat dışındaki
+    tiplerde vektör indeksi aynı sırayla eklenmiş eğitilmiş indeksle değiştirilir.
+    """
+    shard = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=ids)
+    if not is_incremental():
+        shard.index = create_vector_index(np.asarray([embedding for _, embedding in text_embeddings], dtype=np.float32))
+    return shard
+
+def embed_and_build_shard(raw_data: list, embedding_model: Embeddings, cached_embedder: CacheBackedEmbeddings, ids: list) -> FAISS:
+    """Chunk'ları (embedding cache ile) embed edip build_shard ile shard oluşturur."""
+    docs = create_documents(raw_data)
+    texts = [doc.page_content for doc in docs]
+    text_embeddings = list(zip(texts, cached_embedder.embed_documents(texts)))
+    return build_shard(text_embeddings, embedding_model, [doc.metadata for doc in docs], ids)
+
+def save_shard(level: str, shard: FAISS):
+    """
+    Shard'ı kaydeder: vektör indeksi, Arrow doküman deposu ve lexical indeks.
+    
+    Dosyalar geçici dosyaya yazılıp yerine konur; eski dosyaları mmap'lemiş
+    canlı shard'lar aramaya devam edebilir.
+    """
+    shard_path = get_shard_path(level)
+    os.makedirs(shard_path, exist_ok=True)
+    
+    ids = [shard.index_to_docstore_id[position] for position in range(shard.index.ntotal)]
+    write_docstore(
+        os.path.join(shard_path, DOCSTORE_FILE),
+        ids,
+        [shard.docstore.search(doc_id) for doc_id in ids],
+        create_embedding_text,
+    )
+    
+    index_path = os.path.join(shard_path, VECTOR_INDEX_FILE)
+    faiss.write_index(shard.index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    
+    pickle_path = os.path.join(shard_path, PICKLE_DOCSTORE_FILE)
+    if os.path.exists(pickle_path):
+        os.remove(pickle_path)
+    save_lexical_index(level, shard)
+
+def load_shard(level: str, embedding_model: Embeddings, writable: bool = False) -> FAISS:
+    """
+    Shard'ı diskten yükler ve arama parametrelerini (nprobe / efSearch) uygular.
+    
+    Vektör indeksi ve doküman deposu memory-mapped açılır: yükleme hiçbir
+    satırı Python nesnesine çevirmez, id'ler ve dokümanlar arama sonuçları için okunur. Eski formattaki
+    (index.pkl) shard bir kez pickle'dan okunup Arrow'a çevrilir.
+    
+    Args:
+        level: Okul seviyesi
+        embedding_model: Sorgu embedding modeli
+        writable: True ise indeks ve dokümanlar belleğe kopyalanır
+            (sync'te shard.delete / add_embeddings için)
+    """
+    shard_path = get_shard_path(level)
+    if not os.path.exists(os.path.join(shard_path, DOCSTORE_FILE)):
+        save_shard(level, FAISS.load_local(shard_path, embedding_model, allow_dangerous_deserialization=True))
     
-    print(f"\n{len(docs)} doküman için embedding oluşturuluyor ve indeksleniyor. Bu işlem zaman alabilir...")
-    vectorstore = FAISS.from_documents(docs, embedding_model)
-    vectorstore.save_local(INDEX_PATH)
-    print(f"✓ Indeks başarıyla '{INDEX_PATH}' klasörüne kaydedildi.")
-    return vectorstore
+    flags = 0 if writable else faiss.IO_FLAG_MMAP_IFC
+    index = faiss.read_index(os.path.join(shard_path, VECTOR_INDEX_FILE), flags)
+    docstore = ArrowDocstore(os.path.join(shard_path, DOCSTORE_FILE), create_embedding_text)
+    index_to_docstore_id = docstore.index_to_docstore_id  # Id'ler Arrow sütununda, ihtiyaçta okunur
+    if writable:
+        index_to_docstore_id = dict(enumerate(index_to_docstore_id.values()))
+        docstore = docstore.to_memory()
+    
+    shard = FAISS(embedding_model, index, docstore, index_to_docstore_id)
+    configure_search(shard.index)
+    return shard
+
+def create_lexical_text(metadata: dict) -> str:
+    """
+    Lexical indeks metni: title + question + embedding_hint + tags + content.
+    
+    Embedding metninden farkı etiketlerin de aranabilir olmasıdır
+    (program adları çoğu zaman sadece etiketlerde geçer).
+    """
+    tags = metadata.get("tags")
+    if isinstance(tags, list):
+        tags = " ".join(str(tag) for tag in tags)
+    
+    fields = (
+        metadata.get("title"),
+        metadata.get("question"),
+        metadata.get("embedding_hint"),
+        tags,
+        metadata.get("original_content"),
+    )
+    return " ".join(field for field in fields if field)
+
+def build_lexical_index(shard: FAISS) -> LexicalIndex:
+    """Shard'ın dokümanlarından lexical (BM25) indeksi oluşturur."""
+    ids = list(shard.index_to_docstore_id.values())
+    texts = [create_lexical_text(shard.docstore.search(doc_id).metadata) for doc_id in ids]
+    return LexicalIndex.build(ids, texts)
+
+def save_lexical_index(level: str, shard: FAISS) -> LexicalIndex:
+    """
+    Shard'ın dokümanlarından lexical (BM25) indeksi oluşturur ve shard
+    klasörüne kaydeder. Shard her kaydedildiğinde çağrılır.
+    """
+    lexical = build_lexical_index(shard)
+    lexical.save(os.path.join(get_shard_path(level), LEXICAL_INDEX_FILE))
+    return lexical
+
+def load_lexical_index(level: str, shard: FAISS) -> LexicalIndex:
+    """
+    Shard'ın kayıtlı lexical indeksini yükler.
+    
+    Dosya yoksa (eski indeks) veya shard'ın dokümanlarıyla uyuşmuyorsa
+    yeniden oluşturulup kaydedilir.
+    """
+    lexical = LexicalIndex.load(os.path.join(get_shard_path(level), LEXICAL_INDEX_FILE))
+    if lexical is None or set(lexical.ids) != set(shard.index_to_docstore_id.values()):
+        if not os.path.exists(os.path.join(get_shard_path(level), VECTOR_INDEX_FILE)):
+            return build_lexical_index(shard)  # Bellekte bölünmüş tek parça indeks: diske yazılmaz
+        lexical = save_lexical_index(level, shard)
+    return lexical
+
+def create_and_save_index(embedding_model: Embeddings, levels: list = None) -> dict:
+    """
+    JSON'dan dokümanları okur, her seviye için ayrı bir FAISS shard'ı oluşturur
+    ve diske kaydeder (faiss_index/<level>/).
+    
+    Returns:
+        {level: FAISS} shard sözlüğü
+    """
+    logger.info("'%s' bulunamadı. Indeks sıfırdan oluşturuluyor...\n", INDEX_PATH)
+    
+    if levels is None:
+        levels = SUPPORTED_LEVELS
+    
+    # Değişmemiş chunk'lar cache'ten gelir, sadece yeniler embed edilir
+    cached_embedder = get_cached_embedder(embedding_model)
+    
+    shards = {}
+    manifest = {}
+    for level in levels:
+        # Her seviyenin chunk'larını ayrı yükle
+        raw_data = load_chunks_from_files([level])
+        if not raw_data:
+            continue
+        
+        manifest.update(build_manifest_entries(raw_data))
+        logger.info("\n[%s] %d doküman için embedding oluşturuluyor ve indeksleniyor. Bu işlem zaman alabilir...", level, len(raw_data))
+        # Sorgular cache'siz, doğrudan model ile (shard.embedding_function = embedding_model)
+        shard = embed_and_build_shard(raw_data, embedding_model, cached_embedder, assign_chunk_keys(raw_data))
+        logger.info("   %s", describe_index(shard.index))
+        save_shard(level, shard)
+        shards[level] = load_shard(level, embedding_model)  # Bellekteki kopya yerine memory-mapped
+    
+    if not shards:
+        raise ValueError("Hiç chunk yüklenemedi! chunks/ klasörünü kontrol edin.")
+    
+    save_manifest(manifest)
+    logger.info("✓ Indeks başarıyla '%s' klasörüne kaydedildi (%d shard).", INDEX_PATH, len(shards))
+    return shards
+
+def has_legacy_index() -> bool:
+    """Eski tek parça indeks (faiss_index/index.faiss + index.pkl) duruyor mu?"""
+    return os.path.exists(os.path.join(INDEX_PATH, VECTOR_INDEX_FILE))
+
+def has_sharded_index() -> bool:
+    """En az bir seviye shard'ı kaydedilmiş mi?"""
+    return any(os.path.exists(os.path.join(get_shard_path(level), VECTOR_INDEX_FILE)) for level in SUPPORTED_LEVELS)
+
+def remove_index_shards():
+    """
+    Shard klasörlerini ve manifest'i siler.
+    
+    Eski tek parça indeks dosyalarına dokunulmaz (repo'da izlenen dosyalar).
+    """
+    for level in SUPPORTED_LEVELS:
+        shutil.rmtree(get_shard_path(level), ignore_errors=True)
+    if os.path.exists(MANIFEST_PATH):
+        os.remove(MANIFEST_PATH)
 
-def load_vector_store(embedding_model: GoogleGenerativeAIEmbeddings, levels: list = None, force_recreate: bool = False, silent: bool = False) -> FAISS:
+def split_legacy_index(embedding_model: Embeddings) -> dict:
     """
-    Mevcut FAISS indeksini diskten yükler veya yoksa yenisini oluşturur.
+    Eski tek parça indeksi bellekte seviye shard'larına böler (diske yazmaz).
+    
+    Vektörler mevcut indeksten okunur, yani yeniden embedding GEREKMEZ.
+    
+    Returns:
+        {level: FAISS} shard sözlüğü (InMemoryDocstore ile)
+    """
+    legacy = FAISS.load_local(INDEX_PATH, embedding_model, allow_dangerous_deserialization=True)
+    vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)
+    
+    grouped = {}
+    for position, docstore_id in legacy.index_to_docstore_id.items():
+        doc = legacy.docstore.search(docstore_id)
+        level = doc.metadata.get("level")
+        grouped.setdefault(level, []).append((doc, vectors[position]))
+    
+    shards = {}
+    for level, items in grouped.items():
+        if level not in SUPPORTED_LEVELS:
+            continue
+        metadatas = [doc.metadata for doc, _ in items]
+        shard = build_shard(
+            [(doc.page_content, vector.tolist()) for doc, vector in items],
+            embedding_model,
+            metadatas,
+            assign_chunk_keys(metadatas),
+        )
+        configure_search(shard.index)
+        shards[level] = shard
+    return shards
+
+def migrate_legacy_index(embedding_model: Embeddings, silent: bool = False) -> dict:
+    """
+    Eski tek parça indeksi seviye shard'larına böler ve kaydeder
+    (açık migration adımı: python retriever.py --migrate).
+    
+    Eski dosyalar SİLİNMEZ; shard'lar kaydedildikten sonra yükleme shard'lardan
+    yapılır, eski checkout'lar tek parça indeksi kullanmaya devam edebilir.
+    
+    Returns:
+        {level: FAISS} kaydedilmiş shard sözlüğü
+    """
+    if not has_legacy_index():
+        raise FileNotFoundError(f"'{INDEX_PATH}' içinde tek parça indeks bulunamadı.")
+    if not silent:
+        logger.info("⚠ Tek parça indeks bulundu, seviye shard'larına bölünüyor...")
+    
+    shards = {}
+    manifest = {}
+    for level, shard in split_legacy_index(embedding_model).items():
+        save_shard(level, shard)
+        shards[level] = load_shard(level, embedding_model)
+        
+        # Eski indekste içerik hash'i yok - sync sadece version'a bakar
+        for key in shard.index_to_docstore_id.values():
+            metadata = shard.docstore.search(key).metadata
+            manifest[key] = {"level": level, "version": metadata.get("version"), "hash": None}
+    
+    save_manifest(manifest)
+    if not silent:
+        logger.info("✓ %d shard '%s' klasörüne kaydedildi (eski dosyalar korundu)", len(shards), INDEX_PATH)
+    return shards
+
+def load_index_shards(embedding_model: Embeddings, levels: list = None, force_recreate: bool = False, silent: bool = False) -> dict:
+    """
+    Seviye bazlı FAISS shard'larını diskten yükler veya yoksa yenilerini oluşturur.
+    
+    Sadece eski tek parça indeks varsa diske hiçbir şey yazılmaz: indeks salt
+    okunur yüklenip bellekte bölünür (kalıcı geçiş için --migrate).
     
     Args:
         embedding_model: Kullanılacak embedding modeli
         levels: Yüklenecek okul seviyeleri (None ise tümü)
-        force_recreate: True ise mevcut indeks silinip yeniden oluşturulur
+        force_recreate: True ise mevcut shard'lar silinip yeniden oluşturulur
         silent: True ise terminal çıktıları bastırılır
     
     Returns:
-        FAISS vector store
+        {level: FAISS} shard sözlüğü
     """
-    if force_recreate and os.path.exists(INDEX_PATH):
-        if not silent:
-            print(f"⚠ Mevcut indeks siliniyor...")
-        import shutil
-        shutil.rmtree(INDEX_PATH)
+    if levels is None:
+        levels = SUPPORTED_LEVELS
     
-    if os.path.exists(INDEX_PATH):
+    if force_recreate:
         if not silent:
-            print(f"✓ Mevcut indeks '{INDEX_PATH}' klasöründen yükleniyor...")
-        return FAISS.load_local(INDEX_PATH, embedding_model, allow_dangerous_deserialization=True)
-    else:
+            logger.info("⚠ Mevcut indeks siliniyor...")
+        remove_index_shards()
         return create_and_save_index(embedding_model, levels)
+    
+    if has_legacy_index() and not has_sharded_index():
+        if not silent:
+            logger.warning("⚠ Tek parça indeks salt okunur yükleniyor (kalıcı geçiş: python retriever.py --migrate)")
+        shards = split_legacy_index(embedding_model)
+        return {level: shard for level, shard in shards.items() if level in levels}
+    
+    index_config = load_manifest_index_config()
+    if index_config is not None and index_config != get_index_config():
+        # INDEX_TYPE / PCA / kurulum parametreleri değişti: vektörler embedding cache'ten gelir
+        if not silent:
+            logger.warning("⚠ İndeks ayarları değişti (%s → %s), yeniden kuruluyor...", index_config, get_index_config())
+        remove_index_shards()
+        shards = create_and_save_index(embedding_model)
+        return {level: shard for level, shard in shards.items() if level in levels}
+    
+    shards = {}
+    for level in levels:
+        if os.path.exists(os.path.join(get_shard_path(level), VECTOR_INDEX_FILE)):
+            shards[level] = load_shard(level, embedding_model)
+    
+    if shards:
+        if not silent:
+            logger.info("✓ Mevcut indeks '%s' klasöründen yükleniyor (%s)...", INDEX_PATH, ", ".join(shards))
+        return shards
+    
+    return create_and_save_index(embedding_model, levels)
+
+def is_chunk_changed(entry: dict, item: dict) -> bool:
+    """Manifest kaydı ile güncel chunk farklı mı? (version veya içerik hash'i)"""
+    if entry.get("version") != item.get("version"):
+        return True
+    return entry.get("hash") is not None and entry["hash"] != compute_chunk_hash(item)
+
+def sync_index(embedding_model: Embeddings, silent: bool = False) -> tuple:
+    """
+    Incremental sync: chunk dosyalarını manifest ile karşılaştırır ve SADECE
+    değişen vektörleri ilgili shard'larda ekler / değiştirir / siler.
+    
+    Strategy:
+    1. Manifest yoksa veya indeks ayarları değiştiyse tam build yapılır
+       (eski tek parça indeks varsa hata: önce --migrate)
+    2. Her seviye için: silinen + değişen anahtarlar shard'dan çıkarılır
+    3. Yeni + değişen chunk'lar (embedding cache ile) shard'a eklenir
+       (flat dışı indekslerde dokunulan shard embedding cache'ten baştan kurulur)
+    4. Sadece dokunulan shard'lar kaydedilir, manifest güncellenir
+    
+    Returns:
+        (stats, updated_shards): {"added", "updated", "deleted"} sayıları ve
+        değişen shard'lar ({level: FAISS}; shard boşaldıysa değer None)
+    """
+    manifest = load_manifest()
+    if manifest is not None and load_manifest_index_config() != get_index_config():
+        remove_index_shards()
+        manifest = None
+    if manifest is None:
+        if has_legacy_index():
+            raise RuntimeError(
+                f"'{INDEX_PATH}' içinde tek parça indeks var; sync'ten önce "
+                "'python retriever.py --migrate' ile shard'lara geçirin."
+            )
+        else:
+            shards = create_and_save_index(embedding_model)
+            stats = {"added": sum(shard.index.ntotal for shard in shards.values()), "updated": 0, "deleted": 0}
+            return stats, shards
+    
+    cached_embedder = get_cached_embedder(embedding_model)
+    stats = {"added": 0, "updated": 0, "deleted": 0}
+    updated_shards = {}
+    new_manifest = {}
+    
+    for level in SUPPORTED_LEVELS:
+        raw_data = load_chunks_from_files([level])
+        current = dict(zip(assign_chunk_keys(raw_data), raw_data))
+        new_manifest.update(build_manifest_entries(raw_data))
+        
+        old_keys = [key for key, entry in manifest.items() if entry["level"] == level]
+        to_delete = [
+            key for key in old_keys
+            if key not in current or is_chunk_changed(manifest[key], current[key])
+        ]
+        to_add = [
+            key for key, item in current.items()
+            if key not in manifest
+            or manifest[key]["level"] != level
+            or is_chunk_changed(manifest[key], item)
+        ]
+        
+        if not to_delete and not to_add:
+            continue
+        
+        # Canlı shard'a dokunulmaz: diskten ayrı bir kopya güncellenir
+        shard_path = get_shard_path(level)
+        shard = None
+        if not is_incremental():
+            # HNSW vektör silmeyi desteklemez, IVF/PCA eğitimi eskir: shard baştan kurulur
+            # (değişmeyen chunk'ların embedding'leri cache'ten gelir)
+            if current:
+                shard = embed_and_build_shard(list(current.values()), embedding_model, cached_embedder, list(current))
+        else:
+            if os.path.exists(shard_path):
+                shard = load_shard(level, embedding_model, writable=True)
+            
+            if shard is not None and to_delete:
+                shard.delete(to_delete)
+            
+            if to_add:
+                docs = create_documents([current[key] for key in to_add])
+                texts = [doc.page_content for doc in docs]
+                text_embeddings = list(zip(texts, cached_embedder.embed_documents(texts)))
+                metadatas = [doc.metadata for doc in docs]
+                if shard is None:
+                    shard = build_shard(text_embeddings, embedding_model, metadatas, to_add)
+                else:
+                    shard.add_embeddings(text_embeddings, metadatas=metadatas, ids=to_add)
+        
+        if shard is None or shard.index.ntotal == 0:
+            if os.path.exists(shard_path):
+                shutil.rmtree(shard_path)
+            updated_shards[level] = None
+        else:
+            save_shard(level, shard)
+            updated_shards[level] = load_shard(level, embedding_model)
+        
+        if not silent:
+            logger.info("✓ [%s] %d vektör eklendi/güncellendi, %d vektör çıkarıldı", level, len(to_add), len(to_delete))
+    
+    stats["added"] = len([key for key in new_manifest if key not in manifest])
+    stats["deleted"] = len([key for key in manifest if key not in new_manifest])
+    stats["updated"] = len([
+        key for key, entry in new_manifest.items()
+        if key in manifest and (
+            manifest[key]["level"] != entry["level"]
+            or manifest[key]["version"] != entry["version"]
+            or (manifest[key].get("hash") is not None and manifest[key]["hash"] != entry["hash"])
+        )
+    ])
+    
+    save_manifest(new_manifest)
+    return stats, updated_shards
 
-def get_retrieved_documents(query: str, k: int = 3, levels: list = None, force_recreate: bool = False, silent: bool = False) -> list:
+def merge_shard_results(shard_results: list, k: int) -> list:
+    """
+    Shard sonuçlarını skora göre birleştirir ve tam olarak en iyi k sonucu döndürür.
+    
+    FAISS varsayılan olarak L2 mesafesi döndürür: düşük skor = daha iyi eşleşme.
     """
-    Verilen bir sorgu için FAISS veritabanından ilgili dokümanları ve skorlarını getirir.
+    merged = [pair for results in shard_results for pair in results]
+    merged.sort(key=lambda pair: pair[1])
+    return merged[:k]
+
+def get_result_key(doc: Document) -> str:
+    """Füzyon için doküman anahtarı (FAISS docstore id'si, yoksa seviye + chunk id)."""
+    return doc.id or f"{doc.metadata.get('level')}/{doc.metadata.get('id')}"
+
+def reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    """
+    Farklı arama yöntemlerinin sıralamalarını reciprocal rank fusion ile birleştirir.
+    
+    Skor = Σ 1 / (RRF_K + sıra). Ölçekleri farklı skorlar (L2 mesafesi, BM25)
+    karşılaştırılmaz, sadece sıralar kullanılır.
+    
+    Args:
+        rankings: Her yöntem için en iyiden kötüye (Document, skor) listesi
+        k: Döndürülecek doküman sayısı
+    
+    Returns:
+        (Document, RRF skoru) listesi (yüksek skor = daha iyi eşleşme)
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, 1):
+            key = get_result_key(doc)
+            entry = fused.setdefault(key, [doc, 0.0])
+            entry[1] += 1 / (RRF_K + rank)
+    
+    results = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)
+    return [(doc, score) for doc, score in results[:k]]
+
+
+class RetrieverService:
+    """
+    Süreç boyunca yaşayan (resident) retriever.
+    
+    Embedding modeli ve FAISS indeksi süreç başına BİR KEZ yüklenir ve tüm
+    ChatSession'lar / Streamlit oturumları tarafından paylaşılır.
+    
+    - Her seviye ayrı bir shard'dır; arama sadece seçili shard'larda yapılır
+    - Hibrit arama: FAISS + shard başına BM25 indeksi, reciprocal rank fusion
+    - Aramalar kilitsizdir: her arama o anki shard sözlüğü referansını alır
+    - reload() yeni indeksi kilit DIŞINDA hazırlar, sonra referansı atomik
+      olarak değiştirir (devam eden aramalar eski indeksle tamamlanır)
+    - version her indeks değişiminde artar (cache invalidation için)
+    """
+    
+    def __init__(self, embedding_model: Embeddings = None):
+        self._embedding_model = embedding_model
+        self._query_cache = None
+        self._shards = None
+        self._lexical = {}  # {level: (shard, LexicalIndex)} - shard değişince yeniden yüklenir
+        self._lock = threading.Lock()          # Yükleme/swap koruması
+        self._reload_lock = threading.Lock()   # Aynı anda tek rebuild
+        self.version = 0
+    
+    @property
+    def embedding_model(self) -> Embeddings:
+        """Embedding modelini ilk ihtiyaçta başlatır (load_dotenv dahil tek sefer)."""
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    self._embedding_model = initialize_embeddings()
+        return self._embedding_model
+    
+    @property
+    def query_cache(self) -> QueryEmbeddingCache:
+        """Sorgu embedding LRU cache'i (hit/miss sayaçları: query_cache.stats())."""
+        if self._query_cache is None:
+            embedding_model = self.embedding_model
+            with self._lock:
+                if self._query_cache is None:
+                    store = LocalFileStore(QUERY_CACHE_PATH) if QUERY_CACHE_PATH else None
+                    self._query_cache = QueryEmbeddingCache(embedding_model, store=store, namespace=EMBEDDING_MODEL)
+        return self._query_cache
+    
+    def _get_shards(self) -> dict:
+        """Yüklü shard'ları döndürür, yoksa diskten bir kez yükler."""
+        shards = self._shards
+        if shards is not None:
+            return shards
+        
+        embedding_model = self.embedding_model
+        with self._lock:
+            if self._shards is None:
+                self._shards = load_index_shards(embedding_model, silent=True)
+                self.version += 1
+            return self._shards
+    
+    def _get_lexical_index(self, level: str, shard: FAISS) -> LexicalIndex:
+        """Shard'ın lexical indeksini döndürür (shard nesnesi başına bir kez yüklenir)."""
+        entry = self._lexical.get(level)
+        if entry is not None and entry[0] is shard:
+            return entry[1]
+        
+        with self._lock:
+            # Eşzamanlı ilk sorgular (speculative thread + ana akış) indeksi tek kez yükler / oluşturur
+            entry = self._lexical.get(level)
+            if entry is None or entry[0] is not shard:
+                entry = (shard, load_lexical_index(level, shard))
+                self._lexical[level] = entry
+            return entry[1]
+    
+    def warm_up(self):
+        """İndeksi önceden yükler (ilk sorgunun gecikmesini önler)."""
+        shards = self._get_shards()
+        if HYBRID_SEARCH:
+            for level, shard in shards.items():
+                self._get_lexical_index(level, shard)
+    
+    def _rank(self, selected: list, query: str, query_embedding: list, k: int) -> list:
+        """
+        Seçili shard'larda FAISS (ve açıksa BM25) aramasını yapıp birleştirir.
+        
+        Args:
+            selected: (level, shard) listesi
+        
+        Returns:
+            HYBRID_SEARCH açıksa (Document, RRF skoru), değilse (Document, L2 mesafesi) listesi
+        """
+        if not HYBRID_SEARCH:
+            return merge_shard_results([
+                shard.similarity_search_with_score_by_vector(query_embedding, k=k)
+                for _, shard in selected
+            ], k)
+        
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = merge_shard_results([
+            shard.similarity_search_with_score_by_vector(query_embedding, k=candidates)
+            for _, shard in selected
+        ], candidates)
+        
+        # BM25 skorları shard'lar arasında aynı ölçekte değil ama shard içi sıra korunur
+        lexical = []
+        for level, shard in selected:
+            for doc_id, score in self._get_lexical_index(level, shard).search(query, candidates):
+                lexical.append((shard.docstore.search(doc_id), score))
+        lexical.sort(key=lambda pair: pair[1], reverse=True)
+        
+        return reciprocal_rank_fusion([dense, lexical[:candidates]], k)
+    
+    def search(self, query: str, k: int = 3, levels: list = None, query_embedding: list = None) -> list:
+        """
+        Resident indekste benzerlik araması yapar (thread-safe).
+        
+        Args:
+            query: Aranacak metin
+            k: Döndürülecek en benzer doküman sayısı
+            levels: Filtrelenecek okul seviyeleri (None ise tümü)
+            query_embedding: Önceden hesaplanmış sorgu embedding'i (None ise query cache'ten)
+        
+        Returns:
+            (Document, score) çiftlerinden oluşan liste (hibrit modda score = RRF, yüksek = iyi)
+        """
+        shards = self._get_shards()
+        if levels is None:
+            levels = SUPPORTED_LEVELS
+        
+        selected = [(level, shards[level]) for level in levels if level in shards]
+        if not selected:
+            return []
+        
+        # Sorgu BİR KEZ embed edilir (tekrar eden sorgular cache'ten), sadece seçili shard'larda aranır
+        if query_embedding is None:
+            query_embedding = self.query_cache.embed_query(query)
+        return self._rank(selected, query, query_embedding, k)
+    
+    async def asearch(self, query: str, k: int = 3, levels: list = None, query_embedding: list = None) -> list:
+        """
+        search()'ün async versiyonu.
+        
+        Sorgu embedding'i async API ile alınır; ilk yükleme thread'de yapılır.
+        FAISS ve BM25 aramaları CPU'da ve kısa olduğu için doğrudan çalışır.
+        """
+        shards = self._shards
+        if shards is None:
+            await asyncio.to_thread(self.warm_up)  # FAISS + lexical indeks dosyaları event loop dışında okunur
+            shards = self._shards
+        if levels is None:
+            levels = SUPPORTED_LEVELS
+        
+        selected = [(level, shards[level]) for level in levels if level in shards]
+        if not selected:
+            return []
+        
+        if query_embedding is None:
+            query_embedding = await self.query_cache.aembed_query(query)
+        return self._rank(selected, query, query_embedding, k)
+    
+    def reload(self, force_recreate: bool = False, silent: bool = True):
+        """
+        İndeksi diskten (veya force_recreate ile sıfırdan) yeniden yükler ve
+        kesinti olmadan atomik olarak yenisiyle değiştirir.
+        """
+        embedding_model = self.embedding_model
+        with self._reload_lock:
+            new_shards = load_index_shards(embedding_model, force_recreate=force_recreate, silent=silent)
+            with self._lock:
+                self._shards = new_shards
+                self.version += 1
+        
+        if not silent:
+            logger.info("✓ Retriever indeksi güncellendi (versiyon %d)", self.version)
+    
+    def sync(self, silent: bool = True) -> dict:
+        """
+        Incremental sync çalıştırır ve sadece değişen shard'ları atomik olarak
+        yerine koyar. Değişmeyen shard'lar bellekte olduğu gibi kalır.
+        
+        Returns:
+            {"added", "updated", "deleted"} sayıları
+        """
+        embedding_model = self.embedding_model
+        with self._reload_lock:
+            stats, updated_shards = sync_index(embedding_model, silent=silent)
+            if updated_shards:
+                new_shards = dict(self._get_shards())
+                for level, shard in updated_shards.items():
+                    if shard is None:
+                        new_shards.pop(level, None)
+                    else:
+                        new_shards[level] = shard
+                with self._lock:
+                    self._shards = new_shards
+                    self.version += 1
+        
+        if not silent:
+            logger.info("✓ Sync tamamlandı: %d yeni, %d güncellenen, %d silinen chunk", stats["added"], stats["updated"], stats["deleted"])
+        return stats
+
+
+_retriever_service = None
+_retriever_service_lock = threading.Lock()
+
+
+def get_retriever_service() -> RetrieverService:
+    """Süreç genelinde paylaşılan RetrieverService örneğini döndürür."""
+    global _retriever_service
+    if _retriever_service is None:
+        with _retriever_service_lock:
+            if _retriever_service is None:
+                _retriever_service = RetrieverService()
+    return _retriever_service
+
+def get_retrieved_documents(query: str, k: int = 3, levels: list = None, force_recreate: bool = False, silent: bool = False,
+                            query_embedding: list = None) -> list:
+    """
+    Verilen bir sorgu için ilgili dokümanları ve skorlarını getirir
+    (FAISS + BM25 hibrit arama, HYBRID_SEARCH=0 ile sadece FAISS).
 
     Args:
         query (str): Aranacak metin.
@@ -151,29 +934,40 @@ def get_retrieved_documents(query: str, k: int = 3, levels: list = None, force_r
         levels (list): Filtrelenecek okul seviyeleri (None ise tümü).
         force_recreate (bool): İndeksi yeniden oluştur.
         silent (bool): True ise terminal çıktıları bastırılır (chatbot kullanımı için).
+        query_embedding (list): Önceden hesaplanmış sorgu embedding'i (None ise hesaplanır).
 
     Returns:
-        list: (Document, score) çiftlerinden oluşan bir liste.
+        list: (Document, score) çiftlerinden oluşan bir liste. Hibrit modda
+        score = RRF skoru (yüksek = iyi), HYBRID_SEARCH=0 ile L2 mesafesi (düşük = iyi).
     """
     try:
-        embedding_model = initialize_embeddings()
-        vectorstore = load_vector_store(embedding_model, levels, force_recreate, silent)
+        # İndeks süreç başına bir kez yüklenir (resident service)
+        service = get_retriever_service()
+        if force_recreate:
+            service.reload(force_recreate=True, silent=silent)
         
         if not silent:
-            print(f"\n🔍 '{query}' sorgusu için en benzer {k} sonuç getiriliyor...")
-        
-        # Tüm sonuçları al
-        results = vectorstore.similarity_search_with_score(query, k=k*2)  # Daha fazla al, filtrele
+            logger.info("\n🔍 '%s' sorgusu için en benzer %d sonuç getiriliyor...", query, k)
         
-        # Eğer seviye filtresi varsa uygula
-        if levels:
-            results = [(doc, score) for doc, score in results if doc.metadata.get("level") in levels]
-        
-        # İstenen sayıda sonuç döndür
-        return results[:k]
+        return service.search(query, k=k, levels=levels, query_embedding=query_embedding)
+    except Exception as e:
+        if not silent:
+            logger.warning("❌ Retriever hatası: %s", e)
+        return []
+
+async def aget_retrieved_documents(query: str, k: int = 3, levels: list = None, silent: bool = False,
+                                   query_embedding: list = None) -> list:
+    """
+    get_retrieved_documents'in async versiyonu (resident service üzerinden).
+    
+    Returns:
+        list: (Document, score) çiftlerinden oluşan bir liste.
+    """
+    try:
+        return await get_retriever_service().asearch(query, k=k, levels=levels, query_embedding=query_embedding)
     except Exception as e:
         if not silent:
-            print(f"❌ Retriever hatası: {e}")
+            logger.warning("❌ Retriever hatası: %s", e)
         return []
 
 def main():
@@ -186,15 +980,35 @@ def main():
   python retriever.py "Matematik dersleri" -k 5
   python retriever.py "Ödev politikası" --levels anaokulu ilkokul
   python retriever.py "Vizyon misyon" --recreate
+  python retriever.py --sync
+  python retriever.py --migrate
         """
     )
-    parser.add_argument("query", type=str, help="Vektör veritabanında aranacak sorgu.")
+    parser.add_argument("query", type=str, nargs="?", help="Vektör veritabanında aranacak sorgu.")
     parser.add_argument("-k", type=int, default=3, help="Döndürülecek en benzer doküman sayısı (varsayılan: 3).")
     parser.add_argument("--levels", nargs="+", choices=SUPPORTED_LEVELS, 
                        help="Sadece belirtilen okul seviyelerinde ara (varsayılan: tümü).")
     parser.add_argument("--recreate", action="store_true", 
                        help="FAISS indeksini yeniden oluştur (mevcut silinir).")
+    parser.add_argument("--sync", action="store_true",
+                       help="Sadece değişen chunk'ları indekste güncelle (incremental).")
+    parser.add_argument("--migrate", action="store_true",
+                       help="Eski tek parça indeksi seviye shard'larına böl ve kaydet (eski dosyalar korunur).")
     args = parser.parse_args()
+    enable_console_trace()  # İndeks yükleme / sync logları
+
+    if args.migrate:
+        migrate_legacy_index(get_retriever_service().embedding_model)
+        if not args.query and not args.sync:
+            return
+
+    if args.sync:
+        get_retriever_service().sync(silent=False)
+        if not args.query:
+            return
+    
+    if not args.query:
+        parser.error("Sorgu, --sync veya --migrate belirtilmeli.")
 
     try:
         print("=" * 70)
@@ -224,9 +1038,11 @@ def main():
         print(f"📊 {len(results_with_scores)} Sonuç Bulundu")
         print(f"{'='*70}")
 
+        score_label = "RRF Skoru (yüksek = iyi)" if HYBRID_SEARCH else "L2 Mesafesi (düşük = iyi)"
+
         for i, (doc, score) in enumerate(results_with_scores, 1):
             print(f"\n{'─'*70}")
-            print(f"🔢 Sonuç {i} | 📈 Benzerlik Skoru: {score:.4f}")
+            print(f"🔢 Sonuç {i} | 📈 {score_label}: {score:.4f}")
             print(f"{'─'*70}")
             print(f"🏷️  ID: {doc.metadata.get('id')}")
             print(f"🎯 Seviye: {doc.metadata.get('level', 'N/A').upper()}")
@@ -7,6 +7,29 @@ from typing import TypedDict, List, Optional, Annotated
 from langchain_core.messages import BaseMessage
 from langgraph.graph import add_messages
 
+from token_budget import estimate_tokens
+
+
+class RetrievedDoc(TypedDict):
+    """
+    Retrieval sonucu kompakt doküman kaydı (FAISS chunk'ı veya haber).
+    
+    Node'lar arasında bu kayıtlar taşınır; LLM context metni answer node'da
+    bir kez render edilir (prompts/context_format.py).
+    """
+    id: str                  # Chunk id'si / haber URL'i
+    level: str               # Eğitim kademesi veya "haber"
+    title: str
+    # Anlamı skoru son yazan aşamaya bağlıdır:
+    #   hibrit arama (HYBRID_SEARCH=1): RRF skoru (yüksek = iyi)
+    #   sadece FAISS (HYBRID_SEARCH=0): L2 mesafesi (düşük = iyi)
+    #   rerank sonrası: cross-encoder skoru, ~0-1 (yüksek = iyi)
+    #   haber: alaka + tazelik skoru (yüksek = iyi)
+    score: Optional[float]
+    content: str
+    tokens: int              # content'in yaklaşık token sayısı
+    metadata: dict           # Kaynağa özgü alanlar (haber: date, url, image)
+
 
 class ChatState(TypedDict):
     """
@@ -16,8 +39,12 @@ class ChatState(TypedDict):
     Her node bu state'i okuyabilir ve güncelleyebilir.
     """
     # Conversation messages (LangGraph manages this with add_messages)
+    # Sadece token bütçesine sığan son turlar; eskiler conversation_summary'de
     messages: Annotated[List[BaseMessage], add_messages]
     
+    # Eski turların rolling özeti (history compaction node yazar, turlar arası korunur)
+    conversation_summary: Optional[str]
+    
     # User query
     user_query: str
     
@@ -32,8 +59,13 @@ class ChatState(TypedDict):
     # Context compression control
     compress_context: bool  # True = compress retrieved context, False = use full context
     
-    # Retrieved context from FAISS/tools
-    retrieved_context: Optional[str]
+    # Retrieved documents from FAISS/news (answer node'da render edilir)
+    retrieved_docs: Optional[List[RetrievedDoc]]
+    retrieved_context: Optional[str]  # Doküman dışı context notu (hata açıklaması, sabit metin)
+    
+    # Speculative mode: intent detection ile paralel çekilen sonuçlar
+    prefetched_docs: Optional[List[RetrievedDoc]]  # FAISS doküman kayıtları (education)
+    prefetched_news: Optional[List[dict]]  # Duyuru listesi (event)
     
     # Final answer
     final_answer: Optional[str]
@@ -42,6 +74,40 @@ class ChatState(TypedDict):
     error: Optional[str]
 
 
+def create_retrieved_doc(
+    doc_id: str,
+    level: str,
+    title: str,
+    content: str,
+    score: Optional[float] = None,
+    metadata: Optional[dict] = None
+) -> RetrievedDoc:
+    """
+    Token sayısı hesaplanmış RetrievedDoc kaydı oluşturur.
+    
+    Args:
+        doc_id: Chunk id'si veya haber URL'i
+        level: Eğitim kademesi veya "haber"
+        title: Doküman başlığı
+        content: LLM'e gidecek içerik
+        score: Retrieval skoru
+        metadata: Kaynağa özgü ek alanlar
+    
+    Returns:
+        RetrievedDoc
+    """
+    content = content or ""
+    return RetrievedDoc(
+        id=doc_id,
+        level=level,
+        title=title,
+        score=score,
+        content=content,
+        tokens=estimate_tokens(content),
+        metadata=metadata or {}
+    )
+
+
 def create_initial_state(
     user_query: str,
     active_levels: List[str],
@@ -54,11 +120,14 @@ def create_initial_state(
     Args:
         user_query: Kullanıcının sorusu
         active_levels: Seçili eğitim kademeleri
-        messages: Conversation history (LangChain messages)
+        messages: Bu turun yeni mesajları (add_messages ile mevcut geçmişin sonuna eklenir)
         compress_context: Context compression açık mı? (True = compress, False = full)
     
     Returns:
         ChatState: Initial state
+    
+    NOT: conversation_summary bilerek eklenmez; eklenirse her tur checkpoint'teki
+    özetin üzerine None yazılır.
     """
     return ChatState(
         messages=messages,
@@ -68,7 +137,10 @@ def create_initial_state(
         intent_reasoning=None,
         active_levels=active_levels,
         compress_context=compress_context,
+        retrieved_docs=None,
         retrieved_context=None,
+        prefetched_docs=None,
+        prefetched_news=None,
         final_answer=None,
         error=None
     )
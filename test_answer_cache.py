@@ -0,0 +1,95 @@
+"""
+Answer Cache Test
+AnswerCache partition / intent eşleşmesi, TTL, LRU ve indeks versiyonu invalidation'ı
+"""
+
+import answer_cache
+from answer_cache import AnswerCache
+
+LEVELS = ["lise"]
+
+
+def store(cache: AnswerCache, embedding=(1.0, 0.0), levels=LEVELS, compress=False, intent="education",
+          answer="yanıt", index_version=1):
+    cache.store(list(embedding), levels, compress, intent=intent, final_answer=answer, index_version=index_version)
+
+
+def lookup(cache: AnswerCache, embedding=(1.0, 0.0), levels=LEVELS, compress=False, intent="education", index_version=1):
+    return cache.lookup(list(embedding), levels, compress, intent=intent, index_version=index_version)
+
+
+def test_similar_query_hits():
+    cache = AnswerCache(threshold=0.95)
+    store(cache, embedding=(1.0, 0.0))
+
+    hit = lookup(cache, embedding=(0.99, 0.05))
+
+    assert hit["final_answer"] == "yanıt"
+    assert hit["similarity"] >= 0.95
+    assert cache.stats()["hits"] == 1
+
+
+def test_dissimilar_query_misses():
+    cache = AnswerCache(threshold=0.95)
+    store(cache, embedding=(1.0, 0.0))
+
+    assert lookup(cache, embedding=(0.0, 1.0)) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_partition_requires_same_levels_and_compression():
+    cache = AnswerCache()
+    store(cache, levels=["lise", "ortaokul"])
+
+    assert lookup(cache, levels=["ortaokul", "lise"]) is not None  # sıra önemsiz
+    assert lookup(cache, levels=["lise"]) is None
+    assert lookup(cache, levels=["lise", "ortaokul"], compress=True) is None
+
+
+def test_intent_must_match_exactly():
+    cache = AnswerCache()
+    store(cache, intent="education")
+
+    assert lookup(cache, intent="price_info") is None
+    assert lookup(cache, intent=None) is None  # bilinmeyen intent hiçbir kayıtla eşleşmez
+
+
+def test_event_answers_are_not_cached():
+    cache = AnswerCache()
+    store(cache, intent="event")
+
+    assert cache.stats()["size"] == 0
+    assert lookup(cache, intent="event") is None
+
+
+def test_expired_entries_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl=60)
+    store(cache)
+
+    now[0] += 30
+    assert lookup(cache) is not None
+    now[0] += 31
+    assert lookup(cache) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_index_version_change_invalidates_everything():
+    cache = AnswerCache()
+    store(cache, index_version=1)
+
+    assert lookup(cache, index_version=2) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_keeps_most_recently_used():
+    cache = AnswerCache(maxsize=2)
+    store(cache, embedding=(1.0, 0.0, 0.0), answer="a")
+    store(cache, embedding=(0.0, 1.0, 0.0), answer="b")
+    lookup(cache, embedding=(1.0, 0.0, 0.0))  # "a" en son kullanılan
+    store(cache, embedding=(0.0, 0.0, 1.0), answer="c")  # "b" atılır
+
+    assert lookup(cache, embedding=(1.0, 0.0, 0.0))["final_answer"] == "a"
+    assert lookup(cache, embedding=(0.0, 1.0, 0.0)) is None
+    assert lookup(cache, embedding=(0.0, 0.0, 1.0))["final_answer"] == "c"
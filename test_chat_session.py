@@ -0,0 +1,96 @@
+"""
+Chat Session Test
+Answer cache'in sadece sohbetin ilk sorusunda kullanılması (takip soruları geçmişe bağlıdır)
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langgraph.checkpoint.memory import MemorySaver
+
+import chat
+from answer_cache import AnswerCache
+from chat import ChatSession
+from intent_detector import IntentDetection
+
+EMBEDDING = [1.0, 0.0]
+
+
+class StubQueryCache:
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text: str) -> list:
+        self.calls.append(text)
+        return EMBEDDING
+
+    async def aembed_query(self, text: str) -> list:
+        return self.embed_query(text)
+
+
+class StubRetrieverService:
+    version = 1
+
+    def __init__(self):
+        self.query_cache = StubQueryCache()
+
+
+class StubClassifier:
+    def __init__(self):
+        self.calls = []
+
+    def classify(self, query: str) -> IntentDetection:
+        self.calls.append(query)
+        return IntentDetection(intent="education", confidence=0.95, reasoning="[test]")
+
+    async def aclassify(self, query: str) -> IntentDetection:
+        return self.classify(query)
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    service, classifier = StubRetrieverService(), StubClassifier()
+    monkeypatch.setattr(chat, "get_retriever_service", lambda: service)
+    monkeypatch.setattr(chat, "get_local_intent_classifier", lambda: classifier)
+    monkeypatch.setattr(chat, "start_news_crawler", lambda: None)
+    return service, classifier
+
+
+@pytest.fixture
+def session(stubs):
+    cache = AnswerCache()
+    cache.store(EMBEDDING, ["lise"], False, intent="education", final_answer="kayıtlı yanıt", index_version=1)
+    session = ChatSession(FakeListChatModel(responses=["yanıt"]), checkpointer=MemorySaver(), answer_cache=cache,
+                          speculative=False)
+    session.set_levels(["lise"])
+    return session
+
+
+def test_first_turn_uses_answer_cache(session):
+    turn = session._prepare_turn("Lisede servis var mı?")
+
+    assert turn["cached_answer"] == "kayıtlı yanıt"
+
+
+def test_follow_up_turn_never_hits_cache(session, stubs):
+    service, classifier = stubs
+    session._prepare_turn("Lisede servis var mı?")  # Hit → thread'de artık geçmiş var
+
+    turn = session._prepare_turn("peki lise için?")
+
+    assert turn["cached_answer"] is None
+    assert turn["initial_state"] is not None
+    # Lookup atlandığı için embedding ve yerel sınıflandırma da yapılmaz
+    assert service.query_cache.calls == ["Lisede servis var mı?"]
+    assert classifier.calls == ["Lisede servis var mı?"]
+
+
+def test_async_follow_up_turn_never_hits_cache(session, stubs):
+    service, _ = stubs
+    session._prepare_turn("Lisede servis var mı?")
+
+    turn = asyncio.run(session._aprepare_turn("peki lise için?"))
+
+    assert turn["cached_answer"] is None
+    assert service.query_cache.calls == ["Lisede servis var mı?"]
@@ -0,0 +1,120 @@
+"""
+Checkpointer Test
+BoundedSqliteSaver: kayıt / okuma / listeleme, budama, boşta thread temizliği ve budama sonrası devam
+"""
+
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from langgraph.graph import StateGraph, START, END
+
+import checkpointer
+from checkpointer import BoundedSqliteSaver
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return BoundedSqliteSaver(path=str(tmp_path / "checkpoints.sqlite3"), retention=3)
+
+
+def put_checkpoints(saver: BoundedSqliteSaver, thread_id: str, count: int, payload: str = "x") -> list:
+    """Thread'e zincir halinde `count` checkpoint yazar; config listesini döndürür."""
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    configs = []
+    for step in range(count):
+        checkpoint = create_checkpoint(checkpoint, None, step)
+        checkpoint["channel_values"] = {"payload": payload, "step": step}
+        config = saver.put(config, checkpoint, {"source": "loop", "step": step}, {})
+        configs.append(config)
+    return configs
+
+
+def test_put_get_tuple_list_round_trip(saver):
+    configs = put_checkpoints(saver, "t1", 2)
+    saver.put_writes(configs[-1], [("payload", "yazım")], task_id="task-1")
+
+    latest = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert latest.config == configs[-1]
+    assert latest.parent_config == configs[0]
+    assert latest.checkpoint["channel_values"] == {"payload": "x", "step": 1}
+    assert latest.metadata["step"] == 1
+    assert latest.pending_writes == [("task-1", "payload", "yazım")]
+
+    first = saver.get_tuple(configs[0])
+    assert first.checkpoint["channel_values"]["step"] == 0
+
+    listed = list(saver.list({"configurable": {"thread_id": "t1"}}))
+    assert [item.config for item in listed] == [configs[1], configs[0]]
+    assert [item.config for item in saver.list(None, filter={"step": 0})] == [configs[0]]
+    assert [item.config for item in saver.list(None, before=configs[1])] == [configs[0]]
+
+
+def test_retention_keeps_newest_checkpoints(saver):
+    configs = put_checkpoints(saver, "t1", 6)
+
+    kept = [item.config for item in saver.list({"configurable": {"thread_id": "t1"}})]
+    assert kept == configs[:-4:-1]  # En yeni 3 checkpoint
+    assert saver.get_tuple(configs[0]) is None
+
+
+def test_idle_threads_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer.time, "time", lambda: now[0])
+    saver = BoundedSqliteSaver(path=str(tmp_path / "ttl.sqlite3"), thread_ttl=60)
+
+    put_checkpoints(saver, "idle", 1)
+    now[0] += 30
+    put_checkpoints(saver, "active", 1)
+    now[0] += 45  # "idle" 75 sn, "active" 45 sn boşta
+    saver.cleanup()
+
+    assert saver.get_tuple({"configurable": {"thread_id": "idle"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "active"}}) is not None
+
+
+def test_size_cap_evicts_least_recently_used_threads(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer.time, "time", lambda: now[0])
+    saver = BoundedSqliteSaver(path=str(tmp_path / "cap.sqlite3"))
+
+    for thread_id in ("old", "mid", "new"):
+        put_checkpoints(saver, thread_id, 1, payload="x" * 4000)
+        now[0] += 1
+    saver.get_tuple({"configurable": {"thread_id": "old"}})  # "old" yeniden kullanıldı → en son erişilen
+
+    saver.max_bytes = saver.stats()["bytes"] - 1  # Bir thread silinince sınırın altına inilir
+    saver.cleanup()
+
+    assert saver.get_tuple({"configurable": {"thread_id": "mid"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "old"}}) is not None
+    assert saver.get_tuple({"configurable": {"thread_id": "new"}}) is not None
+
+
+class CounterState(TypedDict):
+    turns: Annotated[list, operator.add]
+
+
+def build_graph(saver: BoundedSqliteSaver):
+    graph = StateGraph(CounterState)
+    graph.add_node("step", lambda state: {"turns": ["cevap"]})
+    graph.add_edge(START, "step")
+    graph.add_edge("step", END)
+    return graph.compile(checkpointer=saver)
+
+
+def test_thread_resumes_after_pruning(tmp_path):
+    path = str(tmp_path / "resume.sqlite3")
+    config = {"configurable": {"thread_id": "sohbet"}}
+    graph = build_graph(BoundedSqliteSaver(path=path, retention=2))
+    for _ in range(5):
+        graph.invoke({"turns": ["soru"]}, config)
+
+    # Süreç yeniden başlamış gibi aynı dosyayla yeni saver
+    saver = BoundedSqliteSaver(path=path, retention=2)
+    assert saver.stats()["checkpoints"] == 2
+
+    result = build_graph(saver).invoke({"turns": ["soru"]}, config)
+    assert result["turns"] == ["soru", "cevap"] * 6
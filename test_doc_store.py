@@ -0,0 +1,113 @@
+"""
+Doc Store Test
+ArrowDocstore: yazma / okuma, page_content'in metadata'dan yeniden üretilmesi ve eski pickle shard'ın Arrow'a çevrilmesi
+"""
+
+import os
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+import retriever
+from doc_store import ArrowDocstore, write_docstore, DOCSTORE_FILE
+from retriever import create_embedding_text, get_shard_path, load_shard
+
+CHUNKS = [
+    {"id": "lise-00", "title": "Servis", "question": "Servis var mı?", "content": "Tüm semtlere servis vardır."},
+    {"id": "lise-01", "title": "Yemek", "embedding_hint": "menü, öğle yemeği", "content": "Menü aylık gönderilir."},
+    {"id": "lise-02", "title": "Kulüpler", "content": "Robotik ve münazara kulüpleri vardır."},
+]
+
+
+def make_document(chunk: dict, page_content: str = None) -> Document:
+    metadata = {key: value for key, value in chunk.items() if key != "content"}
+    metadata.update(level="lise", original_content=chunk["content"])
+    return Document(id=chunk["id"], page_content=page_content or create_embedding_text(chunk), metadata=metadata)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    documents = [make_document(CHUNKS[0]), make_document(CHUNKS[1], page_content="Elle yazılmış metin"), make_document(CHUNKS[2])]
+    path = str(tmp_path / DOCSTORE_FILE)
+    write_docstore(path, [chunk["id"] for chunk in CHUNKS], documents, create_embedding_text)
+    return path, documents
+
+
+def test_round_trip_returns_same_documents(store_path):
+    path, documents = store_path
+    store = ArrowDocstore(path, create_embedding_text)
+
+    for document in documents:
+        assert store.search(document.id) == document
+    assert store.search("yok") == "ID yok not found."
+
+
+def test_page_content_is_stored_only_when_not_rebuildable(store_path):
+    path, _ = store_path
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    assert table.column("page_content").to_pylist() == [None, "Elle yazılmış metin", None]
+    assert "original_content" not in table.column("metadata")[0].as_py()
+
+
+def test_null_page_content_is_rebuilt_from_metadata(store_path):
+    path, _ = store_path
+    calls = []
+
+    def build_page_content(item: dict) -> str:
+        calls.append(item["id"])
+        return create_embedding_text(item)
+
+    document = ArrowDocstore(path, build_page_content).search("lise-02")
+
+    assert calls == ["lise-02"]
+    assert document.page_content == "Kulüpler Robotik ve münazara kulüpleri vardır."
+    assert document.metadata["original_content"] == "Robotik ve münazara kulüpleri vardır."
+
+
+def test_ids_stay_in_arrow_until_needed(store_path):
+    path, _ = store_path
+    store = ArrowDocstore(path, create_embedding_text)
+    id_map = store.index_to_docstore_id
+
+    assert store._rows is None  # Yüklemede id → satır tablosu kurulmaz
+    assert len(id_map) == 3
+    assert id_map[np.int64(1)] == "lise-01"  # FAISS pozisyonları numpy tamsayısı
+    assert list(id_map.values()) == ["lise-00", "lise-01", "lise-02"]
+    with pytest.raises(KeyError):
+        id_map[3]
+
+    store.search("lise-00")
+    assert store._rows is not None
+
+
+def test_to_memory_copies_every_document(store_path):
+    path, documents = store_path
+    memory = ArrowDocstore(path, create_embedding_text).to_memory()
+
+    assert [memory.search(document.id) for document in documents] == documents
+
+
+def test_legacy_pickle_shard_is_converted_with_identical_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    embeddings = DeterministicFakeEmbedding(size=16)
+    documents = [make_document(chunk) for chunk in CHUNKS]
+    legacy = FAISS.from_documents(documents, embeddings, ids=[document.id for document in documents])
+    shard_path = get_shard_path("lise")
+    legacy.save_local(shard_path)
+    queries = ["servis", "yemek menüsü", "robotik kulübü"]
+    expected = [legacy.similarity_search_with_score(query, k=3) for query in queries]
+
+    shard = load_shard("lise", embeddings)
+
+    assert isinstance(shard.docstore, ArrowDocstore)
+    assert os.path.exists(os.path.join(shard_path, DOCSTORE_FILE))
+    assert not os.path.exists(os.path.join(shard_path, retriever.PICKLE_DOCSTORE_FILE))
+    for query, legacy_results in zip(queries, expected):
+        results = shard.similarity_search_with_score(query, k=3)
+        assert [document for document, _ in results] == [document for document, _ in legacy_results]
+        assert [score for _, score in results] == pytest.approx([score for _, score in legacy_results])
@@ -0,0 +1,94 @@
+"""
+Intent Detector Test
+Yerel kural seti ve kural + centroid birleştirmesi (LLM / embedding çağrısı yok)
+"""
+
+import pytest
+
+from intent_detector import IntentDetection, LocalIntentClassifier, LOCAL_INTENT_THRESHOLD
+
+
+@pytest.fixture
+def classifier():
+    return LocalIntentClassifier()
+
+
+def centroid(intent: str, confidence: float) -> IntentDetection:
+    return IntentDetection(intent=intent, confidence=confidence, reasoning="[test-centroid]")
+
+
+@pytest.mark.parametrize("query", [
+    "Bu hafta kaç saat matematik var?",
+    "Veliyle haberleşme nasıl yapılıyor?",
+    "Tatilde ödev veriliyor mu?",
+    "Akademik takvime göre sınavlar nasıl düzenleniyor?",
+    "Yaklaşan sınavlara nasıl hazırlanıyorsunuz?",
+])
+def test_generic_time_words_alone_are_not_event(classifier, query):
+    detection = classifier.classify_by_rules(query)
+    assert detection is None or detection.intent != "event"
+
+
+@pytest.mark.parametrize("query", [
+    "Son duyurular neler?",
+    "Okulla ilgili haberler var mı?",
+    "Bu hafta etkinlik var mı?",
+    "Okulda hangi etkinlikler düzenlendi?",
+    "Yaklaşan törenler ne zaman?",
+])
+def test_event_keywords(classifier, query):
+    assert classifier.classify_by_rules(query).intent == "event"
+
+
+def test_keyword_rule_alone_stays_below_threshold(classifier):
+    detection = classifier.classify_by_rules("Ücretler ne kadar?")
+
+    assert detection.intent == "price"
+    assert detection.confidence < LOCAL_INTENT_THRESHOLD
+
+
+def test_greeting_only_message_is_confident(classifier):
+    detection = classifier.classify_by_rules("Merhaba, teşekkürler!")
+
+    assert detection.intent == "greeting"
+    assert detection.confidence >= LOCAL_INTENT_THRESHOLD
+
+
+def test_greeting_with_question_is_not_greeting(classifier):
+    detection = classifier.classify_by_rules("Merhaba, lise programı nedir?")
+    assert detection is None or detection.intent != "greeting"
+
+
+def test_keyword_and_centroid_agreement_passes_threshold(classifier, monkeypatch):
+    monkeypatch.setattr(classifier, "classify_by_centroid", lambda query, query_embedding=None: centroid("event", 0.5))
+
+    detection = classifier.classify("Son duyurular neler?")
+
+    assert detection.intent == "event"
+    assert detection.confidence >= LOCAL_INTENT_THRESHOLD
+
+
+def test_keyword_and_centroid_disagreement_falls_back_to_llm(classifier, monkeypatch):
+    monkeypatch.setattr(classifier, "classify_by_centroid", lambda query, query_embedding=None: centroid("education", 0.9))
+
+    detection = classifier.classify("Bu hafta etkinlik var mı?")
+
+    assert detection.confidence < LOCAL_INTENT_THRESHOLD
+
+
+def test_counter_example_is_decided_by_centroid(classifier, monkeypatch):
+    monkeypatch.setattr(classifier, "classify_by_centroid", lambda query, query_embedding=None: centroid("education", 0.9))
+
+    detection = classifier.classify("Bu hafta kaç saat matematik var?")
+
+    assert detection.intent == "education"
+
+
+def test_centroid_failure_keeps_keyword_result_below_threshold(classifier, monkeypatch):
+    def fail(query, query_embedding=None):
+        raise RuntimeError("embedding yok")
+
+    monkeypatch.setattr(classifier, "classify_by_centroid", fail)
+
+    assert classifier.classify("Taksit imkanı var mı?").confidence < LOCAL_INTENT_THRESHOLD
+    assert classifier.classify("Hava nasıl?").confidence == 0.0
@@ -0,0 +1,83 @@
+"""
+Lexical Index Test
+Tokenizer, BM25 sıralaması (BM25Scorer ve LexicalIndex aynı skor) ve reciprocal rank fusion
+"""
+
+import pytest
+from langchain_core.documents import Document
+
+import lexical_index
+from lexical_index import BM25Scorer, LexicalIndex, tokenize
+from retriever import reciprocal_rank_fusion, RRF_K
+
+TEXTS = [
+    "Lise servis güzergahları ve servis saatleri",
+    "Ortaokul matematik ders saatleri haftada altı saattir",
+    "Yemek menüsü her ay velilere gönderilir",
+    "Matematik olimpiyatlarına hazırlık kulübü ve matematik atölyesi",
+]
+IDS = ["servis", "ders", "yemek", "kulup"]
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("Matematik dersleri kaç saat?") == ["matem", "dersl", "saat"]
+    assert tokenize("5. sınıf ve 6. sınıf") == ["5", "sınıf", "6", "sınıf"]
+
+
+def test_search_ranks_by_term_frequency_and_rarity():
+    index = LexicalIndex.build(IDS, TEXTS)
+
+    results = index.search("matematik", k=10)
+
+    assert [doc_id for doc_id, _ in results] == ["kulup", "ders"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("servis saatleri", k=1)[0][0] == "servis"
+    assert index.search("uzay", k=5) == []
+
+
+def test_scorer_and_index_share_one_formula():
+    index = LexicalIndex.build(IDS, TEXTS)
+    scorer = BM25Scorer([tokenize(text) for text in TEXTS])
+
+    for query in ("matematik saatleri", "servis", "yemek menüsü velilere"):
+        expected = {IDS[position]: score for position, score in enumerate(scorer.score_all(tokenize(query))) if score}
+        assert dict(index.search(query, k=len(IDS))) == pytest.approx(expected)
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "lexical.json")
+    LexicalIndex.build(IDS, TEXTS).save(path)
+
+    loaded = LexicalIndex.load(path)
+
+    assert loaded.search("matematik", k=2) == LexicalIndex.build(IDS, TEXTS).search("matematik", k=2)
+
+
+def test_load_rejects_other_stem_length(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical.json")
+    LexicalIndex.build(IDS, TEXTS).save(path)
+    monkeypatch.setattr(lexical_index, "STEM_LENGTH", lexical_index.STEM_LENGTH + 1)
+
+    assert LexicalIndex.load(path) is None
+    assert LexicalIndex.load(str(tmp_path / "yok.json")) is None
+
+
+def doc(doc_id: str) -> Document:
+    return Document(id=doc_id, page_content=doc_id)
+
+
+def test_rrf_rewards_documents_found_by_both_methods():
+    vector = [(doc("a"), 0.1), (doc("b"), 0.2), (doc("c"), 0.3)]
+    lexical = [(doc("c"), 9.0), (doc("d"), 5.0)]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=2)
+
+    assert [item.id for item, _ in fused] == ["c", "a"]
+    assert fused[0][1] == pytest.approx(1 / (RRF_K + 3) + 1 / (RRF_K + 1))
+    assert fused[1][1] == pytest.approx(1 / (RRF_K + 1))
+
+
+def test_rrf_ignores_raw_score_scales():
+    fused = reciprocal_rank_fusion([[(doc("a"), 1000.0), (doc("b"), 0.001)]], k=5)
+
+    assert [item.id for item, _ in fused] == ["a", "b"]
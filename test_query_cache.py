@@ -0,0 +1,145 @@
+"""
+Query Cache Test
+normalize_query ve QueryEmbeddingCache (LRU + disk store) davranışı
+"""
+
+import asyncio
+import threading
+
+from langchain_core.embeddings import Embeddings
+from langchain_classic.storage import LocalFileStore
+
+from query_cache import QueryEmbeddingCache, normalize_query, turkish_lower
+
+
+class CountingEmbeddings(Embeddings):
+    """Her çağrıyı sayan, metin uzunluğundan vektör üreten sahte model."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts: list) -> list:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        self.calls.append(text)
+        return [float(len(text)), 1.0]
+
+    async def aembed_query(self, text: str) -> list:
+        return self.embed_query(text)
+
+
+def test_turkish_lower_dotted_and_dotless_i():
+    assert turkish_lower("IŞIK İzmir") == "ışık izmir"
+
+
+def test_normalize_query_collapses_case_punctuation_and_whitespace():
+    assert normalize_query("İngilizce kaç saat?") == "ingilizce kaç saat"
+    assert normalize_query("  Servis var mı ?? ") == "servis var mı"
+    assert normalize_query("SERVİS VAR MI") == normalize_query("servis var mı")
+
+
+def test_normalized_variants_share_one_embedding_call():
+    model = CountingEmbeddings()
+    cache = QueryEmbeddingCache(model)
+
+    first = cache.embed_query("Servis var mı?")
+    second = cache.embed_query("  servis VAR mı ")
+
+    assert first == second
+    assert len(model.calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    model = CountingEmbeddings()
+    cache = QueryEmbeddingCache(model, maxsize=2)
+
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")  # "a" en son kullanılan olur
+    cache.embed_query("c")  # "b" atılır
+
+    assert cache.stats()["size"] == 2
+    calls = len(model.calls)
+    cache.embed_query("a")
+    assert len(model.calls) == calls
+    cache.embed_query("b")
+    assert len(model.calls) == calls + 1
+
+
+def test_disk_store_warms_new_cache(tmp_path):
+    store = LocalFileStore(str(tmp_path))
+    QueryEmbeddingCache(CountingEmbeddings(), store=store, namespace="m1").embed_query("Okul saat kaçta başlıyor?")
+
+    model = CountingEmbeddings()
+    cache = QueryEmbeddingCache(model, store=store, namespace="m1")
+    embedding = cache.embed_query("okul saat kaçta başlıyor")
+
+    assert model.calls == []
+    assert embedding == [float(len("Okul saat kaçta başlıyor?")), 1.0]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_store_is_namespaced_per_model(tmp_path):
+    store = LocalFileStore(str(tmp_path))
+    QueryEmbeddingCache(CountingEmbeddings(), store=store, namespace="m1").embed_query("servis")
+
+    model = CountingEmbeddings()
+    QueryEmbeddingCache(model, store=store, namespace="m2").embed_query("servis")
+
+    assert model.calls == ["servis"]
+
+
+def test_async_lookup_uses_same_entries():
+    model = CountingEmbeddings()
+    cache = QueryEmbeddingCache(model)
+    cache.embed_query("Yemek menüsü")
+
+    embedding = asyncio.run(cache.aembed_query("yemek menüsü!"))
+
+    assert embedding == [float(len("Yemek menüsü")), 1.0]
+    assert len(model.calls) == 1
+
+
+def test_clear_resets_entries_and_counters():
+    cache = QueryEmbeddingCache(CountingEmbeddings())
+    cache.embed_query("a")
+    cache.clear()
+
+    assert cache.stats() == {"hits": 0, "misses": 0, "disk_hits": 0, "size": 0, "hit_rate": 0.0}
+
+
+class ThreadRecordingStore(LocalFileStore):
+    """Disk çağrılarının hangi thread'de yapıldığını kaydeder."""
+
+    def __init__(self, root_path: str):
+        super().__init__(root_path)
+        self.threads = []
+
+    def mget(self, keys):
+        self.threads.append(threading.get_ident())
+        return super().mget(keys)
+
+    def mset(self, key_value_pairs):
+        self.threads.append(threading.get_ident())
+        return super().mset(key_value_pairs)
+
+
+def test_async_disk_store_runs_off_event_loop(tmp_path):
+    store = ThreadRecordingStore(str(tmp_path))
+    cache = QueryEmbeddingCache(CountingEmbeddings(), store=store, namespace="m1")
+
+    async def run():
+        loop_thread = threading.get_ident()
+        await cache.aembed_query("Servis var mı?")  # miss: mget + mset
+        cache.clear()
+        await cache.aembed_query("servis var mı")  # disk hit: mget
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+
+    assert len(store.threads) == 3
+    assert loop_thread not in store.threads
+    assert cache.stats()["disk_hits"] == 1
@@ -0,0 +1,39 @@
+"""
+Token Budget
+Prompt parçalarının token maliyetini tahmin eden yardımcılar
+"""
+
+from langchain_core.messages import BaseMessage
+
+
+# --- CONFIGURATION ---
+CHARS_PER_TOKEN = 4  # Kaba tahmin (Gemini tokenizer'ı Türkçe metinde ~3.5-4.5 karakter/token)
+MESSAGE_OVERHEAD_TOKENS = 4  # Rol etiketi vb. mesaj başına ek maliyet
+
+
+def estimate_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısını döndürür (tokenizer çağrısı yapmadan)."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def get_message_text(message: BaseMessage) -> str:
+    """Mesaj içeriğini metin olarak döndürür (content string veya part listesi olabilir)."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in content
+    )
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Tek bir mesajın yaklaşık token maliyeti."""
+    return estimate_tokens(get_message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+
+
+def messages_tokens(messages: list) -> int:
+    """Mesaj listesinin toplam yaklaşık token maliyeti."""
+    return sum(message_tokens(message) for message in messages)
@@ -0,0 +1,140 @@
+"""
+Vector Index
+FAISS indeks tipleri (flat / HNSW / IVF-SQ8 / IVF-PQ) ve opsiyonel PCA boyut indirgeme
+"""
+
+import os
+
+import numpy as np
+import faiss
+
+
+# --- CONFIGURATION ---
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # "flat" (tam), "hnsw", "ivfsq8", "ivfpq"
+INDEX_PCA_DIM = int(os.getenv("INDEX_PCA_DIM", "0"))  # >0 → vektörler PCA ile bu boyuta indirgenir
+
+HNSW_M = int(os.getenv("HNSW_M", "32"))  # Düğüm başına komşu (bellek ↔ recall)
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))  # Sorgu başına gezilen aday (latency ↔ recall)
+
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))  # Üst sınır; küçük shard'larda otomatik küçültülür
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))  # Sorgu başına taranan liste (latency ↔ recall)
+PQ_M = int(os.getenv("PQ_M", "64"))  # Vektör başına PQ alt-kuantizör sayısı (byte)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfsq8", "ivfpq")
+TRAIN_POINTS_PER_CENTROID = 39  # FAISS k-means'in merkez başına önerdiği minimum eğitim noktası
+IVF_MIN_LISTS = 4  # Bundan az liste çıkacak kadar küçük shard'lar flat kalır
+PQ_MIN_TRAIN_POINTS = 256 * TRAIN_POINTS_PER_CENTROID  # 8-bit PQ codebook'u (256 merkez) için
+
+
+def get_factory_string(count: int, dim: int, index_type: str = INDEX_TYPE, pca_dim: int = INDEX_PCA_DIM) -> str:
+    """
+    Vektör sayısına göre faiss.index_factory tanımını seçer.
+
+    Küçük shard'larda eğitim verisi yetersiz kalacağı için daha basit tipe düşülür:
+    ivfpq → ivfsq8 → flat; PCA sadece yeterli örnek varsa uygulanır.
+
+    Args:
+        count: İndekslenecek vektör sayısı
+        dim: Vektör boyutu
+        index_type: INDEX_TYPES'tan biri
+        pca_dim: Hedef boyut (0 = indirgeme yok)
+
+    Returns:
+        index_factory tanımı (örn. "PCA256,IVF64,SQ8"), düz indeks için "Flat"
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Bilinmeyen INDEX_TYPE: '{index_type}' ({', '.join(INDEX_TYPES)} olmalı)")
+
+    prefix = ""
+    if 0 < pca_dim < dim and count >= pca_dim:
+        prefix = f"PCA{pca_dim},"
+        dim = pca_dim
+
+    nlist = min(IVF_NLIST, count // TRAIN_POINTS_PER_CENTROID)
+    if index_type == "ivfpq" and count < PQ_MIN_TRAIN_POINTS:
+        index_type = "ivfsq8"
+    if index_type in ("ivfsq8", "ivfpq") and nlist < IVF_MIN_LISTS:
+        index_type = "flat"
+
+    if index_type == "hnsw":
+        return f"{prefix}HNSW{HNSW_M},Flat"
+    if index_type == "ivfsq8":
+        return f"{prefix}IVF{nlist},SQ8"
+    if index_type == "ivfpq":
+        pq_m = PQ_M
+        while dim % pq_m:  # PQ alt-uzayları boyutu tam bölmeli
+            pq_m -= 1
+        return f"{prefix}IVF{nlist},PQ{pq_m}x8"
+    return f"{prefix}Flat"
+
+
+def unwrap_index(index: faiss.Index) -> faiss.Index:
+    """PCA sarmalayıcısının (IndexPreTransform) altındaki asıl indeks."""
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def configure_search(index: faiss.Index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH) -> faiss.Index:
+    """Arama parametrelerini uygular (nprobe / efSearch dosyaya yazılmaz, yüklemede tekrar set edilir)."""
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(nprobe, base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+def create_vector_index(vectors: np.ndarray, index_type: str = INDEX_TYPE, pca_dim: int = INDEX_PCA_DIM) -> faiss.Index:
+    """
+    Vektörlerden (L2) FAISS indeksini oluşturur, gerekiyorsa eğitir ve ekler.
+
+    Vektörler sırayla eklenir; i. vektörün indeks pozisyonu i'dir
+    (index_to_docstore_id eşlemesi değişmez).
+
+    Args:
+        vectors: (n, d) float32 matris
+
+    Returns:
+        Arama parametreleri ayarlanmış faiss.Index
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    factory = get_factory_string(count, dim, index_type, pca_dim)
+    if factory == "Flat":
+        index = faiss.IndexFlatL2(dim)  # FAISS.from_documents ile aynı
+    else:
+        index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+
+    base = unwrap_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return configure_search(index)
+
+
+def describe_index(index: faiss.Index) -> str:
+    """Log için kısa açıklama: tip, boyut, vektör sayısı."""
+    base = unwrap_index(index)
+    pca = f"PCA{base.d}←{index.d} " if base is not index else ""
+    return f"{pca}{type(base).__name__} (d={base.d}, n={index.ntotal})"
+
+
+def get_index_config(index_type: str = INDEX_TYPE, pca_dim: int = INDEX_PCA_DIM) -> dict:
+    """İndeksin kurulum parametreleri (manifest'e yazılır; değişirse indeks yeniden kurulur)."""
+    config = {"type": index_type, "pca_dim": pca_dim}
+    if index_type == "hnsw":
+        config.update(hnsw_m=HNSW_M, hnsw_ef_construction=HNSW_EF_CONSTRUCTION)
+    elif index_type in ("ivfsq8", "ivfpq"):
+        config.update(ivf_nlist=IVF_NLIST)
+        if index_type == "ivfpq":
+            config.update(pq_m=PQ_M)
+    return config
+
+
+def is_incremental(index_type: str = INDEX_TYPE, pca_dim: int = INDEX_PCA_DIM) -> bool:
+    """Vektör tek tek silinip eklenebilir mi? (Sadece PCA'sız flat; diğerleri yeniden kurulur.)"""
+    return index_type == "flat" and not pca_dim
@@ -4,24 +4,36 @@ Intent-based routing ile deterministik conversation flow
 """
 
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from state_schema import ChatState
-from nodes.intent_node import intent_detection_node
+from nodes.intent_node import (
+    intent_detection_node,
+    aintent_detection_node,
+    speculative_intent_detection_node,
+    aspeculative_intent_detection_node
+)
 from nodes.router_node import router_node
-from nodes.retrieve_node import retrieve_node
+from nodes.retrieve_node import retrieve_node, aretrieve_node
+from nodes.rerank_node import rerank_node, arerank_node
 from nodes.compression_node import context_compression_node
-from nodes.news_scraper import news_search_node  # 🆕 Gerçek scraper
+from nodes.news_scraper import news_search_node, anews_search_node  # 🆕 Gerçek scraper
 from nodes.answer_node import (
     answer_node, 
+    aanswer_node,
     direct_answer_node, 
+    adirect_answer_node,
     # search_news_node,  # 🗑️ Placeholder kaldırıldı
     price_info_node
 )
+from nodes.history_node import history_compaction_node, ahistory_compaction_node
+from instrumentation import instrument_node
+from reranker import RERANK_ENABLED
 
 
-def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = None):
+def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: BaseCheckpointSaver = None,
+                    speculative: bool = False, speculative_news: bool = False):
     """
     LangGraph workflow oluşturur.
     
@@ -32,15 +44,35 @@ def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = N
     ↓        ↓        ↓         ↓
     retrieve  news   price    direct
     ↓        ↓        ↓         ↓
+    (rerank)  ↓        ↓         ↓
+    ↓        ↓        ↓         ↓
     compress (70% token reduction)
     ↓        ↓        ↓         ↓
     └────────┴────────┴─────────┘
              ↓
-           answer → END
+           answer → compact_history → END
+    
+    Sync + Async:
+    I/O yapan node'lar hem sync hem async gövdeyle (RunnableLambda) eklenir;
+    aynı graph invoke() ile thread'de, ainvoke() ile event loop'ta çalışır.
+    
+    Instrumentation:
+    Her node instrument_node ile sarılır; süre, doküman sayısı ve context
+    token'ları aktif tura (instrumentation.track_turn) yazılır.
+    
+    Rerank (RERANK_ENABLED=1):
+    retrieve daha geniş aday kümesi çeker, rerank node cross-encoder ile
+    sıralayıp eşiğin altındakileri eler. Kapalıyken node graph'a eklenmez.
+    
+    Speculative mode:
+    intent_detection sürerken retrieve (ve opsiyonel news listesi) paralel
+    başlar; router o dalı seçerse sonuç kullanılır, seçmezse atılır.
     
     Args:
         llm: ChatGoogleGenerativeAI instance
-        checkpointer: InMemorySaver for conversation persistence
+        checkpointer: Conversation persistence (InMemorySaver veya BoundedSqliteSaver)
+        speculative: FAISS retrieval'ı intent detection ile paralel başlat
+        speculative_news: Haber listesini de paralel çek (speculative=True gerekir)
     
     Returns:
         Compiled StateGraph
@@ -48,14 +80,43 @@ def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = N
     # Create StateGraph
     graph = StateGraph(ChatState)
     
-    # Add nodes
-    graph.add_node("intent_detection", lambda state: intent_detection_node(state, llm))
-    graph.add_node("retrieve", retrieve_node)
-    graph.add_node("search_news", news_search_node)
-    graph.add_node("price_info", price_info_node)
-    graph.add_node("compression", context_compression_node)  # 🆕 Context compression
-    graph.add_node("direct_answer", lambda state: direct_answer_node(state, llm))
-    graph.add_node("answer", lambda state: answer_node(state, llm))
+    # Async node gövdeleri (llm closure'ı ile)
+    async def aintent(state):
+        return await aintent_detection_node(state, llm)
+    
+    async def aspeculative_intent(state):
+        return await aspeculative_intent_detection_node(state, llm, prefetch_news=speculative_news)
+    
+    async def adirect_answer(state):
+        return await adirect_answer_node(state, llm)
+    
+    async def aanswer(state):
+        return await aanswer_node(state, llm)
+    
+    async def acompact_history(state):
+        return await ahistory_compaction_node(state, llm)
+    
+    # Add nodes (INSTRUMENTATION_ENABLED ise her node süre/token ölçen wrapper ile sarılır)
+    def add_node(name, func, afunc=None):
+        graph.add_node(name, instrument_node(name, func, afunc))
+    
+    if speculative:
+        add_node(
+            "intent_detection",
+            lambda state: speculative_intent_detection_node(state, llm, prefetch_news=speculative_news),
+            aspeculative_intent
+        )
+    else:
+        add_node("intent_detection", lambda state: intent_detection_node(state, llm), aintent)
+    add_node("retrieve", retrieve_node, aretrieve_node)
+    if RERANK_ENABLED:
+        add_node("rerank", rerank_node, arerank_node)
+    add_node("search_news", news_search_node, anews_search_node)
+    add_node("price_info", price_info_node)
+    add_node("compression", context_compression_node)  # 🆕 Context compression
+    add_node("direct_answer", lambda state: direct_answer_node(state, llm), adirect_answer)
+    add_node("answer", lambda state: answer_node(state, llm), aanswer)
+    add_node("compact_history", lambda state: history_compaction_node(state, llm), acompact_history)
     
     # Set entry point
     graph.set_entry_point("intent_detection")
@@ -73,7 +134,11 @@ def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = N
     )
     
     # All nodes go to compression first (except direct_answer)
-    graph.add_edge("retrieve", "compression")
+    if RERANK_ENABLED:
+        graph.add_edge("retrieve", "rerank")
+        graph.add_edge("rerank", "compression")
+    else:
+        graph.add_edge("retrieve", "compression")
     graph.add_edge("search_news", "compression")
     graph.add_edge("price_info", "compression")
     
@@ -81,10 +146,11 @@ def create_workflow(llm: ChatGoogleGenerativeAI, checkpointer: InMemorySaver = N
     graph.add_edge("compression", "answer")
     
     # Direct answer bypasses compression
-    graph.add_edge("direct_answer", END)  # Direct answer goes to END
+    graph.add_edge("direct_answer", "compact_history")
     
-    # Answer node goes to END
-    graph.add_edge("answer", END)
+    # Answer node goes to history compaction, then END
+    graph.add_edge("answer", "compact_history")
+    graph.add_edge("compact_history", END)
     
     # Compile
     app = graph.compile(checkpointer=checkpointer)
@@ -106,23 +172,28 @@ graph TD
     router -->|price| price[Price Info Node<br/>Contact Info]
     router -->|greeting/unknown| direct[Direct Answer Node<br/>No Context]
     
+    retrieve -.->|RERANK_ENABLED| rerank[Rerank Node<br/>Cross-Encoder]
+    rerank --> compress
     retrieve --> compress[Compression Node<br/>70% Token Reduction]
     news --> compress
     price --> compress
     
     compress --> answer[Answer Node<br/>LLM Response]
     
-    direct --> END([END])
-    answer --> END
+    direct --> history[History Compaction<br/>Rolling Summary]
+    answer --> history
+    history --> END([END])
     
     style intent fill:#e1f5ff
     style router fill:#fff4e1
     style retrieve fill:#e8f5e9
+    style rerank fill:#e8f5e9
     style news fill:#fff3e0
     style price fill:#fce4ec
     style compress fill:#fff9c4
     style direct fill:#f3e5f5
     style answer fill:#e0f2f1
+    style history fill:#ede7f6
 ```
 """
 